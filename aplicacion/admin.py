@@ -1,5 +1,9 @@
-from django.contrib import admin
-from .models import Aplicacion, ContactMessage, AvailableSlot
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from .models import Aplicacion, ArchivedAppointment, ContactMessage, AvailableSlot, Job, WaitlistEntry
+from .booking import BookingUnavailable, delete_booking, save_booking
+from .tasks import status_change_jobs
+from .search import search
 
 @admin.register(Aplicacion)
 class AplicacionAdmin(admin.ModelAdmin):
@@ -12,7 +16,7 @@ class AplicacionAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Información básica', {
-            'fields': ('user', 'title', 'date', 'time', 'status')
+            'fields': ('user', 'title', 'date', 'time', 'duration', 'status')
         }),
         ('Detalles', {
             'fields': ('notes', 'admin_notes', 'approved_by')
@@ -23,6 +27,51 @@ class AplicacionAdmin(admin.ModelAdmin):
         }),
     )
 
+    # Capacidad y superposición las valida el formulario (full_clean llama a
+    # Aplicacion.clean): un horario lleno vuelve al formulario con el error
+    def save_model(self, request, obj, form, change):
+        # Mantiene la reserva de cupo sincronizada también desde el admin
+        jobs = status_change_jobs(obj) if change and 'status' in form.changed_data else ()
+        try:
+            save_booking(obj, jobs=jobs)
+        except BookingUnavailable as e:
+            # save_booking ya revirtió la cita: se informa en vez de un error 500
+            self.message_user(request, f"No se guardó la cita: {e}", level=messages.ERROR)
+            obj._booking_failed = True
+
+    # Sin historial ni mensaje de éxito cuando save_model no guardó la cita
+    def log_addition(self, request, obj, message):
+        if not getattr(obj, '_booking_failed', False):
+            return super().log_addition(request, obj, message)
+
+    def log_change(self, request, obj, message):
+        if not getattr(obj, '_booking_failed', False):
+            return super().log_change(request, obj, message)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        if getattr(obj, '_booking_failed', False):
+            return HttpResponseRedirect(request.path)
+        return super().response_add(request, obj, post_url_continue)
+
+    def response_change(self, request, obj):
+        if getattr(obj, '_booking_failed', False):
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
+    def delete_model(self, request, obj):
+        # El asiento liberado pasa a la lista de espera
+        delete_booking(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            delete_booking(obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Búsqueda sobre el índice de texto completo en vez de LIKE '%...%'
+        if not search_term:
+            return queryset, False
+        return search(queryset, 'citas', search_term), False
+
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'email', 'subject', 'is_read', 'created_at']
@@ -32,9 +81,44 @@ class ContactMessageAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search(queryset, 'mensajes', search_term), False
+
 @admin.register(AvailableSlot)
 class AvailableSlotAdmin(admin.ModelAdmin):
     list_display = ['id', 'day_of_week', 'start_time', 'end_time', 'max_appointments', 'is_active', 'created_by']
     list_filter = ['day_of_week', 'is_active', 'created_by']
     list_editable = ['is_active']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_after', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error']
+
+# Solo lectura: las citas llegan aquí con manage.py close_appointments
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'title', 'date', 'time', 'status', 'archived_at']
+    list_filter = ['status', 'date']
+    search_fields = ['user__username', 'user__email', 'title']
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# La prioridad reordena la cola de cada horario (mayor asciende primero)
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'date', 'start_time', 'time', 'priority', 'created_at']
+    list_filter = ['date']
+    list_editable = ['priority']
+    search_fields = ['user__username', 'user__email', 'title']
+    date_hierarchy = 'date'
+    readonly_fields = ['created_at']
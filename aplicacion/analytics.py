@@ -0,0 +1,168 @@
+"""
+Analítica de uso para el dashboard de trabajadores.
+
+Las citas (vigentes y archivadas) y los horarios del rango se leen una sola
+vez como columnas planas con values_list y las métricas se calculan con
+pandas/numpy, sin instanciar modelos ni recorrer el ORM por fila. El informe
+queda en la caché compartida bajo una clave versionada por citas y horarios.
+
+- Utilización: citas que ocupan cupo / capacidad ofrecida, por día de la
+  semana y hora de inicio del horario.
+- Cancelación e inasistencia por mes. No se registra asistencia: cuenta como
+  inasistencia la cita pasada que nunca se confirmó ('expired').
+- Anticipación: días entre la solicitud y la cita.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Aplicacion, ArchivedAppointment, AvailableSlot
+from .versioning import versioned_key
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+ANALYTICS_DEFAULT_DAYS = 365
+ANALYTICS_MAX_DAYS = 5 * 366
+
+# Estados que ocupan (u ocuparon) un cupo del horario
+USED_STATUSES = ('pending', 'confirmed', 'completed')
+# Tramos de anticipación en días: [0, 1), [1, 3), ... [90, ∞)
+LEAD_TIME_BINS = (0, 1, 3, 7, 14, 30, 60, 90)
+
+APPOINTMENT_COLUMNS = ('date', 'time', 'status', 'created_at')
+SLOT_COLUMNS = ('day_of_week', 'start_time', 'end_time', 'max_appointments')
+
+
+def _frame(queryset, columns):
+    return pd.DataFrame.from_records(list(queryset.values_list(*columns)), columns=list(columns))
+
+
+def _minutes(times):
+    """Columna de datetime.time -> minutos desde medianoche"""
+    return pd.Series(np.fromiter((t.hour * 60 + t.minute for t in times), dtype=int, count=len(times)),
+                     index=times.index)
+
+
+def load_appointments(start, end):
+    """Citas del rango [start, end] de la tabla principal y del archivo"""
+    frames = [
+        _frame(model.objects.filter(date__range=(start, end)).order_by(), APPOINTMENT_COLUMNS)
+        for model in (Aplicacion, ArchivedAppointment)
+    ]
+    citas = pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True)
+    citas['date'] = pd.to_datetime(citas['date'])
+    citas['weekday'] = citas['date'].dt.dayofweek.astype(int)
+    citas['minute'] = _minutes(citas['time'])
+    citas['created_at'] = pd.to_datetime(citas['created_at'], utc=True)
+    return citas.drop(columns='time')
+
+
+def load_slots():
+    slots = _frame(AvailableSlot.objects.filter(is_active=True).order_by(), SLOT_COLUMNS)
+    slots['start'] = _minutes(slots['start_time'])
+    slots['end'] = _minutes(slots['end_time'])
+    return slots.rename(columns={'day_of_week': 'weekday'})
+
+
+def _rate(part, total):
+    return np.divide(part, total, out=np.zeros(len(total)), where=total > 0).round(4).tolist()
+
+
+def utilization(citas, slots, start, end):
+    """Matriz día de la semana x hora con citas, capacidad y tasa de uso"""
+    # Veces que se repite cada día de la semana en el rango
+    occurrences = np.bincount(pd.date_range(start, end).dayofweek, minlength=7)
+    hours = sorted(set((slots['start'] // 60).tolist()))
+    booked = np.zeros((7, len(hours)), dtype=int)
+    capacity = np.zeros((7, len(hours)), dtype=int)
+    if hours:
+        column = {hour: i for i, hour in enumerate(hours)}
+        slot_hours = (slots['start'] // 60).map(column).to_numpy()
+        np.add.at(capacity, (slots['weekday'].to_numpy(), slot_hours),
+                  slots['max_appointments'].to_numpy() * occurrences[slots['weekday'].to_numpy()])
+
+        used = citas.loc[citas['status'].isin(USED_STATUSES), ['weekday', 'minute']].sort_values('minute')
+        # Cada cita al horario de su día que empezó antes o a la misma hora
+        matched = pd.merge_asof(
+            used, slots[['weekday', 'start', 'end']].sort_values('start'),
+            left_on='minute', right_on='start', by='weekday', direction='backward',
+        ).dropna(subset=['start'])
+        matched = matched[matched['minute'] < matched['end']]
+        np.add.at(booked, (matched['weekday'].to_numpy(dtype=int),
+                           (matched['start'] // 60).map(column).to_numpy(dtype=int)), 1)
+
+    return {
+        'hours': hours,
+        'booked': booked.tolist(),
+        'capacity': capacity.tolist(),
+        'rate': [_rate(row_booked, row_capacity) for row_booked, row_capacity in zip(booked, capacity)],
+        'by_weekday': _rate(booked.sum(axis=1), capacity.sum(axis=1)),
+        'by_hour': _rate(booked.sum(axis=0), capacity.sum(axis=0)),
+    }
+
+
+def outcome_rates(citas, today):
+    """Cancelación e inasistencia mensual de las citas ya pasadas"""
+    past = citas[citas['date'] < pd.Timestamp(today)]
+    monthly = past.assign(
+        month=past['date'].dt.to_period('M'),
+        cancelled=past['status'].eq('cancelled'),
+        no_show=past['status'].eq('expired'),
+    ).groupby('month').agg(total=('status', 'size'), cancelled=('cancelled', 'sum'), no_show=('no_show', 'sum'))
+    totals = monthly.sum()
+    total = int(totals.get('total', 0))
+    return {
+        'total': total,
+        'cancellation_rate': round(float(totals.get('cancelled', 0)) / total, 4) if total else 0.0,
+        'no_show_rate': round(float(totals.get('no_show', 0)) / total, 4) if total else 0.0,
+        'monthly': {
+            'months': monthly.index.astype(str).tolist(),
+            'total': monthly['total'].astype(int).tolist(),
+            'cancellation_rate': _rate(monthly['cancelled'].to_numpy(), monthly['total'].to_numpy()),
+            'no_show_rate': _rate(monthly['no_show'].to_numpy(), monthly['total'].to_numpy()),
+        },
+    }
+
+
+def lead_times(citas):
+    """Distribución de días entre la solicitud y la cita"""
+    local = citas['date'] + pd.to_timedelta(citas['minute'], unit='min')
+    starts = local.dt.tz_localize(timezone.get_current_timezone_name(), ambiguous='NaT', nonexistent='shift_forward')
+    days = ((starts - citas['created_at']).dt.total_seconds() / 86400).dropna().clip(lower=0).to_numpy()
+    counts, _ = np.histogram(days, bins=[*LEAD_TIME_BINS, np.inf])
+    labels = [f'{low}-{high}' for low, high in zip(LEAD_TIME_BINS, LEAD_TIME_BINS[1:])] + [f'{LEAD_TIME_BINS[-1]}+']
+    p50, p90 = np.percentile(days, [50, 90]).round(2).tolist() if len(days) else (None, None)
+    return {
+        'bins': labels,
+        'counts': counts.tolist(),
+        'median_days': p50,
+        'p90_days': p90,
+        'mean_days': round(float(days.mean()), 2) if len(days) else None,
+    }
+
+
+def compute_report(start, end):
+    citas = load_appointments(start, end)
+    slots = load_slots()
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'appointments': len(citas),
+        'utilization': utilization(citas, slots, start, end),
+        'outcomes': outcome_rates(citas, min(end + timedelta(days=1), timezone.localdate())),
+        'lead_time': lead_times(citas),
+    }
+
+
+def analytics_report(days=ANALYTICS_DEFAULT_DAYS, today=None):
+    """Informe de los últimos days días, desde la caché si no cambió nada"""
+    end = today or timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    key = versioned_key('worker-analytics', 'appointments', 'slots', extra=[start, end])
+    report = cache.get(key)
+    if report is None:
+        report = compute_report(start, end)
+        cache.set(key, report, ANALYTICS_CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,265 @@
+"""
+API REST v1 (/api/v1/) para clientes móviles y kioscos.
+
+- Autenticación JWT sin estado: el usuario sale del token (TokenUser), sin
+  sesión ni consulta a auth_user. Los roles se resuelven por id con la misma
+  caché versionada que las vistas HTML (roles.roles_for).
+- Permisos IsVip / IsWorker equivalentes a vip_required / worker_required.
+- Paginación por cursor, ?fields= para respuestas parciales y select_related
+  solo de las relaciones que usan los campos pedidos.
+- Endpoints en lote: estado de citas, alta de horarios y mensajes leídos.
+"""
+from django.contrib.auth.models import User
+from django.utils.decorators import method_decorator
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+
+from .booking import BookingConflict, BookingUnavailable, bulk_set_status, save_booking
+from .decorators import read_only
+from .models import Aplicacion, AvailableSlot, ContactMessage
+from .roles import roles_for
+from .schedule import ScheduleConflict, create_slots, update_slot
+from .search import search
+from .serializers import (
+    AppointmentSerializer, BatchStatusSerializer, IdsSerializer, MessageSerializer, SlotSerializer,
+    requested_fields,
+)
+from .tasks import status_change_jobs
+from .versioning import bump_version
+
+
+def api_roles(request):
+    """Roles del usuario del token, una vez por petición"""
+    roles = getattr(request, '_api_roles', None)
+    if roles is None:
+        roles = request._api_roles = roles_for(int(request.user.id), request.user.is_staff)
+    return roles
+
+
+def _user_id(request):
+    return int(request.user.id)
+
+
+class IsVip(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and api_roles(request).is_vip)
+
+
+class IsWorker(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and api_roles(request).is_worker)
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Este horario ya alcanzó su capacidad máxima.'
+    default_code = 'conflict'
+
+
+class Busy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'El sistema está ocupado, intenta nuevamente.'
+    default_code = 'busy'
+
+
+class ApiPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class AppointmentPagination(ApiPagination):
+    ordering = ('-date', '-time', '-id')
+
+
+class SlotPagination(ApiPagination):
+    ordering = ('day_of_week', 'start_time', 'id')
+
+
+class MessagePagination(ApiPagination):
+    ordering = ('-created_at', '-id')
+
+
+@method_decorator(read_only, name='dispatch')
+class SparseViewSet(viewsets.GenericViewSet):
+    """Las lecturas van por la conexión de solo lectura y precargan lo pedido"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        related = self.get_serializer_class().related_for(requested_fields(self.request))
+        return queryset.select_related(*related) if related else queryset
+
+
+# ============================================
+# CITAS
+# ============================================
+
+class AppointmentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                         mixins.CreateModelMixin, SparseViewSet):
+    """
+    VIP: sus citas, solicitar (POST) y cancelar. Trabajadores: todas las
+    citas, filtros y cambio de estado en lote.
+    """
+    queryset = Aplicacion.objects.all()
+    serializer_class = AppointmentSerializer
+    pagination_class = AppointmentPagination
+
+    def get_permissions(self):
+        if self.action in ('create', 'cancel'):
+            return [IsVip()]
+        if self.action == 'batch_status':
+            return [IsWorker()]
+        return [(IsVip | IsWorker)()]
+
+    def get_queryset(self):
+        citas = super().get_queryset()
+        if self.action == 'cancel' or not api_roles(self.request).is_worker:
+            citas = citas.filter(user_id=_user_id(self.request))
+        params = self.request.query_params
+        if params.get('status'):
+            citas = citas.filter(status=params['status'])
+        if params.get('date_from'):
+            citas = citas.filter(date__gte=params['date_from'])
+        if params.get('date_to'):
+            citas = citas.filter(date__lte=params['date_to'])
+        if params.get('q'):
+            citas = search(citas, 'citas', params['q'])
+        return citas
+
+    def get_serializer_context(self):
+        return {
+            **super().get_serializer_context(),
+            'user_id': _user_id(self.request),
+            'is_worker': api_roles(self.request).is_worker,
+        }
+
+    def perform_create(self, serializer):
+        cita = Aplicacion(user_id=_user_id(self.request), status='pending', **serializer.validated_data)
+        try:
+            serializer.instance = save_booking(cita)
+        except BookingConflict as e:
+            raise Conflict(str(e))
+        except BookingUnavailable as e:
+            raise Busy(str(e))
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        cita = self.get_object()
+        if cita.status not in Aplicacion.ACTIVE_STATUSES:
+            raise Conflict('No se puede cancelar esta cita.')
+        cita.status = 'cancelled'
+        try:
+            save_booking(cita, jobs=status_change_jobs(cita))
+        except BookingConflict as e:
+            raise Conflict(str(e))
+        except BookingUnavailable as e:
+            raise Busy(str(e))
+        return Response(self.get_serializer(cita).data)
+
+    @action(detail=False, methods=['post'], url_path='batch-status')
+    def batch_status(self, request):
+        """Body: {"ids": [...], "status": "confirmed" | "cancelled"}"""
+        serializer = BatchStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            # Basta una referencia por pk: bulk_set_status solo usa el id
+            result = bulk_set_status(serializer.validated_data['ids'], serializer.validated_data['status'],
+                                     User(pk=_user_id(request)))
+        except BookingConflict as e:
+            raise Conflict(str(e))
+        except BookingUnavailable as e:
+            raise Busy(str(e))
+        return Response(result)
+
+
+# ============================================
+# HORARIOS
+# ============================================
+
+class SlotViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin,
+                  mixins.UpdateModelMixin, mixins.DestroyModelMixin, SparseViewSet):
+    """Lectura para VIP y trabajadores; cada trabajador edita sus horarios"""
+    queryset = AvailableSlot.objects.all()
+    serializer_class = SlotSerializer
+    pagination_class = SlotPagination
+
+    def get_permissions(self):
+        if self.action in ('list', 'retrieve'):
+            return [(IsVip | IsWorker)()]
+        return [IsWorker()]
+
+    def get_queryset(self):
+        slots = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return slots.filter(created_by_id=_user_id(self.request))
+        if not api_roles(self.request).is_worker:
+            slots = slots.filter(is_active=True)
+        return slots
+
+    # Alta y edición pasan por la misma validación de solapes que el alta en lote
+    def perform_create(self, serializer):
+        slot = AvailableSlot(created_by_id=_user_id(self.request), **serializer.validated_data)
+        try:
+            serializer.instance = create_slots([slot])[0]
+        except ScheduleConflict as e:
+            raise Conflict(e.errors)
+
+    def perform_update(self, serializer):
+        try:
+            update_slot(serializer.instance, **serializer.validated_data)
+        except ScheduleConflict as e:
+            raise Conflict(e.errors)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Body: lista de horarios; se crean todos o ninguno"""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        user_id = _user_id(request)
+        try:
+            slots = create_slots([AvailableSlot(created_by_id=user_id, **data) for data in serializer.validated_data])
+        except ScheduleConflict as e:
+            raise Conflict(e.errors)
+        return Response({'created': [slot.pk for slot in slots]}, status=status.HTTP_201_CREATED)
+
+
+# ============================================
+# MENSAJES DE CONTACTO
+# ============================================
+
+class MessageViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, SparseViewSet):
+    queryset = ContactMessage.objects.all()
+    serializer_class = MessageSerializer
+    pagination_class = MessagePagination
+    permission_classes = [IsWorker]
+
+    def get_queryset(self):
+        mensajes = super().get_queryset()
+        params = self.request.query_params
+        if params.get('is_read') in ('true', 'false'):
+            mensajes = mensajes.filter(is_read=params['is_read'] == 'true')
+        if params.get('q'):
+            mensajes = search(mensajes, 'mensajes', params['q'])
+        return mensajes
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """Body: {"ids": [...]}"""
+        serializer = IdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = ContactMessage.objects.filter(
+            pk__in=serializer.validated_data['ids'], is_read=False,
+        ).update(is_read=True)
+        if updated:
+            bump_version('messages')
+        return Response({'updated': updated})
+
+
+router = DefaultRouter()
+router.register('appointments', AppointmentViewSet, basename='api-appointment')
+router.register('slots', SlotViewSet, basename='api-slot')
+router.register('messages', MessageViewSet, basename='api-message')
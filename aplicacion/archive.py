@@ -0,0 +1,85 @@
+"""
+Cierre y archivo de citas pasadas.
+
+close_past() pasa a 'completed' las citas confirmadas con fecha anterior a hoy
+y a 'expired' las que siguen pendientes (nunca se aprobaron), liberando sus
+asientos. archive_old() mueve las citas cerradas más antiguas que la ventana
+de retención a ArchivedAppointment. Así la tabla de citas crece con el
+horizonte de reservas y no con la antigüedad del negocio.
+
+Ambas trabajan por lotes de ids, con un UPDATE / INSERT + DELETE por lote en
+una transacción corta: SQLite tiene un solo escritor y un lote enorme
+bloquearía las reservas durante toda la operación.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Aplicacion, ArchivedAppointment, Reservation
+from .versioning import bump_version, deferred_bumps
+
+ARCHIVE_BATCH_SIZE = 500
+
+# Estado activo -> estado final de una cita cuya fecha ya pasó
+CLOSING_STATUSES = {'confirmed': 'completed', 'pending': 'expired'}
+
+ARCHIVED_FIELDS = [
+    'id', 'user_id', 'title', 'date', 'time', 'duration', 'status', 'notes',
+    'approved_by_id', 'admin_notes', 'created_at', 'updated_at',
+]
+
+
+def _batches(queryset, size):
+    """
+    Lotes de ids del queryset. Se vuelve a consultar en cada vuelta: las filas
+    procesadas dejan de cumplir el filtro, así que no hace falta un offset.
+    """
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+
+
+def past_appointments(today):
+    """Citas activas con fecha anterior a today, por estado actual"""
+    return {
+        status: Aplicacion.objects.filter(status=status, date__lt=today).order_by()
+        for status in CLOSING_STATUSES
+    }
+
+
+def archivable(cutoff):
+    """Citas cerradas con fecha anterior a cutoff"""
+    return Aplicacion.objects.filter(status__in=Aplicacion.CLOSED_STATUSES, date__lt=cutoff).order_by()
+
+
+def close_past(today=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Cierra las citas pasadas; devuelve {estado final: cantidad}"""
+    today = today or timezone.localdate()
+    totals = dict.fromkeys(CLOSING_STATUSES.values(), 0)
+    for status, queryset in past_appointments(today).items():
+        closed = CLOSING_STATUSES[status]
+        for ids in _batches(queryset, batch_size):
+            with transaction.atomic():
+                # Los asientos ya no cuentan (los triggers ajustan SlotOccupancy)
+                Reservation.objects.filter(cita_id__in=ids).delete()
+                totals[closed] += Aplicacion.objects.filter(pk__in=ids, status=status).update(
+                    status=closed, updated_at=timezone.now(),
+                )
+    if any(totals.values()):
+        # update() no emite post_save: se invalida la caché a mano
+        bump_version('appointments')
+    return totals
+
+
+def archive_old(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Mueve al archivo las citas cerradas anteriores a cutoff; devuelve cuántas"""
+    moved = 0
+    for ids in _batches(archivable(cutoff), batch_size):
+        with transaction.atomic():
+            rows = Aplicacion.objects.filter(pk__in=ids).values(*ARCHIVED_FIELDS)
+            ArchivedAppointment.objects.bulk_create(ArchivedAppointment(**row) for row in rows)
+            # post_delete invalidaría la caché una vez por fila: una sola al confirmar el lote
+            with deferred_bumps():
+                moved += Aplicacion.objects.filter(pk__in=ids).delete()[1].get('aplicacion.Aplicacion', 0)
+    return moved
@@ -0,0 +1,212 @@
+"""
+Motor de disponibilidad.
+
+Cruza las reglas semanales de AvailableSlot con la ocupación materializada
+(SlotOccupancy, ver occupancy.py) de un rango de fechas. Se leen las filas de
+ocupación del rango, no las citas; las consultas de capacidad posteriores son
+búsquedas en memoria.
+
+La capacidad se cuenta por horario (asientos). Además, una cita no puede
+superponerse en el tiempo con citas de otro horario (IntervalIndex): dos
+citas fuera de los slots a las 10:00 y 10:15, o una que se extiende hasta el
+slot siguiente.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from datetime import time as dt_time, timedelta
+
+from . import occupancy
+from .models import Aplicacion, AvailableSlot, Reservation
+
+# Ocurrencia concreta de un slot semanal en una fecha
+SlotOccurrence = namedtuple('SlotOccurrence', ['date', 'slot', 'booked', 'remaining'])
+
+# Colores de fondo para el calendario
+FREE_COLOR = '#28A745'
+FULL_COLOR = '#DC3545'
+
+
+class AvailabilityMap:
+    """Mapa libre/ocupado de un rango de fechas [start, end]"""
+
+    def __init__(self, start, end, slots, booked):
+        self.start = start
+        self.end = end
+
+        # Slots agrupados por día de la semana y ordenados por hora de inicio
+        self._slots_by_weekday = {}
+        for slot in sorted(slots, key=lambda s: (s.day_of_week, s.start_time)):
+            self._slots_by_weekday.setdefault(slot.day_of_week, []).append(slot)
+        self._starts_by_weekday = {
+            day: [slot.start_time for slot in day_slots]
+            for day, day_slots in self._slots_by_weekday.items()
+        }
+
+        # Asientos tomados por (fecha, inicio del slot o hora exacta)
+        self._booked = booked
+
+    def covers(self, date):
+        return self.start <= date <= self.end
+
+    def slot_for(self, date, time):
+        """Slot activo que cubre la hora indicada, o None"""
+        day_slots = self._slots_by_weekday.get(date.weekday())
+        if not day_slots:
+            return None
+        index = bisect_right(self._starts_by_weekday[date.weekday()], time)
+        # Se recorre hacia atrás por si hay slots superpuestos
+        for slot in reversed(day_slots[:index]):
+            if time < slot.end_time:
+                return slot
+        return None
+
+    def booked(self, date, slot):
+        return self._booked.get((date, slot.start_time), 0)
+
+    def bucket_for(self, date, time):
+        """Inicio del slot que cubre la hora, o la hora exacta fuera de los slots"""
+        slot = self.slot_for(date, time)
+        return slot.start_time if slot else time
+
+    def default_duration(self, date, time):
+        """Minutos hasta el fin del slot; fuera de los slots, Aplicacion.DEFAULT_DURATION"""
+        slot = self.slot_for(date, time)
+        if slot is None:
+            return Aplicacion.DEFAULT_DURATION
+        return min(minutes(slot.end_time) - minutes(time), Aplicacion.MAX_DURATION)
+
+    def remaining(self, date, time):
+        """Cupos libres del slot que cubre la hora, o None si no hay slot"""
+        slot = self.slot_for(date, time)
+        if slot is None:
+            return None
+        return max(slot.max_appointments - self.booked(date, slot), 0)
+
+    def can_book(self, date, time):
+        """
+        Dentro de un slot se respeta max_appointments. Fuera de los slots
+        configurados se mantiene la regla original: una cita por hora exacta.
+        """
+        remaining = self.remaining(date, time)
+        if remaining is None:
+            return self._booked.get((date, time), 0) == 0
+        return remaining > 0
+
+    def occurrences(self):
+        """Ocurrencias de cada slot dentro del rango, en orden cronológico"""
+        day = self.start
+        while day <= self.end:
+            for slot in self._slots_by_weekday.get(day.weekday(), []):
+                booked = self.booked(day, slot)
+                yield SlotOccurrence(
+                    date=day,
+                    slot=slot,
+                    booked=booked,
+                    remaining=max(slot.max_appointments - booked, 0),
+                )
+            day += timedelta(days=1)
+
+    def as_events(self):
+        """Eventos de fondo para FullCalendar"""
+        return [
+            {
+                "start": f"{occ.date}T{occ.slot.start_time}",
+                "end": f"{occ.date}T{occ.slot.end_time}",
+                "display": "background",
+                "backgroundColor": FREE_COLOR if occ.remaining else FULL_COLOR,
+                "extendedProps": {
+                    "slot": occ.slot.pk,
+                    "capacity": occ.slot.max_appointments,
+                    "booked": occ.booked,
+                    "remaining": occ.remaining,
+                },
+            }
+            for occ in self.occurrences()
+        ]
+
+
+def minutes(value):
+    """Minutos desde la medianoche"""
+    return value.hour * 60 + value.minute
+
+
+def clock(value):
+    """Hora que corresponde a value minutos (se satura en 00:00 y 23:59)"""
+    return dt_time(*divmod(min(max(value, 0), 24 * 60 - 1), 60))
+
+
+class IntervalIndex:
+    """
+    Citas activas como intervalos [inicio, fin) en minutos, por fecha y
+    ordenados por inicio. Ninguna cita dura más de Aplicacion.MAX_DURATION,
+    así que las que pueden superponerse con [start, end) empiezan dentro de
+    [start - MAX_DURATION, end): una búsqueda binaria y un recorrido acotado.
+    Las citas del mismo horario no se comparan: ahí rige la capacidad.
+    """
+
+    def __init__(self, availability):
+        self._availability = availability
+        self._days = {}
+
+    def _interval(self, date, time, duration):
+        start = minutes(time)
+        return start, start + (duration or self._availability.default_duration(date, time))
+
+    def add(self, date, time, duration=None, pk=None):
+        start, end = self._interval(date, time, duration)
+        insort(self._days.setdefault(date, []), (start, end, self._availability.bucket_for(date, time), pk or 0))
+
+    def overlapping(self, date, time, duration=None, exclude_pk=None):
+        """(inicio, fin) de una cita de otro horario que se superpone, o None"""
+        start, end = self._interval(date, time, duration)
+        bucket = self._availability.bucket_for(date, time)
+        rows = self._days.get(date, [])
+        lower = start - Aplicacion.MAX_DURATION
+        for index in range(bisect_left(rows, (end,)) - 1, -1, -1):
+            other_start, other_end, other_bucket, pk = rows[index]
+            if other_start < lower:
+                break
+            if other_end > start and other_bucket != bucket and pk != exclude_pk:
+                return clock(other_start), clock(other_end)
+        return None
+
+
+def build_intervals(availability, dates, start=None, end=None):
+    """
+    Índice de las citas activas de dates. Con start/end (minutos) se leen
+    solo las que pueden superponerse con esa franja: consulta por rango sobre
+    cita_date_time_status_idx, no un recorrido de las citas del día.
+    """
+    citas = Aplicacion.objects.filter(date__in=dates, status__in=Aplicacion.ACTIVE_STATUSES).order_by()
+    if start is not None and start > Aplicacion.MAX_DURATION:
+        citas = citas.filter(time__gte=clock(start - Aplicacion.MAX_DURATION))
+    if end is not None and end < 24 * 60:
+        citas = citas.filter(time__lt=clock(end))
+    index = IntervalIndex(availability)
+    for pk, date, time, duration in citas.values_list('id', 'date', 'time', 'duration'):
+        index.add(date, time, duration, pk)
+    return index
+
+
+def find_overlap(availability, date, time, duration=None, exclude_pk=None):
+    """(inicio, fin) de una cita activa de otro horario que se superpone, o None"""
+    start = minutes(time)
+    end = start + (duration or availability.default_duration(date, time))
+    return build_intervals(availability, [date], start, end).overlapping(date, time, duration, exclude_pk)
+
+
+def build_availability(start, end=None, exclude_pk=None):
+    """
+    Construye el mapa de disponibilidad con dos consultas (tres con
+    exclude_pk: el asiento de la cita que se edita no cuenta en su contra)
+    """
+    end = end or start
+    slots = AvailableSlot.objects.filter(is_active=True).only(
+        'id', 'day_of_week', 'start_time', 'end_time', 'max_appointments'
+    )
+    booked = occupancy.counts(start, end)
+    if exclude_pk is not None:
+        own = Reservation.objects.filter(cita_id=exclude_pk).values_list('date', 'start_time').first()
+        if own in booked:
+            booked[own] -= 1
+    return AvailabilityMap(start, end, list(slots), booked)
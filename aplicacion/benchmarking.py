@@ -0,0 +1,152 @@
+"""
+Utilidades compartidas por los comandos de benchmark.
+
+Los benchmarks corren sobre una base de datos de prueba desechable (igual que
+el test runner) y una caché en un directorio temporal, de modo que nunca tocan
+db.sqlite3 ni la caché del proyecto.
+"""
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, time as dtime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+
+from .instrumentation import QueryRecorder
+from .models import Aplicacion, AvailableSlot, ContactMessage, Reservation
+from .roles import VIP_GROUP, WORKER_GROUP
+
+BENCH_PASSWORD = 'benchmark-123'
+
+
+@contextmanager
+def isolated_environment(keepdb=False, database_name=None):
+    """
+    Base de datos de prueba y caché temporal durante el bloque; entrega la
+    ruta de la caché. Con database_name la base de prueba es ese archivo
+    (en vez de memoria), para que otros procesos puedan abrirla.
+    """
+    setup_test_environment()
+    if database_name is not None:
+        connection.settings_dict['TEST']['NAME'] = database_name
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    caches = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir,
+        }
+    }
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        # Sin límite de solicitudes: los benchmarks repiten escrituras a propósito
+        with override_settings(CACHES=caches, ALLOWED_HOSTS=['*'], RATE_LIMIT_ENABLED=False):
+            yield cache_dir
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def seed_dataset(vips=50, appointments=2000, messages=200, days_back=180, days_ahead=60, seed=42):
+    """
+    Crea VIPs, un trabajador, horarios de lunes a viernes (9:00-18:00, bloques
+    de una hora con 3 cupos), citas repartidas entre estados y fechas, y
+    mensajes de contacto. Devuelve un dict con los objetos principales.
+    """
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)
+
+    vip_group, _ = Group.objects.get_or_create(name=VIP_GROUP)
+    worker_group, _ = Group.objects.get_or_create(name=WORKER_GROUP)
+    worker = User.objects.create(username='bench-worker', password=password, is_staff=True)
+    worker.groups.add(worker_group)
+
+    users = User.objects.bulk_create(
+        User(username=f'bench-vip-{i}', email=f'vip{i}@example.com', password=password)
+        for i in range(vips)
+    )
+    vip_group.user_set.add(*users)
+
+    slots = AvailableSlot.objects.bulk_create(
+        AvailableSlot(
+            day_of_week=day, start_time=dtime(hour), end_time=dtime(hour + 1),
+            max_appointments=3, created_by=worker,
+        )
+        for day in range(5)
+        for hour in range(9, 18)
+    )
+
+    today = date.today()
+    statuses = [code for code, _ in Aplicacion.STATUS_CHOICES]
+    citas = []
+    for i in range(appointments):
+        day = today + timedelta(days=rng.randint(-days_back, days_ahead))
+        if day.weekday() > 4:
+            day -= timedelta(days=day.weekday() - 4)
+        citas.append(Aplicacion(
+            user=rng.choice(users),
+            title=f'Cita {i}',
+            date=day,
+            time=dtime(rng.randint(9, 17)),
+            status=rng.choice(statuses),
+            notes=rng.choice(['', 'Consulta general', 'Control', 'Primera visita']),
+        ))
+    citas = Aplicacion.objects.bulk_create(citas)
+
+    # Asientos para las citas activas (mismo criterio que la migración 0003)
+    seats = {}
+    reservations = []
+    for cita in citas:
+        if cita.status not in Aplicacion.ACTIVE_STATUSES:
+            continue
+        key = (cita.date, cita.time)
+        seats[key] = seats.get(key, -1) + 1
+        reservations.append(Reservation(cita=cita, date=cita.date, start_time=cita.time, seat=seats[key]))
+    Reservation.objects.bulk_create(reservations)
+
+    ContactMessage.objects.bulk_create(
+        ContactMessage(
+            name=f'Visitante {i}', email=f'visita{i}@example.com',
+            subject='Consulta', message='Hola, quisiera más información.',
+            is_read=rng.random() < 0.5,
+        )
+        for i in range(messages)
+    )
+    return {'worker': worker, 'vips': users, 'slots': slots, 'citas': citas}
+
+
+def measure(func, repeat=5, setup=None):
+    """
+    Ejecuta func repeat veces; devuelve medianas de tiempo, consultas y tiempo
+    SQL. setup, si se indica, corre antes de cada repetición sin medirse.
+    """
+    walls, sql_times, query_counts = [], [], []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        timer = QueryRecorder()
+        with connection.execute_wrapper(timer):
+            start = time.perf_counter()
+            func()
+            walls.append((time.perf_counter() - start) * 1000)
+        query_counts.append(timer.count)
+        sql_times.append(timer.seconds * 1000)
+    return {
+        'wall_ms': round(statistics.median(walls), 2),
+        'queries': int(statistics.median(query_counts)),
+        'sql_ms': round(statistics.median(sql_times), 2),
+    }
+
+
+def percentile(values, pct):
+    """Percentil pct (0-100) por el método del rango más cercano"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
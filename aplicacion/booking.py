@@ -0,0 +1,276 @@
+"""
+Reserva atómica de cupos.
+
+Las citas activas ocupan un asiento (Reservation) dentro de su horario. El
+asiento se inserta en la misma transacción que la cita y la restricción única
+de la base de datos garantiza que nunca haya más asientos que capacidad, aun
+con varios workers de gunicorn procesando solicitudes simultáneas. Un asiento
+liberado pasa en esa misma transacción al primero de la lista de espera
+(waitlist.py).
+
+Una cita que toma asiento tampoco puede superponerse con citas de otro
+horario (availability.IntervalIndex). Esa verificación corre después de
+guardar la cita: en SQLite la escritura ya tomó el bloqueo de la base, así
+que ningún otro proceso puede confirmar una cita superpuesta entre la
+lectura y el commit.
+"""
+import time
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+
+from .availability import build_availability, build_intervals, find_overlap
+from .jobs import enqueue_many
+from .models import Aplicacion, Reservation
+from .tasks import status_change_jobs
+from .versioning import bump_version
+from .waitlist import promote
+
+# Reintentos cuando SQLite reporta la base bloqueada por otro escritor
+BOOKING_RETRIES = 5
+BOOKING_RETRY_DELAY = 0.05
+
+
+class BookingConflict(Exception):
+    """El horario no tiene cupos disponibles"""
+
+
+class BookingOverlap(BookingConflict):
+    """La cita se superpone con una cita de otro horario"""
+
+
+class BookingUnavailable(Exception):
+    """La base de datos siguió ocupada tras agotar los reintentos"""
+
+
+def _availability(cita):
+    """Mapa de la fecha de la cita; reutiliza el de la vista si la cubre"""
+    availability = getattr(cita, '_availability', None)
+    if availability is None or not availability.covers(cita.date):
+        availability = build_availability(cita.date, exclude_pk=cita.pk)
+    return availability
+
+
+def _bucket(cita, availability):
+    """Inicio del horario y capacidad que corresponden a la cita"""
+    slot = availability.slot_for(cita.date, cita.time)
+    if slot is None:
+        # Fuera de los slots configurados: una cita por hora exacta
+        return cita.time, 1
+    return slot.start_time, slot.max_appointments
+
+
+def _check_overlap(cita, availability):
+    overlap = find_overlap(availability, cita.date, cita.time, cita.duration, exclude_pk=cita.pk)
+    if overlap is not None:
+        raise BookingOverlap(f'Se superpone con otra cita de {overlap[0]:%H:%M} a {overlap[1]:%H:%M}.')
+
+
+def _reserve(cita, start_time, capacity, availability):
+    taken = set(
+        Reservation.objects.filter(date=cita.date, start_time=start_time)
+        .values_list('seat', flat=True)
+    )
+    for seat in range(capacity):
+        if seat in taken:
+            continue
+        try:
+            # Savepoint: si otro proceso tomó el asiento se prueba el siguiente
+            with transaction.atomic():
+                Reservation.objects.create(cita=cita, date=cita.date, start_time=start_time, seat=seat)
+            return
+        except IntegrityError:
+            continue
+    raise BookingConflict('Este horario ya alcanzó su capacidad máxima.')
+
+
+def _release(reservations):
+    """Libera los asientos y asciende a la lista de espera de cada horario"""
+    buckets = set(reservations.values_list('date', 'start_time'))
+    if not buckets:
+        return
+    reservations.delete()
+    for date, start_time in sorted(buckets):
+        promote(date, start_time)
+
+
+def _sync(cita, adding, save_kwargs):
+    active = cita.status in Aplicacion.ACTIVE_STATUSES
+    availability = _availability(cita) if active else None
+    if active:
+        limit = availability.default_duration(cita.date, cita.time)
+        if cita.duration is None:
+            cita.duration = limit
+        elif availability.slot_for(cita.date, cita.time) is not None:
+            # Ocupa un asiento de su slot: no puede pasarse al siguiente y bloquearlo entero
+            cita.duration = min(cita.duration, limit)
+    cita.save(**save_kwargs)
+    if not active:
+        _release(Reservation.objects.filter(cita=cita))
+        return
+    # Toda cita activa se valida, también si cambia hora o duración sin salir de su horario
+    _check_overlap(cita, availability)
+    start_time, capacity = _bucket(cita, availability)
+    if not adding:
+        current = Reservation.objects.filter(cita=cita).first()
+        if current is not None:
+            if (current.date, current.start_time) == (cita.date, start_time):
+                return
+            current.delete()
+            _reserve(cita, start_time, capacity, availability)
+            promote(current.date, current.start_time)
+            return
+    _reserve(cita, start_time, capacity, availability)
+
+
+def _rollback_instance(cita, adding):
+    # La transacción se revirtió: la cita nueva vuelve a no tener pk
+    if adding:
+        cita.pk = None
+        cita._state.adding = True
+
+
+def save_booking(cita, jobs=(), **save_kwargs):
+    """
+    Guarda la cita y sincroniza su asiento en una sola transacción.
+
+    jobs son trabajos (nombre, payload) que se encolan en esa misma
+    transacción. Lanza BookingConflict si el horario está lleno; en ese caso
+    ni la cita ni los trabajos quedan guardados.
+    """
+    adding = cita._state.adding
+    for attempt in range(BOOKING_RETRIES):
+        try:
+            with transaction.atomic():
+                _sync(cita, adding, save_kwargs)
+                if jobs:
+                    enqueue_many(jobs)
+            return cita
+        except BookingConflict:
+            _rollback_instance(cita, adding)
+            raise
+        except OperationalError:
+            # SQLite: "database is locked"; se reintenta con espera creciente
+            _rollback_instance(cita, adding)
+            if attempt == BOOKING_RETRIES - 1:
+                raise BookingUnavailable('El sistema está ocupado, intenta nuevamente.')
+            time.sleep(BOOKING_RETRY_DELAY * (attempt + 1))
+
+
+def delete_booking(cita):
+    """Elimina la cita y cede su asiento a la lista de espera en una transacción"""
+    with transaction.atomic():
+        _release(Reservation.objects.filter(cita=cita))
+        cita.delete()
+
+
+# Estados que un trabajador puede asignar en lote (confirmar / rechazar)
+BULK_STATUSES = ('confirmed', 'cancelled')
+# Máximo de citas por operación en lote
+BULK_MAX_ITEMS = 500
+
+
+def bulk_set_status(pks, status, user):
+    """
+    Cambia el estado de varias citas en una sola transacción.
+
+    Solo se escriben status, approved_by y updated_at (bulk_update). Las citas
+    que vuelven a ocupar cupo se validan juntas contra los asientos libres de
+    sus horarios y las citas de otros horarios; las que no caben o se
+    superponen se omiten y se informan en 'conflicts'.
+    Devuelve un dict con las listas de ids 'updated', 'unchanged' y 'conflicts'.
+    Los asientos liberados pasan a la lista de espera. De user (quien
+    aprueba) solo se usa el pk. Como save_booking, reintenta si la base está
+    bloqueada y lanza BookingUnavailable al agotar los reintentos.
+    """
+    if status not in BULK_STATUSES:
+        raise ValueError(f'Estado no permitido: {status}')
+    pks = list(pks)[:BULK_MAX_ITEMS]
+
+    for attempt in range(BOOKING_RETRIES):
+        try:
+            return _bulk_set_status(pks, status, user)
+        except OperationalError:
+            if attempt == BOOKING_RETRIES - 1:
+                raise BookingUnavailable('El sistema está ocupado, intenta nuevamente.')
+            time.sleep(BOOKING_RETRY_DELAY * (attempt + 1))
+
+
+def _bulk_set_status(pks, status, user):
+    with transaction.atomic():
+        citas = list(
+            Aplicacion.objects.filter(pk__in=pks)
+            .only('id', 'date', 'time', 'duration', 'status', 'approved_by', 'updated_at')
+        )
+        changed = [cita for cita in citas if cita.status != status]
+        unchanged = [cita.pk for cita in citas if cita.status == status]
+        conflicts = []
+
+        if status in Aplicacion.ACTIVE_STATUSES:
+            reactivated = [cita for cita in changed if cita.status not in Aplicacion.ACTIVE_STATUSES]
+            if reactivated:
+                seated, conflicts = _seat_many(reactivated)
+                rejected = set(conflicts)
+                changed = [cita for cita in changed if cita.pk not in rejected]
+                try:
+                    Reservation.objects.bulk_create(seated)
+                except IntegrityError:
+                    # Otro proceso tomó un asiento entre la lectura y la escritura
+                    raise BookingConflict('Los cupos cambiaron durante la operación, intenta nuevamente.')
+        else:
+            _release(Reservation.objects.filter(cita__in=changed))
+
+        now = timezone.now()
+        for cita in changed:
+            cita.status = status
+            cita.approved_by_id = user.pk
+            cita.updated_at = now
+        Aplicacion.objects.bulk_update(changed, ['status', 'approved_by', 'updated_at'])
+        enqueue_many(job for cita in changed for job in status_change_jobs(cita))
+        if changed:
+            # bulk_update no emite post_save: se invalida la caché a mano
+            transaction.on_commit(lambda: bump_version('appointments'))
+
+    return {
+        'updated': [cita.pk for cita in changed],
+        'unchanged': unchanged,
+        'conflicts': conflicts,
+    }
+
+
+def _seat_many(citas):
+    """
+    Asigna asientos a varias citas leyendo los ocupados en una sola consulta;
+    las superposiciones se buscan en un índice en memoria de esas fechas
+    """
+    dates = [cita.date for cita in citas]
+    availability = build_availability(min(dates), max(dates))
+    intervals = build_intervals(availability, set(dates))
+    buckets = {}
+    for cita in citas:
+        slot = availability.slot_for(cita.date, cita.time)
+        if slot is None:
+            buckets[cita.pk] = (cita.date, cita.time, 1)
+        else:
+            buckets[cita.pk] = (cita.date, slot.start_time, slot.max_appointments)
+
+    taken = {}
+    rows = Reservation.objects.filter(
+        date__in={date for date, _, _ in buckets.values()},
+        start_time__in={start for _, start, _ in buckets.values()},
+    ).values_list('date', 'start_time', 'seat')
+    for date, start, seat in rows:
+        taken.setdefault((date, start), set()).add(seat)
+
+    seated, conflicts = [], []
+    for cita in citas:
+        date, start, capacity = buckets[cita.pk]
+        used = taken.setdefault((date, start), set())
+        free = next((seat for seat in range(capacity) if seat not in used), None)
+        if free is None or intervals.overlapping(cita.date, cita.time, cita.duration, exclude_pk=cita.pk):
+            conflicts.append(cita.pk)
+            continue
+        used.add(free)
+        intervals.add(cita.date, cita.time, cita.duration, cita.pk)
+        seated.append(Reservation(cita=cita, date=date, start_time=start, seat=free))
+    return seated, conflicts
@@ -0,0 +1,5 @@
+from .roles import get_roles
+
+# Expone los roles en los templates como {{ roles.is_vip }} / {{ roles.is_worker }}
+def roles(request):
+    return {'roles': get_roles(request)}
@@ -1,33 +1,158 @@
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
 from django.contrib.auth.decorators import user_passes_test
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
+import math
+import time
+from .roles import aget_roles, get_roles, resolve_roles
+from .routers import reading
 
 # Verifica si el usuario es VIP
 def is_vip(user):
-    return user.groups.filter(name='VIP').exists()
+    return resolve_roles(user).is_vip
 
 # Verifica si el usuario es Trabajador
 def is_worker(user):
-    return user.groups.filter(name='Trabajadores').exists() or user.is_staff
+    return resolve_roles(user).is_worker
+
+# Redirige a login / home si el usuario no tiene el rol; admite vistas async
+def _role_required(role):
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                if not user.is_authenticated:
+                    return redirect('login')
+                if not getattr(await aget_roles(request), role):
+                    return redirect('home')
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect('login')
+            if not getattr(get_roles(request), role):
+                return redirect('home')
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
 
 # Decorador para vistas que requieren VIP
-def vip_required(view_func):
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            return redirect('login')
-        if not is_vip(request.user):
-            return redirect('home')
-        return view_func(request, *args, **kwargs)
-    return wrapper
+vip_required = _role_required('is_vip')
 
 # Decorador para vistas que requieren Trabajador
-def worker_required(view_func):
+worker_required = _role_required('is_worker')
+
+# Las lecturas de GET/HEAD van por la conexión de solo lectura (routers.py);
+# va debajo de vip_required / worker_required
+def read_only(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view_func(request, *args, **kwargs)
+            with reading():
+                return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            return redirect('login')
-        if not is_worker(request.user):
-            return redirect('home')
-        return view_func(request, *args, **kwargs)
-    return wrapper
\ No newline at end of file
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        with reading():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+# ============================================
+# LÍMITE DE SOLICITUDES (token bucket)
+# ============================================
+
+RATE_LIMIT_MESSAGE = "Demasiadas solicitudes. Intenta nuevamente en unos segundos."
+
+def client_ip(request):
+    """IP del cliente; con RATE_LIMIT_PROXIES > 0 se lee de X-Forwarded-For"""
+    proxies = getattr(settings, 'RATE_LIMIT_PROXIES', 0)
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if proxies and len(forwarded) >= proxies:
+        # Cada proxy de confianza agrega una IP al final: la del cliente es la anterior
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+def _bucket_key(scope, request, user_id):
+    ident = f'user:{user_id}' if user_id else f'ip:{client_ip(request)}'
+    return f'ratelimit:{scope}:{ident}'
+
+def _take(tat, now, interval, burst):
+    """
+    Token bucket en forma GCRA: en vez de fichas y hora de recarga se guarda
+    solo el instante teórico en que el balde vuelve a estar lleno (tat).
+    Devuelve (nuevo tat, segundos de espera); espera 0 = se admite.
+    """
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    excess = new_tat - now - burst * interval
+    if excess > 0:
+        return tat, excess
+    return new_tat, 0
+
+def _rejected(wait, as_json):
+    if as_json:
+        response = JsonResponse({"status": "error", "errors": RATE_LIMIT_MESSAGE}, status=429)
+    else:
+        response = HttpResponse(RATE_LIMIT_MESSAGE, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+def rate_limit(scope, rate, per=60, burst=None, methods=('POST',), as_json=False):
+    """
+    Admite rate solicitudes cada per segundos (ráfagas de hasta burst) por
+    usuario autenticado o, si no hay sesión, por IP. Las vistas con el mismo
+    scope comparten el balde. El estado vive en la caché compartida
+    (RATE_LIMIT_CACHE), visible para todos los workers de gunicorn; el usuario
+    se toma del id de la sesión, sin consultar auth_user. Va por encima de
+    vip_required / worker_required para rechazar antes de cualquier consulta.
+    get + set no es atómico: dos workers simultáneos pueden dejar pasar una
+    solicitud de más, lo que basta para cortar ráfagas.
+    """
+    interval = per / rate
+    burst = burst or rate
+
+    def check(tat):
+        now = time.time()
+        new_tat, wait = _take(tat, now, interval, burst)
+        return new_tat, wait, max(1, math.ceil(new_tat - now))
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in methods or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                    return await view_func(request, *args, **kwargs)
+                cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+                key = _bucket_key(scope, request, await request.session.aget(SESSION_KEY))
+                new_tat, wait, timeout = check(await cache.aget(key))
+                if wait:
+                    return _rejected(wait, as_json)
+                await cache.aset(key, new_tat, timeout)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                return view_func(request, *args, **kwargs)
+            cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+            key = _bucket_key(scope, request, request.session.get(SESSION_KEY))
+            new_tat, wait, timeout = check(cache.get(key))
+            if wait:
+                return _rejected(wait, as_json)
+            cache.set(key, new_tat, timeout)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
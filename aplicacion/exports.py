@@ -0,0 +1,79 @@
+"""
+Exportación de listados a CSV y XLSX.
+
+Las filas se leen con iterator() y se escriben a medida que llegan, sin
+materializar el queryset completo en memoria.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+# Filas que se piden a la base de datos por cada lectura
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _Echo:
+    """Buffer mínimo para csv.writer: devuelve la línea en vez de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, columns):
+    fields = [field for field, _ in columns]
+    return queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_csv(queryset, columns, filename):
+    """columns: lista de pares (campo, encabezado)"""
+    writer = csv.writer(_Echo())
+    # El generador corre cuando la vista ya devolvió la respuesta, fuera de
+    # reading(): se fija ahora la conexión que eligió el router
+    queryset = queryset.using(queryset.db)
+
+    def stream():
+        # BOM para que Excel reconozca UTF-8
+        yield '\ufeff'
+        yield writer.writerow([header for _, header in columns])
+        for row in _rows(queryset, columns):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def export_xlsx(queryset, columns, filename):
+    # Modo write_only: openpyxl vuelca cada fila a disco en lugar de retenerla
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([header for _, header in columns])
+    for row in _rows(queryset, columns):
+        sheet.append([_cell(value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def _cell(value):
+    # Excel no admite fechas con zona horaria
+    if getattr(value, 'tzinfo', None) is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+EXPORTERS = {
+    'csv': export_csv,
+    'xlsx': export_xlsx,
+}
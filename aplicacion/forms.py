@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.forms import UserCreationForm
-from .models import Aplicacion, ContactMessage, AvailableSlot
+from .models import Aplicacion, ContactMessage, AvailableSlot, WaitlistEntry
 from datetime import datetime
 
 # Formulario de registro con selección de tipo de usuario
@@ -43,19 +43,33 @@ class ContactForm(forms.ModelForm):
 class AplicacionForm(forms.ModelForm):
     class Meta:
         model = Aplicacion
-        fields = ["title", "date", "time", "notes"]
+        fields = ["title", "date", "time", "duration", "notes"]
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'min': datetime.now().date()}),
             'time': forms.TimeInput(attrs={'type': 'time'}),
+            'duration': forms.NumberInput(attrs={'placeholder': 'Según el horario'}),
             'notes': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Motivo de la cita o detalles adicionales'}),
         }
         labels = {
             'title': 'Título de la cita',
             'date': 'Fecha',
             'time': 'Hora',
+            'duration': 'Duración (minutos)',
             'notes': 'Notas',
         }
 
+    def __init__(self, *args, availability=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Mapa de disponibilidad precalculado (ver availability.py)
+        if availability is not None and self.instance.pk is None:
+            self.instance._availability = availability
+
+# Datos de la cita que se creará al salir de la lista de espera
+class WaitlistForm(forms.ModelForm):
+    class Meta:
+        model = WaitlistEntry
+        fields = ["title", "date", "time", "notes"]
+
 # Formulario para que trabajadores gestionen citas
 class AplicacionManageForm(forms.ModelForm):
     class Meta:
@@ -84,4 +98,67 @@ class AvailableSlotForm(forms.ModelForm):
             'end_time': 'Hora fin',
             'max_appointments': 'Máximo de citas',
             'is_active': 'Activo',
-        }
\ No newline at end of file
+        }
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get('start_time'), cleaned.get('end_time')
+        if start and end and end <= start:
+            self.add_error('end_time', 'Debe ser posterior a la hora de inicio.')
+        return cleaned
+
+# Plantilla de horarios: los mismos rangos en varios días de la semana
+class SlotTemplateForm(forms.Form):
+    days = forms.TypedMultipleChoiceField(
+        choices=AvailableSlot.DAYS_OF_WEEK, coerce=int,
+        widget=forms.CheckboxSelectMultiple, label='Días',
+    )
+    ranges = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 3, 'placeholder': '09:00-13:00\n15:00-18:00'}),
+        label='Rangos horarios', help_text='Uno por línea, en formato HH:MM-HH:MM',
+    )
+    block_minutes = forms.IntegerField(
+        required=False, min_value=5, max_value=720, label='Dividir en bloques de (minutos)',
+    )
+    max_appointments = forms.IntegerField(min_value=1, initial=1, label='Máximo de citas')
+    is_active = forms.BooleanField(required=False, initial=True, label='Activo')
+
+    def clean_ranges(self):
+        ranges = []
+        for line in self.cleaned_data['ranges'].replace(',', '\n').splitlines():
+            if not line.strip():
+                continue
+            try:
+                start, end = (datetime.strptime(part.strip(), '%H:%M').time() for part in line.split('-'))
+            except ValueError:
+                raise forms.ValidationError(f'Rango inválido: "{line.strip()}". Usa HH:MM-HH:MM.')
+            if end <= start:
+                raise forms.ValidationError(f'En "{line.strip()}" el fin debe ser posterior al inicio.')
+            ranges.append((start, end))
+        if not ranges:
+            raise forms.ValidationError('Indica al menos un rango.')
+        return ranges
+
+    def clean(self):
+        cleaned = super().clean()
+        minutes = cleaned.get('block_minutes')
+        for start, end in cleaned.get('ranges') or []:
+            length = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+            if minutes and length % minutes:
+                self.add_error('block_minutes', f'{start:%H:%M}-{end:%H:%M} no se divide en bloques de {minutes} minutos.')
+                break
+        return cleaned
+
+# Copia el patrón de horarios de un día a otros días
+class CopyDayForm(forms.Form):
+    source = forms.TypedChoiceField(choices=AvailableSlot.DAYS_OF_WEEK, coerce=int, label='Copiar los horarios del')
+    targets = forms.TypedMultipleChoiceField(
+        choices=AvailableSlot.DAYS_OF_WEEK, coerce=int,
+        widget=forms.CheckboxSelectMultiple, label='A los días',
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('source') in (cleaned.get('targets') or []):
+            self.add_error('targets', 'El día de origen no puede ser también destino.')
+        return cleaned
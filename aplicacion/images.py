@@ -0,0 +1,113 @@
+"""
+Variantes responsivas de las imágenes estáticas.
+
+El comando optimize_static genera, para cada imagen de static/img, copias
+redimensionadas en WebP y AVIF dentro de static/img/variants/ junto con un
+manifest.json. El tag {% picture %} (templatetags/images.py) lee ese manifest
+para emitir <picture>/srcset; si no existe, emite un <img> normal.
+"""
+import json
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from PIL import Image, features
+
+# Anchos generados (nunca mayores que el original)
+IMAGE_WIDTHS = (320, 640, 1024, 1600)
+# Formato -> opciones de Image.save(); el orden es el de preferencia en <picture>
+IMAGE_FORMATS = {
+    'avif': {'quality': 50},
+    'webp': {'quality': 75, 'method': 6},
+}
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+VARIANTS_DIR = 'variants'
+MANIFEST_NAME = 'img/variants/manifest.json'
+
+
+def available_formats():
+    return [fmt for fmt in IMAGE_FORMATS if features.check(fmt)]
+
+
+def _normalize(image):
+    # Paletas y escalas de grises a RGB(A), conservando la transparencia
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _read_manifest(path):
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def build_variants(source_dir, widths=IMAGE_WIDTHS, formats=None, force=False, static_root=None):
+    """
+    Genera las variantes de cada imagen de source_dir y escribe el manifest.
+    Devuelve (manifest, archivos escritos). Las variantes más nuevas que su
+    original se reutilizan salvo con force=True.
+
+    Las claves son rutas relativas a static_root (por defecto, el directorio
+    padre de source_dir), las mismas que recibe {% static %}. El manifest
+    vive en static_root/MANIFEST_NAME y conserva las entradas de otros
+    directorios de origen.
+    """
+    source_dir = Path(source_dir)
+    static_root = Path(static_root) if static_root is not None else source_dir.parent
+    # ValueError si source_dir no está dentro de static_root
+    prefix = source_dir.resolve().relative_to(static_root.resolve()).as_posix()
+    output_dir = source_dir / VARIANTS_DIR
+    output_dir.mkdir(exist_ok=True)
+    formats = formats or available_formats()
+    manifest, written = {}, []
+
+    for source in sorted(source_dir.iterdir()):
+        if source.suffix.lower() not in SOURCE_EXTENSIONS:
+            continue
+        modified = source.stat().st_mtime
+        with Image.open(source) as original:
+            width, height = original.size
+            image = None
+            sources = {fmt: [] for fmt in formats}
+            for target in sorted({w for w in widths if w < width} | {width}):
+                resized = None
+                for fmt in formats:
+                    name = f'{source.stem}-{target}.{fmt}'
+                    path = output_dir / name
+                    if force or not path.exists() or path.stat().st_mtime < modified:
+                        if resized is None:
+                            if image is None:
+                                image = _normalize(original)
+                            size = (target, max(1, round(height * target / width)))
+                            resized = image if target == width else image.resize(size, Image.Resampling.LANCZOS)
+                        resized.save(path, fmt.upper(), **IMAGE_FORMATS[fmt])
+                        written.append(path)
+                    sources[fmt].append([PurePosixPath(prefix, VARIANTS_DIR, name).as_posix(), target])
+        manifest[PurePosixPath(prefix, source.name).as_posix()] = {
+            'width': width, 'height': height, 'sources': sources,
+        }
+
+    manifest_path = static_root / MANIFEST_NAME
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    others = {
+        name: entry for name, entry in _read_manifest(manifest_path).items()
+        if PurePosixPath(name).parent != PurePosixPath(prefix)
+    }
+    manifest_path.write_text(json.dumps({**others, **manifest}, indent=2, sort_keys=True))
+    load_manifest.cache_clear()
+    return manifest, written
+
+
+@lru_cache(maxsize=1)
+def load_manifest():
+    """Manifest de variantes (una lectura por proceso); {} si no se generó"""
+    path = finders.find(MANIFEST_NAME)
+    if path is None and staticfiles_storage.exists(MANIFEST_NAME):
+        path = staticfiles_storage.path(MANIFEST_NAME)
+    if path is None:
+        return {}
+    return _read_manifest(path)
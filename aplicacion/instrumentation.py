@@ -0,0 +1,43 @@
+"""
+Instrumentación de SQL por petición.
+
+QueryRecorder se instala con connection.execute_wrapper(), por lo que funciona
+con DEBUG=False. Agrupa las sentencias por su texto con placeholders: las que
+se repiten cambiando solo los parámetros son la firma de un N+1.
+"""
+import re
+import time
+from collections import Counter
+
+# "IN (%s, %s, %s)" -> "IN (...)" para que listas de distinto largo coincidan
+IN_LIST_RE = re.compile(r'IN \((?:%s(?:, )?)+\)')
+
+
+def normalize_sql(sql):
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper que cuenta consultas, acumula su duración y agrupa sentencias"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+            self.statements[normalize_sql(sql)] += 1
+
+    def repeated(self, threshold):
+        """Sentencias ejecutadas threshold veces o más (posibles N+1)"""
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
@@ -0,0 +1,116 @@
+"""
+Cola de trabajos durable sobre la base de datos (patrón outbox).
+
+enqueue() inserta un Job usando la conexión y transacción vigentes: si la
+transacción del cambio se revierte, el trabajo tampoco queda registrado. El
+comando run_jobs reclama lotes de trabajos listos, los ejecuta en un pool de
+hilos o procesos y reintenta los fallidos con espera exponencial.
+
+Los manejadores se registran con @task('nombre') (ver aplicacion/tasks.py) y
+reciben el payload como argumentos con nombre; deben ser idempotentes, porque
+un trabajo puede ejecutarse más de una vez si el worker muere a mitad.
+"""
+import random
+import traceback
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Job
+
+# Espera antes del reintento n: JOB_RETRY_BASE * 2**(n-1) segundos, con tope
+JOB_RETRY_BASE = 30
+JOB_RETRY_MAX = 3600
+# Un trabajo "running" más antiguo que esto se considera abandonado
+JOB_LOCK_TIMEOUT = timedelta(minutes=10)
+
+TASKS = {}
+
+
+def task(name):
+    """Registra un manejador de trabajos bajo name"""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def _build(name, payload, delay, max_attempts):
+    if name not in TASKS:
+        raise ValueError(f'Tarea desconocida: {name}')
+    run_after = timezone.now() + timedelta(seconds=delay)
+    return Job(name=name, payload=payload or {}, run_after=run_after, max_attempts=max_attempts)
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=5):
+    """Registra un trabajo en la transacción actual; delay en segundos"""
+    job = _build(name, payload, delay, max_attempts)
+    job.save()
+    return job
+
+
+def enqueue_many(jobs):
+    """Registra varios trabajos (name, payload) con una sola inserción"""
+    return Job.objects.bulk_create([_build(name, payload, 0, 5) for name, payload in jobs])
+
+
+def backoff(attempts):
+    """Segundos de espera tras el intento fallido número attempts (con jitter)"""
+    delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def requeue_stale(now=None):
+    """Devuelve a la cola los trabajos bloqueados por un worker que murió"""
+    now = now or timezone.now()
+    return Job.objects.filter(status='running', locked_at__lt=now - JOB_LOCK_TIMEOUT).update(
+        status='pending', locked_by='', locked_at=None,
+    )
+
+
+def claim(worker_id, limit):
+    """
+    Reclama hasta limit trabajos listos para worker_id.
+
+    El UPDATE condicionado a status='pending' es atómico: si dos workers
+    leen los mismos ids, cada fila queda asignada a uno solo.
+    """
+    now = timezone.now()
+    ids = list(
+        Job.objects.filter(status='pending', run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    Job.objects.filter(pk__in=ids, status='pending').update(
+        status='running', locked_by=worker_id, locked_at=now,
+    )
+    return list(Job.objects.filter(pk__in=ids, status='running', locked_by=worker_id))
+
+
+def execute(name, payload):
+    """
+    Ejecuta un manejador. Devuelve None si terminó bien o el traceback como
+    texto; nunca lanza, para poder usarse desde un pool de procesos.
+    """
+    try:
+        TASKS[name](**payload)
+        return None
+    except Exception:
+        return traceback.format_exc()
+
+
+def record(job, error):
+    """Guarda el resultado de un intento: completado, reintento o fallido"""
+    now = timezone.now()
+    job.attempts += 1
+    job.locked_by, job.locked_at = '', None
+    if error is None:
+        job.status, job.finished_at, job.last_error = 'done', now, ''
+    elif job.attempts >= job.max_attempts:
+        job.status, job.finished_at, job.last_error = 'failed', now, error
+    else:
+        job.status, job.last_error = 'pending', error
+        job.run_after = now + timedelta(seconds=backoff(job.attempts))
+    job.save(update_fields=['attempts', 'status', 'locked_by', 'locked_at',
+                            'finished_at', 'last_error', 'run_after'])
@@ -0,0 +1,186 @@
+import json
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from aplicacion import urls as app_urls
+from aplicacion.benchmarking import BENCH_PASSWORD, isolated_environment, measure, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra un dataset de prueba, recorre cada ruta de aplicacion/urls.py con "
+        "el rol adecuado y reporta tiempo, número de consultas y tiempo SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vips', type=int, default=50, help='Usuarios VIP a crear')
+        parser.add_argument('--appointments', type=int, default=2000, help='Citas a crear')
+        parser.add_argument('--messages', type=int, default=200, help='Mensajes de contacto a crear')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por endpoint (se usa la mediana)')
+        parser.add_argument('--only', nargs='*', default=None, help='Nombres de rutas a medir')
+        parser.add_argument('--save', help='Guardar los resultados como baseline JSON')
+        parser.add_argument('--compare', help='Comparar contra un baseline JSON')
+        parser.add_argument('--threshold', type=float, default=25.0,
+                            help='Regresión máxima permitida en tiempo, en porcentaje')
+        parser.add_argument('--query-threshold', type=int, default=0,
+                            help='Consultas adicionales permitidas por endpoint')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer el baseline: {e}")
+
+        with isolated_environment():
+            data = seed_dataset(
+                vips=options['vips'],
+                appointments=options['appointments'],
+                messages=options['messages'],
+            )
+            results = self.run_scenarios(data, options)
+
+        self.report(results, baseline)
+        payload = {
+            'dataset': {k: options[k] for k in ('vips', 'appointments', 'messages', 'repeat')},
+            'endpoints': results,
+        }
+        if options['save']:
+            Path(options['save']).write_text(json.dumps(payload, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {options['save']}"))
+        if baseline is not None:
+            regressions = self.compare(results, baseline, options)
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(self.style.ERROR(line))
+                raise CommandError(f"{len(regressions)} regresión(es) respecto al baseline")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones respecto al baseline"))
+
+    # ============================================
+    # ESCENARIOS
+    # ============================================
+
+    def scenarios(self, data):
+        """Nombre de ruta -> (rol, método, args, datos); datos str = cuerpo JSON"""
+        vip = data['vips'][0]
+        cita = vip.citas.filter(status='pending').first() or vip.citas.first()
+        any_cita = data['citas'][0]
+        slot = data['slots'][0]
+        message_pk = 1
+        pending_ids = [c.pk for c in data['citas'] if c.status == 'pending'][:25]
+        day = cita.date.isoformat()
+        window = {'start': day, 'end': (cita.date + timedelta(days=30)).isoformat()}
+        return {
+            'home': ('anon', 'get', [], None),
+            'register': ('anon', 'get', [], None),
+            'login': ('anon', 'get', [], None),
+            'logout': ('vip', 'get', [], None),
+            'contact': ('anon', 'post', [], {'name': 'Bench', 'email': 'b@example.com', 'message': 'Hola'}),
+            'vip_dashboard': ('vip', 'get', [], None),
+            'request_appointment': ('vip', 'get', [], None),
+            'my_appointments': ('vip', 'get', [], None),
+            'cancel_appointment': ('vip', 'get', [cita.pk], None),
+            'join_waitlist': ('vip', 'post', [], {'title': 'Bench', 'date': day, 'time': '09:00'}),
+            'leave_waitlist': ('vip', 'post', [0], None),
+            'calendar': ('vip', 'get', [], None),
+            'api_events': ('vip', 'get', [], window),
+            'api_create_event': ('vip', 'post', [], {'title': 'Bench', 'date': day, 'time': '07:30'}),
+            'api_delete_event': ('vip', 'post', [cita.pk], None),
+            'api_availability': ('vip', 'get', [], window),
+            'api_join_waitlist': ('vip', 'post', [], {'title': 'Bench', 'date': day, 'time': '09:00'}),
+            'worker_dashboard': ('worker', 'get', [], None),
+            'worker_analytics': ('worker', 'get', [], {'days': 365}),
+            'manage_appointments': ('worker', 'get', [], {'status': 'pending'}),
+            'approve_appointment': ('worker', 'get', [any_cita.pk], None),
+            'bulk_update_appointments': ('worker', 'post', [], {'ids': pending_ids, 'status': 'confirmed'}),
+            'api_bulk_update_appointments': ('worker', 'post', [], json.dumps({'ids': pending_ids, 'status': 'cancelled'})),
+            'export_appointments': ('worker', 'get', ['csv'], {'status': 'confirmed'}),
+            'manage_slots': ('worker', 'get', [], None),
+            'delete_slot': ('worker', 'get', [slot.pk], None),
+            'view_messages': ('worker', 'get', [], None),
+            'mark_message_read': ('worker', 'get', [message_pk], None),
+            'export_messages': ('worker', 'get', ['csv'], None),
+            'api_token': ('anon', 'post', [], json.dumps({'username': vip.username, 'password': BENCH_PASSWORD})),
+            'api_token_refresh': ('anon', 'post', [], json.dumps({'refresh': 'invalido'})),
+            'profile': ('vip', 'get', [], None),
+            'edit_profile': ('vip', 'get', [], None),
+        }
+
+    def run_scenarios(self, data, options):
+        users = {'anon': None, 'vip': data['vips'][0], 'worker': data['worker']}
+        scenarios = self.scenarios(data)
+        # Las rutas incluidas (API REST) no tienen nombre propio
+        names = [p.name for p in app_urls.urlpatterns if getattr(p, 'name', None)]
+        missing = [name for name in names if name not in scenarios]
+        for name in missing:
+            self.stderr.write(self.style.WARNING(f"Ruta sin escenario de benchmark: {name}"))
+        if options['only']:
+            names = [name for name in names if name in options['only']]
+
+        results = {}
+        for name in names:
+            if name not in scenarios:
+                continue
+            role, method, args, payload = scenarios[name]
+            client = Client()
+            url = reverse(name, args=args)
+
+            def login():
+                if users[role] is not None:
+                    client.force_login(users[role])
+
+            def call():
+                # Cada llamada se revierte para que el dataset no cambie entre repeticiones
+                with transaction.atomic():
+                    if isinstance(payload, str):
+                        response = getattr(client, method)(url, payload, content_type='application/json')
+                    else:
+                        response = getattr(client, method)(url, payload or {})
+                    if getattr(response, 'streaming', False):
+                        b''.join(response.streaming_content)
+                    transaction.set_rollback(True)
+                if response.status_code >= 500:
+                    raise CommandError(f"{name}: HTTP {response.status_code}")
+
+            # Calentamiento (plantillas, cachés de roles)
+            login()
+            call()
+            results[name] = measure(call, repeat=options['repeat'], setup=login)
+        return results
+
+    # ============================================
+    # REPORTE
+    # ============================================
+
+    def report(self, results, baseline):
+        base = (baseline or {}).get('endpoints', {})
+        self.stdout.write(f"{'Endpoint':<32}{'ms':>10}{'consultas':>11}{'SQL ms':>10}{'Δ ms':>10}")
+        for name, row in results.items():
+            delta = ''
+            if name in base:
+                delta = f"{row['wall_ms'] - base[name]['wall_ms']:+.2f}"
+            self.stdout.write(
+                f"{name:<32}{row['wall_ms']:>10.2f}{row['queries']:>11}{row['sql_ms']:>10.2f}{delta:>10}"
+            )
+
+    def compare(self, results, baseline, options):
+        regressions = []
+        limit = 1 + options['threshold'] / 100
+        for name, row in results.items():
+            base = baseline.get('endpoints', {}).get(name)
+            if base is None:
+                continue
+            if row['wall_ms'] > base['wall_ms'] * limit:
+                regressions.append(
+                    f"{name}: {row['wall_ms']:.2f} ms vs {base['wall_ms']:.2f} ms "
+                    f"(> {options['threshold']:.0f}%)"
+                )
+            if row['queries'] > base['queries'] + options['query_threshold']:
+                regressions.append(f"{name}: {row['queries']} consultas vs {base['queries']}")
+        return regressions
@@ -0,0 +1,142 @@
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from aplicacion.benchmarking import isolated_environment, percentile, seed_dataset
+
+# Servidores comparados: nombre -> comando (la forma de Procfile)
+SERVERS = {
+    'wsgi': ['gunicorn', 'miproyecto.wsgi', '--bind', '127.0.0.1:{port}', '--workers', '{workers}'],
+    'asgi': ['uvicorn', 'miproyecto.asgi:application', '--host', '127.0.0.1', '--port', '{port}',
+             '--workers', '{workers}', '--no-access-log'],
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento de la API del calendario (my_events) con muchas "
+        "peticiones concurrentes: gunicorn con workers síncronos (Procfile) frente "
+        "a un servidor ASGI (uvicorn) sobre las vistas async."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 1)),
+                            help='Procesos por servidor (por defecto WEB_CONCURRENCY o 1, como el Procfile)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Clientes simultáneos')
+        parser.add_argument('--requests', type=int, default=2000, help='Peticiones totales por servidor')
+        parser.add_argument('--vips', type=int, default=50)
+        parser.add_argument('--appointments', type=int, default=5000)
+        parser.add_argument('--save', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        database = Path(tempfile.mkdtemp(prefix='bench-db-')) / 'calendar.sqlite3'
+        with isolated_environment(database_name=str(database)) as cache_dir:
+            data = seed_dataset(vips=options['vips'], appointments=options['appointments'], messages=0)
+            vip = max(data['vips'], key=lambda user: user.citas.count())
+            client = Client()
+            client.force_login(vip)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            today = date.today()
+            path = (f"/vip/api/events/?start={(today - timedelta(days=30)).isoformat()}"
+                    f"&end={(today + timedelta(days=30)).isoformat()}")
+
+            env = dict(os.environ, SQLITE_PATH=str(database), CACHE_DIR=cache_dir, DEBUG='false')
+            results = {}
+            for name in options['servers']:
+                results[name] = self.run_server(name, env, path, cookie, options)
+
+        self.report(results, options)
+        if options['save']:
+            Path(options['save']).write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['save']}"))
+
+    def run_server(self, name, env, path, cookie, options):
+        port = _free_port()
+        command = [part.format(port=port, workers=options['workers']) for part in SERVERS[name]]
+        try:
+            process = subprocess.Popen(
+                command, env=env, cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise CommandError(f"{command[0]} no está instalado (requirements.txt)")
+        try:
+            if not _wait_for(port, process):
+                raise CommandError(f"{name}: el servidor no arrancó\n{process.stderr.read().decode()}")
+            url = f"http://127.0.0.1:{port}{path}"
+            # Calentamiento: imports, plantillas y caché de roles de cada worker
+            self.load(url, cookie, options['concurrency'], options['concurrency'] * 2)
+            return self.load(url, cookie, options['concurrency'], options['requests'])
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    def load(self, url, cookie, concurrency, total):
+        def fetch(_):
+            request = urllib.request.Request(url, headers={'Cookie': cookie})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return ok, (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+        latencies = [ms for ok, ms in samples if ok]
+        return {
+            'requests': total,
+            'errors': total - len(latencies),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+        }
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{options['requests']} peticiones, {options['concurrency']} clientes, "
+            f"{options['workers']} worker(s) por servidor"
+        )
+        self.stdout.write(f"{'Servidor':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>10}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<10}{row['rps']:>10.1f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+                f"{row['p99_ms']:>10.2f}{row['errors']:>10}"
+            )
@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+from datetime import date, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from aplicacion.availability import build_availability, build_intervals
+from aplicacion.benchmarking import isolated_environment, percentile, seed_dataset
+from aplicacion.booking import BookingConflict, BookingOverlap, save_booking
+from aplicacion.instrumentation import QueryRecorder
+from aplicacion.models import Aplicacion
+
+# Duraciones pedidas (minutos); None = según el horario
+DURATIONS = [None, None, 15, 30, 45, 60, 90]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la tasa real de conflictos de las reservas: solicitudes aleatorias "
+        "(horas cada 15 minutos, dentro y fuera de los slots, con distintas "
+        "duraciones) por save_booking, separando horarios llenos de "
+        "superposiciones que la regla anterior (misma hora exacta) dejaba pasar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=2000, help='Solicitudes de reserva')
+        parser.add_argument('--days', type=int, default=10, help='Días hábiles sobre los que se reparten')
+        parser.add_argument('--vips', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with isolated_environment():
+            data = seed_dataset(vips=options['vips'], appointments=0, messages=0)
+            results = self.run(data, options)
+        self.report(results, options)
+
+    def weekdays(self, count):
+        day, days = date.today() + timedelta(days=1), []
+        while len(days) < count:
+            if day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def run(self, data, options):
+        rng = random.Random(options['seed'])
+        days = self.weekdays(options['days'])
+        outcomes = {'ok': 0, 'full': 0, 'overlap': 0}
+        timings, queries = [], []
+        for _ in range(options['attempts']):
+            # 8:00-18:45: incluye horas fuera de los slots (9:00-18:00)
+            cita = Aplicacion(
+                user=rng.choice(data['vips']), title='Benchmark', status='pending',
+                date=rng.choice(days), time=dtime(*divmod(rng.randrange(8 * 60, 19 * 60, 15), 60)),
+                duration=rng.choice(DURATIONS),
+            )
+            recorder = QueryRecorder()
+            start = time.perf_counter()
+            with connection.execute_wrapper(recorder):
+                try:
+                    save_booking(cita)
+                    outcomes['ok'] += 1
+                except BookingOverlap:
+                    outcomes['overlap'] += 1
+                except BookingConflict:
+                    outcomes['full'] += 1
+            timings.append((time.perf_counter() - start) * 1000)
+            queries.append(recorder.count)
+        return {
+            'outcomes': outcomes,
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'queries': statistics.median(queries),
+            'violations': self.violations(days),
+        }
+
+    def violations(self, days):
+        """Citas activas que se superponen con otra de otro horario (debería ser 0)"""
+        availability = build_availability(min(days), max(days))
+        intervals = build_intervals(availability, days)
+        citas = Aplicacion.objects.filter(date__in=days, status__in=Aplicacion.ACTIVE_STATUSES)
+        return sum(
+            1 for pk, day, start, duration in citas.values_list('id', 'date', 'time', 'duration')
+            if intervals.overlapping(day, start, duration, exclude_pk=pk)
+        )
+
+    def report(self, results, options):
+        total = options['attempts']
+        outcomes = results['outcomes']
+        self.stdout.write(f"{total} solicitudes sobre {options['days']} días hábiles")
+        self.stdout.write(f"{'Resultado':<28}{'solicitudes':>12}{'%':>8}")
+        labels = {
+            'ok': 'aceptadas',
+            'full': 'horario lleno',
+            'overlap': 'superpuestas (nuevas)',
+        }
+        for key, label in labels.items():
+            self.stdout.write(f"{label:<28}{outcomes[key]:>12}{outcomes[key] / total * 100:>8.1f}")
+        conflicts = outcomes['full'] + outcomes['overlap']
+        self.stdout.write(f"{'tasa de conflictos':<28}{conflicts:>12}{conflicts / total * 100:>8.1f}")
+        self.stdout.write(
+            f"save_booking: p50 {results['p50_ms']:.2f} ms, p95 {results['p95_ms']:.2f} ms, "
+            f"{results['queries']:.0f} consultas (mediana)"
+        )
+        self.stdout.write(f"Superposiciones entre citas activas tras la prueba: {results['violations']}")
@@ -0,0 +1,152 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from aplicacion.benchmarking import BENCH_PASSWORD, isolated_environment, seed_dataset
+from aplicacion.instrumentation import QueryRecorder
+from aplicacion.models import Aplicacion, ContactMessage
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+COOKIE_MESSAGES = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Perfil -> settings de sesión y mensajes (ver SESSION_STORE en settings.py)
+PROFILES = {
+    'db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cookie': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'MESSAGE_STORAGE': COOKIE_MESSAGES,
+    },
+    'cache': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cache',
+        'SESSION_CACHE_ALIAS': 'default',
+        'MESSAGE_STORAGE': COOKIE_MESSAGES,
+    },
+    'cache-local': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cache',
+        'SESSION_CACHE_ALIAS': 'local',
+        'MESSAGE_STORAGE': COOKIE_MESSAGES,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los modos de sesión y mensajes (db, cookie firmada, caché en archivos, "
+        "caché del proceso) en los flujos de login, dashboards y aprobación: escrituras "
+        "y consultas a django_session por petición."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones de cada flujo')
+        parser.add_argument('--profiles', nargs='*', default=list(PROFILES), choices=list(PROFILES),
+                            help='Perfiles a comparar')
+
+    def handle(self, *args, **options):
+        local_cache = settings.CACHES['local']
+        with isolated_environment():
+            data = seed_dataset(vips=20, appointments=500, messages=50)
+            caches = {**settings.CACHES, 'local': local_cache}
+            results = {}
+            for name in options['profiles']:
+                with override_settings(CACHES=caches, **PROFILES[name]):
+                    results[name] = self.run_flows(data, options['repeat'])
+        self.report(results)
+
+    # ============================================
+    # FLUJOS
+    # ============================================
+
+    def flows(self, data):
+        """Flujo -> (usuario, pasos); cada paso es (método, ruta, args, datos)"""
+        vip, worker = data['vips'][0], data['worker']
+        pending = Aplicacion.objects.filter(status='pending').first()
+        own = Aplicacion.objects.filter(user=vip, status__in=Aplicacion.ACTIVE_STATUSES).first()
+        message = ContactMessage.objects.filter(is_read=False).first()
+        if pending is None or own is None or message is None:
+            raise CommandError("El dataset no tiene citas o mensajes pendientes")
+        return {
+            'login': (None, [
+                ('post', 'login', [], {'username': vip.username, 'password': BENCH_PASSWORD}),
+                ('get', 'vip_dashboard', [], None),
+            ]),
+            'vip_dashboard': (vip, [('get', 'vip_dashboard', [], None)] * 3),
+            'worker_dashboard': (worker, [('get', 'worker_dashboard', [], None)] * 3),
+            'approval': (worker, [
+                ('get', 'approve_appointment', [pending.pk], None),
+                ('post', 'approve_appointment', [pending.pk], {'status': 'confirmed', 'admin_notes': ''}),
+                ('get', 'manage_appointments', [], None),
+            ]),
+            'cancel': (vip, [
+                ('get', 'cancel_appointment', [own.pk], None),
+                ('get', 'my_appointments', [], None),
+            ]),
+            'mark_read': (worker, [
+                ('get', 'mark_message_read', [message.pk], None),
+                ('get', 'view_messages', [], None),
+            ]),
+        }
+
+    def run_flows(self, data, repeat):
+        results = {}
+        for name, (user, steps) in self.flows(data).items():
+            rows = []
+            for _ in range(repeat):
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                # Cada repetición se revierte: todos los perfiles ven los mismos datos
+                with transaction.atomic():
+                    rows.append(self.run_steps(client, name, steps))
+                    transaction.set_rollback(True)
+            requests = len(steps)
+            results[name] = {
+                'writes': statistics.median(r['writes'] for r in rows) / requests,
+                'session': statistics.median(r['session'] for r in rows) / requests,
+                'queries': statistics.median(r['queries'] for r in rows) / requests,
+                'ms': statistics.median(r['ms'] for r in rows) / requests,
+            }
+        return results
+
+    def run_steps(self, client, name, steps):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            for method, route, args, payload in steps:
+                response = getattr(client, method)(reverse(route, args=args), payload or {})
+                if response.status_code >= 400:
+                    raise CommandError(f"{name}: {route} respondió HTTP {response.status_code}")
+        elapsed = (time.perf_counter() - start) * 1000
+        statements = recorder.statements.items()
+        return {
+            'writes': sum(n for sql, n in statements if sql.lstrip().upper().startswith(WRITE_PREFIXES)),
+            'session': sum(n for sql, n in statements if 'django_session' in sql),
+            'queries': recorder.count,
+            'ms': elapsed,
+        }
+
+    # ============================================
+    # REPORTE
+    # ============================================
+
+    def report(self, results):
+        self.stdout.write("Promedios por petición (mediana de las repeticiones)")
+        self.stdout.write(
+            f"{'Flujo':<18}{'Perfil':<13}{'escrituras':>11}{'django_session':>16}{'consultas':>11}{'ms':>9}"
+        )
+        flows = next(iter(results.values())).keys()
+        for flow in flows:
+            for profile, rows in results.items():
+                row = rows[flow]
+                self.stdout.write(
+                    f"{flow:<18}{profile:<13}{row['writes']:>11.2f}{row['session']:>16.2f}"
+                    f"{row['queries']:>11.2f}{row['ms']:>9.2f}"
+                )
@@ -0,0 +1,200 @@
+import json
+import multiprocessing
+import random
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, close_old_connections, connections
+from django.db.models import Count, Q
+
+from aplicacion.benchmarking import isolated_environment, percentile, seed_dataset
+from aplicacion.booking import BookingConflict, BookingUnavailable, save_booking
+from aplicacion.models import Aplicacion
+from aplicacion.routers import READ_DATABASE, reading
+
+
+def _profiles():
+    """
+    baseline: la configuración previa (opciones por defecto de Django, journal
+    DELETE, transacciones DEFERRED, una conexión por petición).
+    tuned: el perfil de settings.DATABASES con la conexión de lectura.
+    """
+    tuned = settings.DATABASES
+    return {
+        'baseline': {
+            'journal_mode': 'delete', 'read_alias': False,
+            'databases': {DEFAULT_DB_ALIAS: {'OPTIONS': {}, 'CONN_MAX_AGE': 0}},
+        },
+        'tuned': {
+            'journal_mode': 'wal', 'read_alias': True,
+            'databases': {
+                alias: {'OPTIONS': tuned[alias]['OPTIONS'], 'CONN_MAX_AGE': tuned[alias]['CONN_MAX_AGE']}
+                for alias in (DEFAULT_DB_ALIAS, READ_DATABASE)
+            },
+        },
+    }
+
+
+def _configure(profile, database):
+    """Aplica el perfil a las conexiones de este proceso (antes de abrirlas)"""
+    connections.close_all()
+    for alias, overrides in profile['databases'].items():
+        connections[alias].settings_dict.update(overrides, NAME=database)
+
+
+def _read(user_id, today):
+    """Lo que consulta el dashboard VIP"""
+    citas = Aplicacion.objects.filter(user_id=user_id)
+    citas.order_by().aggregate(
+        pending_count=Count('id', filter=Q(status='pending')),
+        confirmed_count=Count('id', filter=Q(status='confirmed')),
+    )
+    list(citas.filter(date__gte=today, status__in=['pending', 'confirmed']).order_by('date', 'time')[:5])
+    list(citas.filter(Q(date__lt=today) | Q(status__in=['cancelled', 'completed'])).order_by('-date', '-time')[:10])
+
+
+def _write(user_id, rng, today):
+    """Una solicitud de cita en un horario al azar de los próximos 30 días"""
+    day = today + timedelta(days=rng.randint(1, 30))
+    if day.weekday() > 4:
+        day += timedelta(days=7 - day.weekday())
+    cita = Aplicacion(user_id=user_id, title='Carga', date=day, time=dtime(rng.randint(9, 17)), status='pending')
+    save_booking(cita)
+
+
+class _BusyCounter:
+    """execute_wrapper: cuenta las sentencias que SQLite rechazó por bloqueo"""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                self.count += 1
+            raise
+
+
+def _worker(args):
+    """Proceso de carga: operations peticiones de lectura o escritura"""
+    profile, database, user_ids, operations, write_ratio, seed = args
+    _configure(profile, database)
+    busy = _BusyCounter()
+    rng = random.Random(seed)
+    today = date.today()
+    samples = []
+    for _ in range(operations):
+        kind = 'write' if rng.random() < write_ratio else 'read'
+        user_id = rng.choice(user_ids)
+        # Como el ciclo de una petición: cierra las conexiones vencidas
+        close_old_connections()
+        start, retries = time.perf_counter(), busy.count
+        outcome = 'ok'
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(busy):
+                if kind == 'write':
+                    _write(user_id, rng, today)
+                elif profile['read_alias']:
+                    with reading():
+                        _read(user_id, today)
+                else:
+                    _read(user_id, today)
+        except BookingConflict:
+            outcome = 'conflict'
+        except (BookingUnavailable, OperationalError):
+            outcome = 'locked'
+        if outcome == 'ok' and busy.count > retries:
+            # save_booking reintentó tras un "database is locked"
+            outcome = 'retried'
+        samples.append((kind, outcome, (time.perf_counter() - start) * 1000))
+        close_old_connections()
+    connections.close_all()
+    return samples
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la contención de SQLite con varios procesos que leen (dashboard VIP) "
+        "y reservan citas a la vez: tasa de errores \"database is locked\" y "
+        "latencias p50/p99 con la configuración previa y con el perfil de settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=list(_profiles()), default=list(_profiles()))
+        parser.add_argument('--processes', type=int, default=8, help='Procesos simultáneos (workers)')
+        parser.add_argument('--operations', type=int, default=300, help='Peticiones por proceso')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Fracción de peticiones que escriben')
+        parser.add_argument('--vips', type=int, default=50)
+        parser.add_argument('--appointments', type=int, default=5000)
+        parser.add_argument('--save', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        database = str(Path(tempfile.mkdtemp(prefix='bench-db-')) / 'contention.sqlite3')
+        profiles = _profiles()
+        results = {}
+        with isolated_environment(database_name=database):
+            data = seed_dataset(vips=options['vips'], appointments=options['appointments'], messages=0)
+            user_ids = [user.pk for user in data['vips']]
+            for name in options['profiles']:
+                profile = profiles[name]
+                self.set_journal_mode(profile['journal_mode'])
+                # fork: los procesos heredan el entorno aislado (caché temporal)
+                context = multiprocessing.get_context('fork')
+                jobs = [
+                    (profile, database, user_ids, options['operations'], options['write_ratio'], seed)
+                    for seed in range(options['processes'])
+                ]
+                start = time.perf_counter()
+                with context.Pool(options['processes']) as pool:
+                    samples = [sample for chunk in pool.map(_worker, jobs) for sample in chunk]
+                results[name] = self.summarize(samples, time.perf_counter() - start)
+
+        self.report(results, options)
+        if options['save']:
+            Path(options['save']).write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['save']}"))
+
+    def set_journal_mode(self, mode):
+        # El modo de journal queda guardado en el archivo: se fija antes de cada perfil
+        connections.close_all()
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode={mode}')
+        connections.close_all()
+
+    def summarize(self, samples, elapsed):
+        summary = {
+            'requests': len(samples),
+            'rps': round(len(samples) / elapsed, 1),
+            'locked': sum(1 for _, outcome, _ in samples if outcome == 'locked'),
+            'retried': sum(1 for _, outcome, _ in samples if outcome == 'retried'),
+            'conflicts': sum(1 for _, outcome, _ in samples if outcome == 'conflict'),
+        }
+        total = max(1, len(samples))
+        summary['locked_pct'] = round(100 * summary['locked'] / total, 2)
+        summary['retried_pct'] = round(100 * summary['retried'] / total, 2)
+        for kind in ('read', 'write'):
+            latencies = [ms for k, _, ms in samples if k == kind]
+            summary[f'{kind}_p50_ms'] = round(percentile(latencies, 50), 2)
+            summary[f'{kind}_p99_ms'] = round(percentile(latencies, 99), 2)
+        return summary
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{options['processes']} procesos x {options['operations']} peticiones, "
+            f"{options['write_ratio']:.0%} escrituras"
+        )
+        self.stdout.write(
+            f"{'Perfil':<10}{'req/s':>9}{'locked %':>10}{'reint %':>9}"
+            f"{'lect p50':>10}{'lect p99':>10}{'escr p50':>10}{'escr p99':>10}"
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<10}{row['rps']:>9.1f}{row['locked_pct']:>10.2f}{row['retried_pct']:>9.2f}"
+                f"{row['read_p50_ms']:>10.2f}{row['read_p99_ms']:>10.2f}"
+                f"{row['write_p50_ms']:>10.2f}{row['write_p99_ms']:>10.2f}"
+            )
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aplicacion import waitlist
+from aplicacion.archive import (
+    ARCHIVE_BATCH_SIZE, CLOSING_STATUSES, archivable, archive_old, close_past, past_appointments,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra las citas pasadas (confirmadas -> completadas, pendientes -> vencidas) "
+        "y mueve al archivo las cerradas más antiguas que la ventana de retención. "
+        "También descarta las listas de espera de horarios pasados. "
+        "Pensado para ejecutarse a diario (cron / scheduler)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help='Citas por transacción')
+        parser.add_argument('--retention-days', type=int, default=settings.APPOINTMENT_RETENTION_DAYS,
+                            help='Días que una cita cerrada permanece antes de archivarse')
+        parser.add_argument('--no-archive', action='store_true', help='Solo cerrar, no archivar')
+        parser.add_argument('--dry-run', action='store_true', help='Informar sin escribir')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        cutoff = today - timedelta(days=options['retention_days'])
+
+        if options['dry_run']:
+            for status, queryset in past_appointments(today).items():
+                self.stdout.write(f"{queryset.count()} cita(s) '{status}' pasarían a '{CLOSING_STATUSES[status]}'")
+            if not options['no_archive']:
+                self.stdout.write(f"{archivable(cutoff).count()} cita(s) cerradas antes de {cutoff} se archivarían")
+            return
+
+        totals = close_past(today, options['batch_size'])
+        for status, count in totals.items():
+            self.stdout.write(f"{count} cita(s) pasadas a '{status}'")
+        self.stdout.write(f"{waitlist.expire(today)} entrada(s) de lista de espera vencidas")
+        if not options['no_archive']:
+            moved = archive_old(cutoff, options['batch_size'])
+            self.stdout.write(f"{moved} cita(s) cerradas antes de {cutoff} movidas al archivo")
+        self.stdout.write(self.style.SUCCESS("Listo"))
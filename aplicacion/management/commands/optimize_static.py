@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from aplicacion.images import IMAGE_WIDTHS, VARIANTS_DIR, available_formats, build_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera variantes WebP/AVIF redimensionadas de static/img y, con --collect, "
+        "ejecuta collectstatic (nombres con hash y copias .gz/.br de CSS/JS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(Path(settings.BASE_DIR) / 'static' / 'img'),
+                            help='Directorio de imágenes de origen')
+        parser.add_argument('--widths', type=int, nargs='+', default=list(IMAGE_WIDTHS),
+                            help='Anchos a generar en píxeles')
+        parser.add_argument('--force', action='store_true', help='Regenerar aunque estén al día')
+        parser.add_argument('--collect', action='store_true', help='Ejecutar collectstatic al terminar')
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.is_dir():
+            raise CommandError(f"No existe el directorio {source}")
+        formats = available_formats()
+        if not formats:
+            raise CommandError("Pillow no tiene soporte para WebP ni AVIF")
+        # Las claves del manifest son relativas al directorio de STATICFILES_DIRS que lo contiene
+        roots = [Path(d).resolve() for d in settings.STATICFILES_DIRS if not isinstance(d, (list, tuple))]
+        static_root = next((root for root in roots if source.resolve().is_relative_to(root)), None)
+        if static_root is None:
+            raise CommandError(f"{source} no está dentro de ningún directorio de STATICFILES_DIRS")
+
+        manifest, written = build_variants(source, options['widths'], formats, options['force'], static_root)
+        self.stdout.write(f"{len(manifest)} imágenes, {len(written)} variantes escritas ({', '.join(formats)})")
+        for name, entry in manifest.items():
+            # Variante más grande en el formato preferido frente al original
+            variant, _ = entry['sources'][formats[0]][-1]
+            before = (source / Path(name).name).stat().st_size
+            after = (source / VARIANTS_DIR / Path(variant).name).stat().st_size
+            self.stdout.write(f"  {name:<32}{before // 1024:>8} KB -> {after // 1024:>6} KB")
+
+        if options['collect']:
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
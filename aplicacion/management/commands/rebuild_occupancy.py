@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from aplicacion.occupancy import drift, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la ocupación materializada (SlotOccupancy) con las reservas y la "
+        "reconstruye en bloque. Con --check solo informa las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='No escribir; termina con error si hay diferencias')
+        parser.add_argument('--verbose-rows', type=int, default=20,
+                            help='Diferencias a listar como máximo')
+
+    def handle(self, *args, **options):
+        differences = drift()
+        for date, start_time, stored, actual in differences[:options['verbose_rows']]:
+            self.stdout.write(f"  {date} {start_time}: guardado {stored}, real {actual}")
+        if options['check']:
+            if differences:
+                raise CommandError(f"{len(differences)} horario(s) desincronizados")
+            self.stdout.write(self.style.SUCCESS("Ocupación consistente con las reservas"))
+            return
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(differences)} diferencia(s) corregidas; {rows} horario(s) con reservas"
+        ))
@@ -0,0 +1,84 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+
+from aplicacion.jobs import claim, execute, record, requeue_stale
+
+
+def _run_in_thread(name, payload):
+    # Cada hilo usa su propia conexión; se cierra para no dejarla colgando
+    try:
+        return execute(name, payload)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa la cola de trabajos (notificaciones, recordatorios) con un pool de "
+        "hilos o procesos, reintentando los fallidos con espera exponencial."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tamaño del pool')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Ejecutar los trabajos en hilos o en procesos')
+        parser.add_argument('--batch', type=int, default=20, help='Trabajos reclamados por vuelta')
+        parser.add_argument('--poll', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--once', action='store_true',
+                            help='Vaciar los trabajos listos y terminar')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+        if options['pool'] == 'process':
+            # Los procesos hijos no deben heredar la conexión abierta del padre
+            connections.close_all()
+            executor = ProcessPoolExecutor(options['workers'])
+            run = execute
+        else:
+            executor = ThreadPoolExecutor(options['workers'], thread_name_prefix='job')
+            run = _run_in_thread
+
+        done = failed = 0
+        with executor:
+            while self.running:
+                try:
+                    requeue_stale()
+                    jobs = claim(worker_id, options['batch'])
+                except OperationalError as e:
+                    # SQLite ocupado por otro escritor: se intenta en la próxima vuelta
+                    self.stderr.write(self.style.WARNING(f"Cola no disponible: {e}"))
+                    jobs = []
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                futures = [(job, executor.submit(run, job.name, job.payload)) for job in jobs]
+                # Los resultados se registran desde este hilo: solo él escribe en la cola
+                for job, future in futures:
+                    record(job, future.result())
+                    if job.status == 'done':
+                        done += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(self.style.WARNING(
+                            f"{job}: intento {job.attempts}/{job.max_attempts} falló\n{job.last_error}"
+                        ))
+
+        self.stdout.write(self.style.SUCCESS(f"{done} trabajo(s) completados, {failed} con error"))
+
+    def stop(self, signum, frame):
+        # Termina el lote en curso y sale
+        self.running = False
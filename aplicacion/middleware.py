@@ -0,0 +1,84 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .instrumentation import QueryRecorder
+from .roles import resolve_roles
+
+sql_logger = logging.getLogger('aplicacion.sql')
+
+# Resuelve los roles del usuario una sola vez por petición. Es perezoso: las
+# páginas públicas que no consultan roles no tocan la caché. Admite ASGI para
+# no forzar a las vistas async a correr en un hilo (usan aget_roles()).
+class RoleMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.roles = SimpleLazyObject(lambda: resolve_roles(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.roles = SimpleLazyObject(lambda: resolve_roles(request.user))
+        return await self.get_response(request)
+
+
+# Instrumentación opcional de SQL: cuenta y cronometra las consultas de cada
+# petición muestreada, detecta N+1, agrega un encabezado Server-Timing y
+# escribe una línea JSON en el logger "aplicacion.sql". Se activa con
+# SQL_INSTRUMENTATION_SAMPLE_RATE > 0 y funciona con DEBUG=False. Es solo
+# síncrono: activo bajo ASGI, las vistas async corren adaptadas en un hilo.
+class SQLInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 3)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        sql_ms = recorder.seconds * 1000
+        repeated = recorder.repeated(self.threshold)
+
+        response['Server-Timing'] = (
+            f'db;dur={sql_ms:.2f};desc="{recorder.count} queries", '
+            f'app;dur={total_ms - sql_ms:.2f}, total;dur={total_ms:.2f}'
+        )
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(sql_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'n_plus_one': [{'sql': sql, 'count': count} for sql, count in repeated],
+        }
+        log = sql_logger.warning if repeated else sql_logger.info
+        log(json.dumps(record))
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_reservations(apps, schema_editor):
+    """Asigna un asiento a cada cita activa existente"""
+    Aplicacion = apps.get_model('aplicacion', 'Aplicacion')
+    AvailableSlot = apps.get_model('aplicacion', 'AvailableSlot')
+    Reservation = apps.get_model('aplicacion', 'Reservation')
+
+    slots = list(AvailableSlot.objects.filter(is_active=True).order_by('start_time'))
+    seats = {}
+    reservations = []
+    citas = Aplicacion.objects.filter(status__in=['pending', 'confirmed']).order_by('created_at', 'pk')
+    for cita in citas.iterator():
+        start_time = cita.time
+        for slot in slots:
+            if slot.day_of_week == cita.date.weekday() and slot.start_time <= cita.time < slot.end_time:
+                start_time = slot.start_time
+                break
+        key = (cita.date, start_time)
+        seat = seats.get(key, 0)
+        seats[key] = seat + 1
+        reservations.append(Reservation(cita=cita, date=cita.date, start_time=start_time, seat=seat))
+    Reservation.objects.bulk_create(reservations, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0002_alter_aplicacion_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField(help_text='Inicio del slot, o la hora exacta si no hay slot')),
+                ('seat', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cita', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='aplicacion.aplicacion')),
+            ],
+            options={
+                'verbose_name': 'Reserva de cupo',
+                'verbose_name_plural': 'Reservas de cupo',
+                'constraints': [models.UniqueConstraint(fields=('date', 'start_time', 'seat'), name='unique_reservation_seat')],
+            },
+        ),
+        migrations.RunPython(backfill_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0003_reservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aplicacion',
+            index=models.Index(fields=['date', 'time', 'status'], name='cita_date_time_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aplicacion',
+            index=models.Index(fields=['user', 'status', 'date'], name='cita_user_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aplicacion',
+            index=models.Index(fields=['user', 'date'], name='cita_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aplicacion',
+            index=models.Index(fields=['status', 'date'], name='cita_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['created_at'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['is_read', 'created_at'], name='contact_read_created_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+from django.db import migrations
+
+# Índices FTS5 para la búsqueda de citas y mensajes (ver aplicacion/search.py).
+# Los triggers mantienen los índices sincronizados en cada escritura, también
+# para bulk_update(), QuerySet.update() y el admin.
+
+TOKENIZE = "tokenize='unicode61 remove_diacritics 2'"
+
+CREATE_SQL = [
+    # Citas: copia de título, notas y usuario/email del dueño
+    f"""CREATE VIRTUAL TABLE aplicacion_cita_fts USING fts5(
+        title, notes, username, email, {TOKENIZE}
+    )""",
+    """CREATE TRIGGER aplicacion_cita_fts_ai AFTER INSERT ON aplicacion_aplicacion BEGIN
+        INSERT INTO aplicacion_cita_fts(rowid, title, notes, username, email)
+        SELECT NEW.id, NEW.title, NEW.notes, u.username, u.email FROM auth_user u WHERE u.id = NEW.user_id;
+    END""",
+    """CREATE TRIGGER aplicacion_cita_fts_au AFTER UPDATE OF title, notes, user_id ON aplicacion_aplicacion BEGIN
+        DELETE FROM aplicacion_cita_fts WHERE rowid = OLD.id;
+        INSERT INTO aplicacion_cita_fts(rowid, title, notes, username, email)
+        SELECT NEW.id, NEW.title, NEW.notes, u.username, u.email FROM auth_user u WHERE u.id = NEW.user_id;
+    END""",
+    """CREATE TRIGGER aplicacion_cita_fts_ad AFTER DELETE ON aplicacion_aplicacion BEGIN
+        DELETE FROM aplicacion_cita_fts WHERE rowid = OLD.id;
+    END""",
+    """CREATE TRIGGER aplicacion_cita_fts_user_au AFTER UPDATE OF username, email ON auth_user BEGIN
+        UPDATE aplicacion_cita_fts SET username = NEW.username, email = NEW.email
+        WHERE rowid IN (SELECT id FROM aplicacion_aplicacion WHERE user_id = NEW.id);
+    END""",
+    """INSERT INTO aplicacion_cita_fts(rowid, title, notes, username, email)
+        SELECT a.id, a.title, a.notes, u.username, u.email
+        FROM aplicacion_aplicacion a JOIN auth_user u ON u.id = a.user_id""",
+
+    # Mensajes: índice de contenido externo sobre la propia tabla
+    f"""CREATE VIRTUAL TABLE aplicacion_contact_fts USING fts5(
+        name, email, subject, message,
+        content='aplicacion_contactmessage', content_rowid='id', {TOKENIZE}
+    )""",
+    """CREATE TRIGGER aplicacion_contact_fts_ai AFTER INSERT ON aplicacion_contactmessage BEGIN
+        INSERT INTO aplicacion_contact_fts(rowid, name, email, subject, message)
+        VALUES (NEW.id, NEW.name, NEW.email, NEW.subject, NEW.message);
+    END""",
+    """CREATE TRIGGER aplicacion_contact_fts_au AFTER UPDATE OF name, email, subject, message ON aplicacion_contactmessage BEGIN
+        INSERT INTO aplicacion_contact_fts(aplicacion_contact_fts, rowid, name, email, subject, message)
+        VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.subject, OLD.message);
+        INSERT INTO aplicacion_contact_fts(rowid, name, email, subject, message)
+        VALUES (NEW.id, NEW.name, NEW.email, NEW.subject, NEW.message);
+    END""",
+    """CREATE TRIGGER aplicacion_contact_fts_ad AFTER DELETE ON aplicacion_contactmessage BEGIN
+        INSERT INTO aplicacion_contact_fts(aplicacion_contact_fts, rowid, name, email, subject, message)
+        VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.subject, OLD.message);
+    END""",
+    "INSERT INTO aplicacion_contact_fts(aplicacion_contact_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS aplicacion_cita_fts_ai",
+    "DROP TRIGGER IF EXISTS aplicacion_cita_fts_au",
+    "DROP TRIGGER IF EXISTS aplicacion_cita_fts_ad",
+    "DROP TRIGGER IF EXISTS aplicacion_cita_fts_user_au",
+    "DROP TABLE IF EXISTS aplicacion_cita_fts",
+    "DROP TRIGGER IF EXISTS aplicacion_contact_fts_ai",
+    "DROP TRIGGER IF EXISTS aplicacion_contact_fts_au",
+    "DROP TRIGGER IF EXISTS aplicacion_contact_fts_ad",
+    "DROP TABLE IF EXISTS aplicacion_contact_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 es propio de SQLite; en otros motores search.py usa icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0004_query_indexes'),
+        # Los triggers leen auth_user: deben crearse después de que auth lo
+        # reconstruya en sus migraciones
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+# Triggers que mantienen SlotOccupancy al insertar, mover o borrar reservas,
+# en la misma transacción (incluye bulk_create() y borrados en cascada). Las
+# filas que llegan a cero se eliminan para que la tabla solo tenga horarios
+# con reservas.
+
+INCREMENT = """
+        INSERT INTO aplicacion_slotoccupancy(date, start_time, booked) VALUES (NEW.date, NEW.start_time, 1)
+        ON CONFLICT(date, start_time) DO UPDATE SET booked = booked + 1;"""
+DECREMENT = """
+        UPDATE aplicacion_slotoccupancy SET booked = booked - 1
+        WHERE date = OLD.date AND start_time = OLD.start_time AND booked > 0;
+        DELETE FROM aplicacion_slotoccupancy
+        WHERE date = OLD.date AND start_time = OLD.start_time AND booked = 0;"""
+
+CREATE_SQL = [
+    f"""CREATE TRIGGER aplicacion_occupancy_ai AFTER INSERT ON aplicacion_reservation BEGIN{INCREMENT}
+    END""",
+    f"""CREATE TRIGGER aplicacion_occupancy_au AFTER UPDATE OF date, start_time ON aplicacion_reservation BEGIN{DECREMENT}{INCREMENT}
+    END""",
+    f"""CREATE TRIGGER aplicacion_occupancy_ad AFTER DELETE ON aplicacion_reservation BEGIN{DECREMENT}
+    END""",
+    """INSERT INTO aplicacion_slotoccupancy(date, start_time, booked)
+        SELECT date, start_time, COUNT(*) FROM aplicacion_reservation GROUP BY date, start_time""",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS aplicacion_occupancy_ai",
+    "DROP TRIGGER IF EXISTS aplicacion_occupancy_au",
+    "DROP TRIGGER IF EXISTS aplicacion_occupancy_ad",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # En otros motores occupancy.py cuenta las reservas directamente
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0006_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField(help_text='Inicio del slot, o la hora exacta si no hay slot')),
+                ('booked', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ocupación de horario',
+                'verbose_name_plural': 'Ocupación de horarios',
+                'constraints': [models.UniqueConstraint(fields=('date', 'start_time'), name='unique_slot_occupancy')],
+            },
+        ),
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0008_appointment_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedappointment',
+            index=models.Index(fields=['date'], name='archived_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0009_archive_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(default='Cita', max_length=200)),
+                ('date', models.DateField()),
+                ('time', models.TimeField(help_text='Hora pedida por el VIP')),
+                ('start_time', models.TimeField(help_text='Inicio del slot, o la hora exacta si no hay slot')),
+                ('notes', models.TextField(blank=True, verbose_name='Notas del cliente')),
+                ('priority', models.SmallIntegerField(default=0, help_text='Mayor prioridad asciende primero')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lista de espera',
+                'verbose_name_plural': 'Listas de espera',
+                'ordering': ['-priority', 'created_at', 'id'],
+                'indexes': [models.Index(fields=['date', 'start_time', '-priority', 'created_at'], name='waitlist_queue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date', 'start_time'), name='unique_waitlist_user_slot')],
+            },
+        ),
+    ]
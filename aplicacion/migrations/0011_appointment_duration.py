@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:38
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicacion', '0010_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aplicacion',
+            name='duration',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(240)], verbose_name='Duración (minutos)'),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='duration',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Duración (minutos)'),
+        ),
+    ]
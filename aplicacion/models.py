@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 # Modelo de Citas mejorado con estados y aprobación
 class Aplicacion(models.Model):
@@ -9,12 +10,25 @@ class Aplicacion(models.Model):
         ('confirmed', 'Confirmada'),
         ('cancelled', 'Cancelada'),
         ('completed', 'Completada'),
+        ('expired', 'Vencida'),
     ]
+    # Estados que ocupan cupo en un horario
+    ACTIVE_STATUSES = ('pending', 'confirmed')
+    # Estados finales: las citas pasadas en estos estados se pueden archivar
+    CLOSED_STATUSES = ('cancelled', 'completed', 'expired')
+    # Duración en minutos si no se indica y la hora no cae en un slot
+    DEFAULT_DURATION = 30
+    MAX_DURATION = 240
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='citas')
     title = models.CharField(max_length=200, default="Cita")
     date = models.DateField()
     time = models.TimeField()
+    # Vacía: hasta el fin del slot que cubre la hora (save_booking la completa)
+    duration = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(5), MaxValueValidator(MAX_DURATION)],
+        verbose_name="Duración (minutos)",
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, verbose_name="Notas del cliente")
     
@@ -27,6 +41,17 @@ class Aplicacion(models.Model):
 
     class Meta:
         ordering = ['date', 'time']
+        # Índices según las consultas reales (ver tests.QueryPlanTests)
+        indexes = [
+            # clean() / motor de disponibilidad: rango de fechas + estado
+            models.Index(fields=['date', 'time', 'status'], name='cita_date_time_status_idx'),
+            # vip_dashboard, my_appointments
+            models.Index(fields=['user', 'status', 'date'], name='cita_user_status_date_idx'),
+            # my_events: ventana de fechas del usuario
+            models.Index(fields=['user', 'date'], name='cita_user_date_idx'),
+            # worker_dashboard, manage_appointments
+            models.Index(fields=['status', 'date'], name='cita_status_date_idx'),
+        ]
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
 
@@ -34,16 +59,31 @@ class Aplicacion(models.Model):
         return f"{self.user.username} - {self.date} {self.time} ({self.get_status_display()})"
     
     def clean(self):
-        # Validar que no haya otra cita en el mismo horario
-        if self.date and self.time:
-            conflicting = Aplicacion.objects.filter(
-                date=self.date,
-                time=self.time,
-                status__in=['pending', 'confirmed']
-            ).exclude(pk=self.pk)
+        # Validar capacidad del horario (slot configurado o misma hora exacta)
+        # y que no se superponga con citas de otro horario; dentro de un slot
+        # la cita termina, a más tardar, cuando termina el slot
+        if self.date and self.time and self.status in self.ACTIVE_STATUSES:
+            from .availability import build_availability, find_overlap
             
-            if conflicting.exists():
-                raise ValidationError('Ya existe una cita en este horario.')
+            # Reutiliza el mapa que la vista ya construyó, si cubre la fecha
+            availability = getattr(self, '_availability', None)
+            if availability is None or not availability.covers(self.date):
+                availability = build_availability(self.date, exclude_pk=self.pk)
+            if not availability.can_book(self.date, self.time):
+                if availability.slot_for(self.date, self.time) is not None:
+                    raise ValidationError('Este horario ya alcanzó su capacidad máxima.', code='full')
+                raise ValidationError('Ya existe una cita en este horario.', code='full')
+            slot = availability.slot_for(self.date, self.time)
+            limit = availability.default_duration(self.date, self.time)
+            if slot is not None and self.duration and self.duration > limit:
+                raise ValidationError(
+                    f'La cita debe terminar dentro del horario (hasta las {slot.end_time:%H:%M}).', code='duration',
+                )
+            overlap = find_overlap(availability, self.date, self.time, self.duration, exclude_pk=self.pk)
+            if overlap is not None:
+                raise ValidationError(
+                    f'Se superpone con otra cita de {overlap[0]:%H:%M} a {overlap[1]:%H:%M}.', code='overlap',
+                )
 
 # Horarios disponibles configurables por los trabajadores
 class AvailableSlot(models.Model):
@@ -74,6 +114,103 @@ class AvailableSlot(models.Model):
     def __str__(self):
         return f"{self.get_day_of_week_display()} {self.start_time} - {self.end_time}"
 
+# Cupo reservado por una cita activa. La restricción única sobre
+# (fecha, inicio del horario, asiento) impide sobrepasar la capacidad
+# aunque dos solicitudes lleguen al mismo tiempo (ver booking.py)
+class Reservation(models.Model):
+    cita = models.OneToOneField(Aplicacion, on_delete=models.CASCADE, related_name='reservation')
+    date = models.DateField()
+    start_time = models.TimeField(help_text="Inicio del slot, o la hora exacta si no hay slot")
+    seat = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'start_time', 'seat'], name='unique_reservation_seat'),
+        ]
+        verbose_name = 'Reserva de cupo'
+        verbose_name_plural = 'Reservas de cupo'
+
+    def __str__(self):
+        return f"{self.date} {self.start_time} #{self.seat}"
+
+# Ocupación materializada: asientos tomados por (fecha, inicio del horario).
+# En SQLite la mantienen triggers sobre Reservation en la misma transacción
+# (migración 0007); manage.py rebuild_occupancy la reconstruye (ver occupancy.py)
+class SlotOccupancy(models.Model):
+    date = models.DateField()
+    start_time = models.TimeField(help_text="Inicio del slot, o la hora exacta si no hay slot")
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'start_time'], name='unique_slot_occupancy'),
+        ]
+        verbose_name = 'Ocupación de horario'
+        verbose_name_plural = 'Ocupación de horarios'
+
+    def __str__(self):
+        return f"{self.date} {self.start_time}: {self.booked}"
+
+# Citas cerradas más antiguas que la ventana de retención, fuera de la tabla
+# caliente (ver archive.py y manage.py close_appointments). Conserva el id
+# original para que los enlaces e historiales sigan siendo válidos.
+class ArchivedAppointment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='citas_archivadas')
+    title = models.CharField(max_length=200)
+    date = models.DateField()
+    time = models.TimeField()
+    duration = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Duración (minutos)")
+    status = models.CharField(max_length=20, choices=Aplicacion.STATUS_CHOICES)
+    notes = models.TextField(blank=True, verbose_name="Notas del cliente")
+    approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    admin_notes = models.TextField(blank=True, verbose_name="Notas internas")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-time']
+        indexes = [
+            # Historial del VIP (my_appointments?status=archived)
+            models.Index(fields=['user', 'date'], name='archived_user_date_idx'),
+            # Rangos de fechas de la analítica (analytics.py)
+            models.Index(fields=['date'], name='archived_date_idx'),
+        ]
+        verbose_name = 'Cita archivada'
+        verbose_name_plural = 'Citas archivadas'
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} {self.time} ({self.get_status_display()})"
+
+# Lista de espera de un horario lleno (ver waitlist.py). La cola de cada
+# horario se atiende por prioridad (mayor primero) y luego por llegada.
+class WaitlistEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lista_espera')
+    title = models.CharField(max_length=200, default="Cita")
+    date = models.DateField()
+    time = models.TimeField(help_text="Hora pedida por el VIP")
+    start_time = models.TimeField(help_text="Inicio del slot, o la hora exacta si no hay slot")
+    notes = models.TextField(blank=True, verbose_name="Notas del cliente")
+    priority = models.SmallIntegerField(default=0, help_text="Mayor prioridad asciende primero")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-priority', 'created_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'start_time'], name='unique_waitlist_user_slot'),
+        ]
+        indexes = [
+            # Cabeza de la cola de un horario
+            models.Index(fields=['date', 'start_time', '-priority', 'created_at'], name='waitlist_queue_idx'),
+        ]
+        verbose_name = 'Lista de espera'
+        verbose_name_plural = 'Listas de espera'
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} {self.start_time} (prioridad {self.priority})"
+
 # Modelo de Contacto (sin cambios, pero agregamos más info)
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
@@ -85,8 +222,46 @@ class ContactMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='contact_created_idx'),
+            models.Index(fields=['is_read', 'created_at'], name='contact_read_created_idx'),
+        ]
         verbose_name = 'Mensaje de Contacto'
         verbose_name_plural = 'Mensajes de Contacto'
 
     def __str__(self):
-        return f"{self.name} - {self.email}"
\ No newline at end of file
+        return f"{self.name} - {self.email}"
+
+# Cola de trabajos en la base de datos (outbox). Las vistas registran la
+# intención en la misma transacción que el cambio; el comando run_jobs ejecuta
+# los trabajos después (ver aplicacion/jobs.py).
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En ejecución'),
+        ('done', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(help_text="No se ejecuta antes de este momento")
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Búsqueda de trabajos listos: status='pending' AND run_after <= ahora
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+        verbose_name = 'Trabajo'
+        verbose_name_plural = 'Trabajos'
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
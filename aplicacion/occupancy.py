@@ -0,0 +1,61 @@
+"""
+Ocupación materializada por horario.
+
+SlotOccupancy guarda cuántos asientos (Reservation) están tomados en cada
+(fecha, inicio del horario). En SQLite la mantienen los triggers de la
+migración 0007, dentro de la misma transacción que crea, cancela, reactiva o
+elimina la cita. Las consultas de capacidad leen esas filas en vez de contar
+citas. En otros motores se agregan las reservas directamente.
+
+Si la tabla se desincroniza (restauraciones, SQL manual), rebuild() la
+reconstruye en bloque: manage.py rebuild_occupancy.
+"""
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Reservation, SlotOccupancy
+
+
+def _actual(start=None, end=None):
+    """Ocupación real según las reservas: {(fecha, inicio): asientos}"""
+    reservations = Reservation.objects.order_by()
+    if start is not None:
+        reservations = reservations.filter(date__range=(start, end or start))
+    rows = reservations.values_list('date', 'start_time').annotate(booked=Count('id'))
+    return {(date, start_time): booked for date, start_time, booked in rows}
+
+
+def counts(start, end=None):
+    """Asientos tomados por (fecha, inicio del horario) en [start, end]"""
+    if connection.vendor != 'sqlite':
+        return _actual(start, end)
+    rows = SlotOccupancy.objects.filter(date__range=(start, end or start)).values_list(
+        'date', 'start_time', 'booked'
+    )
+    return {(date, start_time): booked for date, start_time, booked in rows}
+
+
+def drift():
+    """Diferencias [(fecha, inicio, guardado, real)] entre la tabla y las reservas"""
+    stored = {
+        (date, start_time): booked
+        for date, start_time, booked in SlotOccupancy.objects.values_list('date', 'start_time', 'booked')
+    }
+    actual = _actual()
+    return sorted(
+        (date, start_time, stored.get((date, start_time), 0), actual.get((date, start_time), 0))
+        for date, start_time in stored.keys() | actual.keys()
+        if stored.get((date, start_time), 0) != actual.get((date, start_time), 0)
+    )
+
+
+def rebuild(batch_size=1000):
+    """Reconstruye la tabla desde las reservas; devuelve las filas escritas"""
+    rows = [
+        SlotOccupancy(date=date, start_time=start_time, booked=booked)
+        for (date, start_time), booked in _actual().items()
+    ]
+    with transaction.atomic():
+        SlotOccupancy.objects.all().delete()
+        SlotOccupancy.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
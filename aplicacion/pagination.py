@@ -0,0 +1,104 @@
+"""
+Paginación por cursor (keyset).
+
+En vez de OFFSET, cada página continúa desde los valores de orden de la última
+fila mostrada, por lo que el costo de una página no depende de cuántas filas
+haya antes. El cursor viaja en la URL como texto base64 opaco.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+# Filas por página en los listados
+PAGE_SIZE = 50
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode(values):
+    # isoformat() conserva los microsegundos (DjangoJSONEncoder los recorta)
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(queryset, names, cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        fields = [queryset.model._meta.get_field(name) for name in names]
+        if len(values) != len(fields):
+            return None
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def _after(names, descending, values):
+    """Condición lexicográfica: filas posteriores a values según el orden"""
+    condition = Q()
+    for i, name in enumerate(names):
+        lookup = 'lt' if descending[i] else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for prev in range(i):
+            step &= Q(**{names[prev]: values[prev]})
+        condition |= step
+    # Cota redundante sobre la primera columna para que el índice acote el rango
+    bound = 'lte' if descending[0] else 'gte'
+    return Q(**{f'{names[0]}__{bound}': values[0]}) & condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, per_page=PAGE_SIZE):
+    """
+    Devuelve una KeysetPage de queryset ordenado por ordering.
+
+    ordering debe terminar en una columna única (normalmente 'id' o '-id')
+    para que el orden sea total.
+    """
+    names = [field.lstrip('-') for field in ordering]
+    descending = [field.startswith('-') for field in ordering]
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        values = _decode(queryset, names, cursor)
+        if values is not None:
+            queryset = queryset.filter(_after(names, descending, values))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = _encode([getattr(last, name) for name in names])
+    return KeysetPage(items, next_cursor)
+
+
+def paginate_ranked(queryset, ids, cursor=None, per_page=PAGE_SIZE):
+    """
+    KeysetPage sobre una lista de ids ya ordenada (p. ej. por relevancia).
+    El cursor es la posición en la lista; solo se cargan las filas de la página.
+    """
+    try:
+        offset = max(int(cursor or 0), 0)
+    except ValueError:
+        offset = 0
+    page_ids = ids[offset:offset + per_page]
+    rows = queryset.in_bulk(page_ids)
+    items = [rows[pk] for pk in page_ids if pk in rows]
+    next_cursor = str(offset + per_page) if offset + per_page < len(ids) else None
+    return KeysetPage(items, next_cursor)
@@ -0,0 +1,75 @@
+"""
+Resolución de roles (VIP / Trabajadores) con caché.
+
+Los grupos de cada usuario se guardan en la caché compartida bajo una clave
+versionada: la versión del usuario cambia cuando se modifican sus grupos y la
+versión global "roles" cuando se edita o elimina un grupo (ver signals.py).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+from .versioning import get_version
+
+VIP_GROUP = 'VIP'
+WORKER_GROUP = 'Trabajadores'
+
+# Las claves además expiran solas, como red de seguridad
+ROLES_CACHE_TIMEOUT = 60 * 60
+
+
+class Roles:
+    def __init__(self, groups=frozenset(), is_staff=False):
+        self.groups = frozenset(groups)
+        self.is_staff = is_staff
+
+    @property
+    def is_vip(self):
+        return VIP_GROUP in self.groups
+
+    @property
+    def is_worker(self):
+        return WORKER_GROUP in self.groups or self.is_staff
+
+    def __contains__(self, group_name):
+        return group_name in self.groups
+
+
+ANONYMOUS_ROLES = Roles()
+
+
+def user_roles_scope(user_pk):
+    return f'roles-user-{user_pk}'
+
+
+def roles_for(user_pk, is_staff=False):
+    """Roles por id de usuario, sin cargar el usuario (API con JWT)"""
+    key = f'roles:{user_pk}:{get_version("roles")}:{get_version(user_roles_scope(user_pk))}'
+    groups = cache.get(key)
+    if groups is None:
+        groups = frozenset(Group.objects.filter(user__id=user_pk).values_list('name', flat=True))
+        cache.set(key, groups, ROLES_CACHE_TIMEOUT)
+    return Roles(groups, is_staff)
+
+
+def resolve_roles(user):
+    """Roles del usuario; consulta la base de datos solo si no están en caché"""
+    if not user.is_authenticated:
+        return ANONYMOUS_ROLES
+    return roles_for(user.pk, user.is_staff)
+
+
+def get_roles(request):
+    """Roles de la petición (resueltos una vez por RoleMiddleware)"""
+    roles = getattr(request, 'roles', None)
+    if roles is None:
+        roles = request.roles = resolve_roles(request.user)
+    return roles
+
+
+async def aget_roles(request):
+    """get_roles() para vistas async: el usuario y los grupos se leen sin bloquear el loop"""
+    user = await request.auser()
+    roles = await sync_to_async(resolve_roles)(user)
+    request.roles = roles
+    return roles
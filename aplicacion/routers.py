@@ -0,0 +1,49 @@
+"""
+Enrutado de lecturas a una conexión de solo lectura.
+
+Las vistas marcadas con @read_only (decorators.py) leen por el alias
+READ_DATABASE: otra conexión al mismo archivo SQLite, abierta con
+PRAGMA query_only. En modo WAL esas lecturas trabajan sobre una instantánea y
+no compiten con las transacciones de escritura de la conexión 'default'.
+
+Las escrituras, y las lecturas hechas dentro de una transacción de 'default',
+siempre van a 'default' para que cada petición vea sus propios cambios.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_DATABASE = 'read'
+
+_reading = ContextVar('reading', default=False)
+
+
+@contextmanager
+def reading():
+    """Envía las lecturas del bloque a la conexión de solo lectura"""
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        if not _reading.get() or READ_DATABASE not in settings.DATABASES:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambos alias apuntan al mismo archivo
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
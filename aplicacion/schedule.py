@@ -0,0 +1,188 @@
+"""
+Alta de horarios en lote.
+
+Una plantilla (rangos horarios copiados en varios días) o la copia del patrón
+de un día se convierten en instancias de AvailableSlot que se insertan con un
+solo bulk_create dentro de una transacción. Antes se validan los solapes
+contra un índice de intervalos por día de la semana armado con una única
+consulta, en vez de una consulta por horario.
+
+Los asientos (Reservation) se guardan bajo el inicio del horario vigente al
+reservar. Un alta o una edición que cambiaría el horario de citas futuras ya
+reservadas se rechaza: esos asientos dejarían de contar y el horario podría
+superar su capacidad.
+"""
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AvailableSlot, Reservation
+from .versioning import bump_version
+
+
+class ScheduleConflict(Exception):
+    """Algún horario nuevo se solapa con uno existente o con otro del lote"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+class SlotIndex:
+    """
+    Horarios por día de la semana ordenados por inicio, con el mayor fin
+    acumulado: saber si [start, end) se solapa con alguno es una búsqueda
+    binaria más una comparación.
+    """
+
+    def __init__(self, slots=()):
+        self._slots = {}
+        for slot in sorted(slots, key=lambda s: (s.day_of_week, s.start_time)):
+            self._slots.setdefault(slot.day_of_week, []).append(slot)
+        self._starts = {}
+        self._max_end = {}
+        for day in self._slots:
+            self._reindex(day)
+
+    def _reindex(self, day):
+        slots = self._slots[day]
+        self._starts[day] = [slot.start_time for slot in slots]
+        max_end, current = [], None
+        for slot in slots:
+            current = slot.end_time if current is None else max(current, slot.end_time)
+            max_end.append(current)
+        self._max_end[day] = max_end
+
+    def overlapping(self, day, start, end):
+        """Primer horario del día que se solapa con [start, end), o None"""
+        # Solo pueden solaparse los que empiezan antes de end
+        index = bisect_left(self._starts.get(day, []), end)
+        if not index or self._max_end[day][index - 1] <= start:
+            return None
+        for slot in reversed(self._slots[day][:index]):
+            if slot.end_time > start:
+                return slot
+        return None
+
+    def add(self, slot):
+        insort(self._slots.setdefault(slot.day_of_week, []), slot, key=lambda s: s.start_time)
+        self._reindex(slot.day_of_week)
+
+
+def split_range(start, end, minutes=None):
+    """[start, end) entero o en bloques de minutes; el rango debe dividirse exacto"""
+    if not minutes:
+        return [(start, end)]
+    step = timedelta(minutes=minutes)
+    current, stop = datetime.combine(date.min, start), datetime.combine(date.min, end)
+    blocks = []
+    while current < stop:
+        blocks.append((current.time(), (current + step).time()))
+        current += step
+    return blocks
+
+
+def template_slots(user, days, ranges, max_appointments=1, is_active=True):
+    """Los mismos rangos (start, end) en cada día indicado; sin guardar"""
+    return [
+        AvailableSlot(
+            day_of_week=day, start_time=start, end_time=end,
+            max_appointments=max_appointments, is_active=is_active, created_by=user,
+        )
+        for day in days
+        for start, end in ranges
+    ]
+
+
+def copy_day(user, source, targets):
+    """Copia los horarios del usuario en el día source a los días targets; sin guardar"""
+    pattern = AvailableSlot.objects.filter(created_by=user, day_of_week=source).order_by('start_time')
+    return [
+        AvailableSlot(
+            day_of_week=day, start_time=slot.start_time, end_time=slot.end_time,
+            max_appointments=slot.max_appointments, is_active=slot.is_active, created_by=user,
+        )
+        for slot in pattern
+        for day in targets
+    ]
+
+
+def _check_overlaps(slots):
+    """Lanza ScheduleConflict si algún horario se solapa con otro existente o del lote"""
+    # Al editar, el propio horario no cuenta en su contra
+    existing = AvailableSlot.objects.filter(day_of_week__in={s.day_of_week for s in slots}).exclude(
+        pk__in=[s.pk for s in slots if s.pk is not None]
+    )
+    index = SlotIndex(existing)
+    errors = []
+    for slot in slots:
+        other = index.overlapping(slot.day_of_week, slot.start_time, slot.end_time)
+        if other is not None:
+            errors.append(
+                f"{slot.get_day_of_week_display()} {slot.start_time:%H:%M}-{slot.end_time:%H:%M} "
+                f"se solapa con {other.start_time:%H:%M}-{other.end_time:%H:%M}"
+            )
+        # Los del lote también cuentan para los siguientes
+        index.add(slot)
+    if errors:
+        raise ScheduleConflict(errors)
+
+
+def _check_reservations(slots):
+    """Lanza ScheduleConflict si algún horario cambiaría el horario de asientos ya reservados"""
+    originals = AvailableSlot.objects.in_bulk([s.pk for s in slots if s.pk is not None])
+    days = {s.day_of_week for s in slots} | {s.day_of_week for s in originals.values()}
+    # date__iso_week_day: 1 = lunes; day_of_week: 0 = lunes
+    seats = list(
+        Reservation.objects.filter(date__gte=timezone.localdate(), date__iso_week_day__in=[d + 1 for d in days])
+        .values_list('date', 'start_time', 'cita__time')
+    )
+    errors = []
+    for slot in slots:
+        old = originals.get(slot.pk)
+        for day, start_time, time in seats:
+            inside = slot.is_active and day.weekday() == slot.day_of_week and slot.start_time <= time < slot.end_time
+            # Citas que pasarían a este horario, o que saldrían del horario anterior
+            joins = inside and start_time != slot.start_time
+            leaves = (
+                old is not None and old.is_active
+                and (day.weekday(), start_time) == (old.day_of_week, old.start_time)
+                and not (inside and start_time == slot.start_time)
+            )
+            if joins or leaves:
+                errors.append(
+                    f"{slot.get_day_of_week_display()} {slot.start_time:%H:%M}-{slot.end_time:%H:%M} "
+                    f"cambiaría el horario de citas ya reservadas (la del {day:%d/%m} a las {time:%H:%M})"
+                )
+                break
+    if errors:
+        raise ScheduleConflict(errors)
+
+
+def create_slots(slots):
+    """
+    Valida solapes y crea los horarios con un solo INSERT; todos o ninguno.
+    Lanza ScheduleConflict con un mensaje por horario en conflicto.
+    """
+    if not slots:
+        return []
+    with transaction.atomic():
+        _check_overlaps(slots)
+        _check_reservations(slots)
+        created = AvailableSlot.objects.bulk_create(slots)
+        # bulk_create no emite post_save: se invalida la caché a mano
+        transaction.on_commit(lambda: bump_version('slots'))
+    return created
+
+
+def update_slot(slot, **changes):
+    """Aplica los cambios y guarda el horario si no se solapa con otro"""
+    for field, value in changes.items():
+        setattr(slot, field, value)
+    with transaction.atomic():
+        _check_overlaps([slot])
+        _check_reservations([slot])
+        slot.save()
+    return slot
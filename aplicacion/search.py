@@ -0,0 +1,76 @@
+"""
+Búsqueda de texto completo sobre citas y mensajes de contacto.
+
+Usa los índices FTS5 creados en la migración 0005 (mantenidos por triggers),
+con coincidencia por prefijo ("jua" encuentra "Juan") y orden por relevancia
+(bm25). En motores distintos de SQLite se recurre a icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Máximo de resultados ordenados por relevancia
+SEARCH_LIMIT = 500
+
+# Nombre -> (tabla FTS5, campos para el respaldo con icontains)
+INDEXES = {
+    'citas': ('aplicacion_cita_fts', ['title', 'notes', 'user__username', 'user__email']),
+    'mensajes': ('aplicacion_contact_fts', ['name', 'email', 'subject', 'message']),
+}
+
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_query(term):
+    """'juan@mail' -> '"juan"* "mail"*': todas las palabras, cada una como prefijo"""
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(term))
+
+
+def _uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def _fallback(queryset, fields, term):
+    for word in WORD_RE.findall(term):
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': word})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def search(queryset, index, term):
+    """Filtra queryset a las filas que coinciden con term (sin orden)"""
+    table, fields = INDEXES[index]
+    query = fts_query(term)
+    if not query:
+        return queryset.none()
+    if not _uses_fts():
+        return _fallback(queryset, fields, term)
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [query])
+    )
+
+
+def ranked_ids(queryset, index, term, limit=SEARCH_LIMIT):
+    """
+    ids de queryset que coinciden con term, del más al menos relevante.
+    Los filtros del queryset se aplican en la misma consulta que el MATCH.
+    """
+    table, fields = INDEXES[index]
+    query = fts_query(term)
+    if not query:
+        return []
+    if not _uses_fts():
+        matches = _fallback(queryset, fields, term).order_by('-pk')
+        return list(matches.values_list('pk', flat=True)[:limit])
+    model_table = queryset.model._meta.db_table
+    matches = queryset.order_by().extra(
+        tables=[table],
+        where=[f'{table}.rowid = {model_table}.id', f'{table} MATCH %s'],
+        params=[query],
+        order_by=[f'{table}.rank'],
+    )
+    return list(matches.values_list('pk', flat=True)[:limit])
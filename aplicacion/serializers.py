@@ -0,0 +1,113 @@
+"""
+Serializers de la API REST (api.py).
+
+SparseFieldsSerializer admite ?fields=a,b en las lecturas y declara en
+Meta.related la relación que necesita cada campo anidado: la vista hace
+select_related solo de las relaciones de los campos pedidos.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .booking import BULK_MAX_ITEMS, BULK_STATUSES
+from .models import Aplicacion, AvailableSlot, ContactMessage
+
+
+def requested_fields(request):
+    """Campos de ?fields= en peticiones GET, o None si no se limitaron"""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get('fields', '')
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    return fields or None
+
+
+class TokenSerializer(TokenObtainPairSerializer):
+    """El token lleva is_staff: la autenticación sin estado no carga el usuario"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['is_staff'] = user.is_staff
+        return token
+
+
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def related_for(cls, fields=None):
+        """Relaciones a precargar para los campos indicados (todos si es None)"""
+        related = getattr(cls.Meta, 'related', {})
+        return sorted({relation for field, relation in related.items() if fields is None or field in fields})
+
+
+class AppointmentSerializer(SparseFieldsSerializer):
+    user = serializers.CharField(source='user.username', read_only=True)
+    approved_by = serializers.CharField(source='approved_by.username', read_only=True, default=None)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Aplicacion
+        fields = [
+            'id', 'title', 'date', 'time', 'duration', 'status', 'status_display', 'notes',
+            'user', 'approved_by', 'admin_notes', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['status', 'admin_notes', 'created_at', 'updated_at']
+        related = {'user': 'user', 'approved_by': 'approved_by'}
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Las notas internas solo llegan al VIP como motivo de una cancelación
+        # (igual que en my_appointments.html); los trabajadores las ven siempre
+        if 'admin_notes' in data and not self.context.get('is_worker') and instance.status != 'cancelled':
+            data.pop('admin_notes')
+        return data
+
+    def validate(self, attrs):
+        # Misma validación de capacidad que el formulario (Aplicacion.clean)
+        cita = Aplicacion(user_id=self.context['user_id'], status='pending', **attrs)
+        try:
+            cita.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'non_field_errors': e.messages})
+        return attrs
+
+
+class BatchStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=BULK_MAX_ITEMS)
+    status = serializers.ChoiceField(choices=BULK_STATUSES)
+
+
+class SlotSerializer(SparseFieldsSerializer):
+    created_by = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = AvailableSlot
+        fields = ['id', 'day_of_week', 'start_time', 'end_time', 'max_appointments', 'is_active', 'created_by']
+        related = {'created_by': 'created_by'}
+
+    def validate(self, attrs):
+        start = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start and end and end <= start:
+            raise serializers.ValidationError({'end_time': 'Debe ser posterior a la hora de inicio.'})
+        return attrs
+
+
+class MessageSerializer(SparseFieldsSerializer):
+    class Meta:
+        model = ContactMessage
+        fields = ['id', 'name', 'email', 'subject', 'message', 'is_read', 'created_at']
+        read_only_fields = ['name', 'email', 'subject', 'message', 'created_at']
+
+
+class IdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=BULK_MAX_ITEMS)
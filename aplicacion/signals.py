@@ -0,0 +1,37 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Aplicacion, AvailableSlot, ContactMessage
+from .roles import user_roles_scope
+from .versioning import bump_on_commit, bump_version
+
+# Invalida las cachés que dependen de las citas
+@receiver([post_save, post_delete], sender=Aplicacion)
+def appointments_changed(sender, **kwargs):
+    bump_on_commit('appointments')
+
+# Invalidan los fragmentos de templates que muestran horarios o mensajes
+@receiver([post_save, post_delete], sender=AvailableSlot)
+def slots_changed(sender, **kwargs):
+    bump_on_commit('slots')
+
+@receiver([post_save, post_delete], sender=ContactMessage)
+def messages_changed(sender, **kwargs):
+    bump_on_commit('messages')
+
+# Invalida los roles cacheados y el total de VIPs cuando cambian los grupos
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_version('users')
+    if reverse:
+        # group.user_set.*: la instancia es el grupo
+        bump_version('roles')
+    else:
+        bump_version(user_roles_scope(instance.pk))
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, **kwargs):
+    bump_version('roles')
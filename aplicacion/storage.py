@@ -0,0 +1,54 @@
+"""
+Storage de archivos estáticos para producción.
+
+Agrega el hash del contenido al nombre (caché inmutable en el navegador) y, al
+terminar collectstatic, deja copias .gz y .br de CSS/JS para que el servidor
+web las sirva ya comprimidas (gzip_static / brotli_static en nginx).
+"""
+import gzip
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se genera .gz
+    brotli = None
+
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json')
+# Archivos más chicos no se benefician de la compresión
+PRECOMPRESS_MIN_SIZE = 512
+
+
+def precompress(path):
+    """Escribe path.gz (y path.br si hay brotli); devuelve las rutas escritas"""
+    data = path.read_bytes()
+    if len(data) < PRECOMPRESS_MIN_SIZE:
+        return []
+    written = []
+    gz = path.with_name(path.name + '.gz')
+    gz.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(gz)
+    if brotli is not None:
+        br = path.with_name(path.name + '.br')
+        br.write_bytes(brotli.compress(data, quality=11))
+        written.append(br)
+    return written
+
+
+class StaticStorage(ManifestStaticFilesStorage):
+    # Un archivo que falte en el manifest se sirve con su nombre original en
+    # vez de provocar un error 500
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = set()
+        for name, hashed_name, result in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(result, Exception):
+                processed.add(hashed_name)
+            yield name, hashed_name, result
+        if dry_run:
+            return
+        for hashed_name in processed:
+            if hashed_name.endswith(PRECOMPRESS_EXTENSIONS):
+                precompress(Path(self.path(hashed_name)))
@@ -0,0 +1,100 @@
+"""
+Manejadores de la cola de trabajos (ver aplicacion/jobs.py).
+
+Se ejecutan fuera de la petición, en el comando run_jobs. Cada uno vuelve a
+leer el estado actual de la base de datos y no hace nada si ya no aplica, de
+modo que reintentarlos es seguro.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import Aplicacion, ContactMessage
+from .roles import WORKER_GROUP
+
+# Anticipación del recordatorio respecto de la cita
+REMINDER_BEFORE = timedelta(hours=24)
+
+
+def status_change_jobs(cita):
+    """Trabajos (nombre, payload) que siguen a un cambio de estado de la cita"""
+    return [('appointment_status_changed', {'cita_id': cita.pk, 'status': cita.status})]
+
+
+@task('appointment_status_changed')
+def appointment_status_changed(cita_id, status):
+    """Avisa al VIP del nuevo estado y agenda el recordatorio si quedó confirmada"""
+    cita = Aplicacion.objects.select_related('user').filter(pk=cita_id).first()
+    if cita is None or cita.status != status:
+        # La cita se eliminó o volvió a cambiar; el trabajo más nuevo avisará
+        return
+    if cita.user.email:
+        send_mail(
+            f"Tu cita fue actualizada: {cita.get_status_display()}",
+            f"Hola {cita.user.username}, tu cita \"{cita.title}\" del "
+            f"{cita.date:%d/%m/%Y} a las {cita.time:%H:%M} ahora está: {cita.get_status_display()}.",
+            settings.DEFAULT_FROM_EMAIL,
+            [cita.user.email],
+        )
+    if status == 'confirmed':
+        starts = timezone.make_aware(datetime.combine(cita.date, cita.time))
+        delay = (starts - REMINDER_BEFORE - timezone.now()).total_seconds()
+        if delay > 0:
+            enqueue('appointment_reminder', {
+                'cita_id': cita.pk, 'date': cita.date.isoformat(), 'time': cita.time.isoformat(),
+            }, delay=delay)
+
+
+@task('appointment_reminder')
+def appointment_reminder(cita_id, date, time):
+    """Recordatorio previo; se omite si la cita ya no está confirmada o cambió de horario"""
+    cita = Aplicacion.objects.select_related('user').filter(pk=cita_id, status='confirmed').first()
+    if cita is None or not cita.user.email:
+        return
+    if (cita.date.isoformat(), cita.time.isoformat()) != (date, time):
+        return
+    send_mail(
+        "Recordatorio de cita",
+        f"Hola {cita.user.username}, te recordamos tu cita \"{cita.title}\" el "
+        f"{cita.date:%d/%m/%Y} a las {cita.time:%H:%M}.",
+        settings.DEFAULT_FROM_EMAIL,
+        [cita.user.email],
+    )
+
+
+@task('waitlist_promoted')
+def waitlist_promoted(cita_id):
+    """Avisa al VIP que su lugar en la lista de espera se convirtió en cita"""
+    cita = Aplicacion.objects.select_related('user').filter(pk=cita_id, status__in=Aplicacion.ACTIVE_STATUSES).first()
+    if cita is None or not cita.user.email:
+        return
+    send_mail(
+        "Se liberó un cupo para tu cita",
+        f"Hola {cita.user.username}, se liberó un cupo y tu cita \"{cita.title}\" del "
+        f"{cita.date:%d/%m/%Y} a las {cita.time:%H:%M} quedó solicitada. Te avisaremos cuando sea confirmada.",
+        settings.DEFAULT_FROM_EMAIL,
+        [cita.user.email],
+    )
+
+
+@task('contact_message_received')
+def contact_message_received(message_id):
+    """Avisa a los trabajadores de un nuevo mensaje de contacto"""
+    message = ContactMessage.objects.filter(pk=message_id).first()
+    if message is None or message.is_read:
+        return
+    recipients = list(
+        User.objects.filter(groups__name=WORKER_GROUP, is_active=True)
+        .exclude(email='').values_list('email', flat=True)
+    )
+    if recipients:
+        send_mail(
+            f"Nuevo mensaje de contacto: {message.subject or message.name}",
+            f"{message.name} <{message.email}> escribió:\n\n{message.message}",
+            settings.DEFAULT_FROM_EMAIL,
+            recipients,
+        )
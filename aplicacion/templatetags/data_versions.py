@@ -0,0 +1,22 @@
+from django import template
+
+from ..versioning import get_version
+
+register = template.Library()
+
+# Ámbitos cuyos cambios invalidan los fragmentos cacheados de las páginas
+FRAGMENT_SCOPES = ('appointments', 'slots', 'messages')
+
+
+@register.simple_tag
+def data_version(*scopes):
+    """
+    Versión combinada para usar en {% cache %}:
+
+        {% data_version as version %}
+        {% cache 300 'vip-dashboard' user.pk version %}
+
+    Incluye siempre FRAGMENT_SCOPES más los ámbitos adicionales indicados.
+    """
+    scopes = FRAGMENT_SCOPES + tuple(s for s in scopes if s not in FRAGMENT_SCOPES)
+    return '.'.join(str(get_version(scope)) for scope in scopes)
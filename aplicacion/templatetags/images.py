@@ -0,0 +1,44 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..images import load_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(path, alt='', sizes='100vw', loading='lazy', **attrs):
+    """
+    <picture> con fuentes AVIF/WebP responsivas y la imagen original como respaldo:
+
+        {% picture 'img/slide2.jpg' alt='Portada' class='d-block w-100' %}
+
+    Sin variantes generadas (optimize_static) emite solo el <img>.
+    """
+    entry = load_manifest().get(path)
+    attrs = {'alt': alt, 'loading': loading, 'decoding': 'async', **attrs}
+    if loading == 'eager':
+        attrs.setdefault('fetchpriority', 'high')
+    if entry is None:
+        return format_html('<img src="{}"{}>', static(path), flatatt(attrs))
+
+    # width/height reservan el espacio y evitan saltos de diseño al cargar;
+    # si se indica solo uno, el otro mantiene la proporción original
+    ratio = entry['width'] / entry['height']
+    if 'height' in attrs and 'width' not in attrs:
+        attrs['width'] = round(int(attrs['height']) * ratio)
+    elif 'width' in attrs and 'height' not in attrs:
+        attrs['height'] = round(int(attrs['width']) / ratio)
+    else:
+        attrs.setdefault('width', entry['width'])
+        attrs.setdefault('height', entry['height'])
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        (
+            (fmt, ', '.join(f'{static(name)} {width}w' for name, width in files), sizes)
+            for fmt, files in entry['sources'].items()
+        ),
+    )
+    return format_html('<picture>{}<img src="{}"{}></picture>', sources, static(path), flatatt(attrs))
@@ -1,3 +1,1206 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, router, transaction
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from .archive import archive_old
+from .availability import build_availability
+from .booking import (
+    BOOKING_RETRIES, BookingConflict, BookingOverlap, BookingUnavailable, bulk_set_status, save_booking,
+)
+from .images import MANIFEST_NAME, build_variants
+from .instrumentation import QueryRecorder
+from .jobs import enqueue
+from .routers import reading
+from .schedule import SlotIndex
+from .search import ranked_ids
+from .storage import precompress
+from .tasks import status_change_jobs
+from .versioning import get_version
+from . import waitlist
+from .models import (
+    Aplicacion, ArchivedAppointment, AvailableSlot, ContactMessage, Job, Reservation, SlotOccupancy,
+    WaitlistEntry,
+)
+
+
+# Caché aislada: la caché en archivos del proyecto sobrevive entre ejecuciones
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def next_weekday(days_ahead=7):
+    return date.today() + timedelta(days=days_ahead)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BookingConflictTests(TestCase):
+    def setUp(self):
+        self.vip = User.objects.create_user('vip', password='clave-segura-123')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        self.worker = User.objects.create_user('worker', password='clave-segura-123', is_staff=True)
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(10), end_time=time(12),
+            max_appointments=1, created_by=self.worker,
+        )
+        self.client.login(username='vip', password='clave-segura-123')
+
+    def test_full_slot_returns_conflict(self):
+        save_booking(Aplicacion(user=self.worker, date=self.day, time=time(10)))
+        # Se salta clean() para simular una carrera entre validación e inserción
+        with self.assertRaises(BookingConflict):
+            save_booking(Aplicacion(user=self.vip, date=self.day, time=time(11)))
+        self.assertEqual(Aplicacion.objects.count(), 1)
+
+    def test_rolled_back_booking_keeps_cache_version(self):
+        save_booking(Aplicacion(user=self.worker, date=self.day, time=time(10)))
+        version = get_version('appointments')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(BookingConflict):
+                save_booking(Aplicacion(user=self.vip, date=self.day, time=time(11)))
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_version('appointments'), version)
+
+    def test_create_event_rejects_full_slot(self):
+        data = {'title': 'Cita', 'date': self.day.isoformat(), 'time': '10:00'}
+        self.assertEqual(self.client.post('/vip/api/events/create/', data).status_code, 200)
+        response = self.client.post('/vip/api/events/create/', dict(data, time='10:30'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('capacidad', str(response.json()['errors']))
+
+    def test_cancel_releases_seat(self):
+        cita = save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10)))
+        self.client.get(f'/vip/cancel/{cita.pk}/')
+        self.assertFalse(Reservation.objects.exists())
+        save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10, 30)))
+
+    def test_busy_database_is_not_a_server_error(self):
+        cita = save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10)))
+        busy = BookingUnavailable('El sistema está ocupado, intenta nuevamente.')
+        with mock.patch('aplicacion.views.save_booking', side_effect=busy):
+            response = self.client.get(f'/vip/cancel/{cita.pk}/', follow=True)
+        self.assertContains(response, 'ocupado')
+        with mock.patch('aplicacion.api.save_booking', side_effect=busy):
+            token = self.client.post('/api/v1/token/', {'username': 'vip', 'password': 'clave-segura-123'},
+                                     content_type='application/json')
+            response = self.client.post(f'/api/v1/appointments/{cita.pk}/cancel/',
+                                        HTTP_AUTHORIZATION=f"Bearer {token.json()['access']}")
+        self.assertEqual(response.status_code, 503)
+
+        admin = User.objects.create_superuser('admin', password='clave-segura-123')
+        self.client.force_login(admin)
+        data = {'user': self.vip.pk, 'title': 'Cita', 'date': self.day.isoformat(), 'time': '10:00',
+                'status': 'cancelled', 'notes': '', 'admin_notes': ''}
+        with mock.patch('aplicacion.admin.save_booking', side_effect=busy):
+            response = self.client.post(f'/admin/aplicacion/aplicacion/{cita.pk}/change/', data, follow=True)
+            self.assertContains(response, 'No se guardó la cita')
+            response = self.client.post('/admin/aplicacion/aplicacion/add/', data, follow=True)
+            self.assertContains(response, 'No se guardó la cita')
+            self.assertNotContains(response, 'correctamente')
+        self.assertEqual(Aplicacion.objects.get().status, 'pending')
+        self.assertFalse(LogEntry.objects.exists())
+
+    def test_admin_full_slot_returns_form_error(self):
+        save_booking(Aplicacion(user=self.worker, date=self.day, time=time(10)))
+        self.client.force_login(User.objects.create_superuser('admin', password='clave-segura-123'))
+        data = {'user': self.vip.pk, 'title': 'Cita', 'date': self.day.isoformat(), 'time': '10:30',
+                'status': 'pending', 'notes': '', 'admin_notes': ''}
+        response = self.client.post('/admin/aplicacion/aplicacion/add/', data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('capacidad', str(response.context['errors']))
+        self.assertEqual(Aplicacion.objects.count(), 1)
+        self.assertFalse(LogEntry.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentBookingTests(TransactionTestCase):
+    THREADS = 24
+    CAPACITY = 3
+
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        self.users = [User.objects.create_user(f'vip{i}') for i in range(self.THREADS)]
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(9), end_time=time(10),
+            max_appointments=self.CAPACITY, created_by=self.worker,
+        )
+
+    def test_no_double_booking_under_concurrency(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def book(user):
+            try:
+                barrier.wait()
+                save_booking(Aplicacion(user=user, date=self.day, time=time(9, 15)))
+                results.append('ok')
+            except BookingConflict:
+                results.append('conflict')
+            except BookingUnavailable:
+                results.append('busy')
+            finally:
+                # Con la base en memoria connection.close() no cierra nada; si el
+                # rollback falló, la conexión del hilo retendría bloqueos de tabla
+                connection._close()
+
+        threads = [threading.Thread(target=book, args=(user,)) for user in self.users]
+        # La base de prueba en memoria usa caché compartida: sus bloqueos de
+        # tabla no esperan busy_timeout, así que se reintenta hasta obtenerlos
+        with mock.patch('aplicacion.booking.BOOKING_RETRIES', 500), \
+                mock.patch('aplicacion.booking.BOOKING_RETRY_DELAY', 0.002):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(results.count('ok'), self.CAPACITY)
+        self.assertEqual(results.count('conflict'), self.THREADS - self.CAPACITY)
+        self.assertEqual(Aplicacion.objects.count(), results.count('ok'))
+        self.assertEqual(Reservation.objects.count(), results.count('ok'))
+        seats = list(Reservation.objects.values_list('seat', flat=True))
+        self.assertEqual(len(seats), len(set(seats)))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EventsFeedTests(TestCase):
+    def setUp(self):
+        self.vip = User.objects.create_user('vip', password='clave-segura-123')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        self.client.login(username='vip', password='clave-segura-123')
+        self.today = date.today()
+        for offset in (0, 40):
+            Aplicacion.objects.create(user=self.vip, date=self.today + timedelta(days=offset), time=time(10))
+
+    def test_window_and_not_modified(self):
+        params = {'start': self.today.isoformat(), 'end': (self.today + timedelta(days=30)).isoformat()}
+        response = self.client.get('/vip/api/events/', params)
+        self.assertEqual(len(response.json()), 1)
+        etag = response['ETag']
+        response = self.client.get('/vip/api/events/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Aplicacion.objects.create(user=self.vip, date=self.today + timedelta(days=1), time=time(11))
+        response = self.client.get('/vip/api/events/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_updated_since_returns_delta(self):
+        since = timezone.now()
+        nueva = Aplicacion.objects.create(user=self.vip, date=self.today, time=time(12))
+        response = self.client.get('/vip/api/events/', {'updated_since': since.isoformat()})
+        payload = response.json()
+        self.assertEqual([e['id'] for e in payload['events']], [nueva.pk])
+        self.assertEqual(len(payload['ids']), 3)
+
+    def test_invalid_dates_are_bad_requests(self):
+        for url, params in [
+            ('/vip/api/events/', {'start': '2024-02-30'}),
+            ('/vip/api/events/', {'end': 'mañana'}),
+            ('/vip/api/events/', {'updated_since': '2024-13-01T00:00:00'}),
+            ('/vip/api/availability/', {'start': '2024-02-30', 'end': '2024-03-05'}),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.json()['status'], 'error')
+
+    async def test_async_api_under_asgi(self):
+        await self.async_client.aforce_login(self.vip)
+        response = await self.async_client.get('/vip/api/events/')
+        self.assertEqual(len(response.json()), 2)
+        cita = await Aplicacion.objects.filter(user=self.vip).afirst()
+        response = await self.async_client.post(f'/vip/api/events/delete/{cita.pk}/')
+        self.assertEqual(response.json(), {'status': 'deleted'})
+        self.assertEqual(await Aplicacion.objects.acount(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryPlanTests(TestCase):
+    """Las consultas de las vistas más usadas no deben recorrer la tabla completa"""
+
+    HOT_TABLES = ('aplicacion_aplicacion', 'aplicacion_contactmessage', 'aplicacion_slotoccupancy')
+
+    # Recorridos aceptados, por (url, paso del plan)
+    ALLOWED_SCANS = {
+        # Primera página de mensajes: se lee el índice en orden y se corta en el LIMIT
+        ('/worker/messages/', 'SCAN aplicacion_contactmessage USING INDEX contact_created_idx'),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vip = User.objects.create_user('vip', password='clave-segura-123')
+        cls.vip.groups.add(Group.objects.create(name='VIP'))
+        cls.worker = User.objects.create_user('worker', password='clave-segura-123', is_staff=True)
+        today = date.today()
+        statuses = [code for code, _ in Aplicacion.STATUS_CHOICES]
+        Aplicacion.objects.bulk_create(
+            Aplicacion(
+                user=cls.vip, date=today + timedelta(days=i % 60 - 30),
+                time=time(8 + i % 10), status=statuses[i % len(statuses)],
+            )
+            for i in range(200)
+        )
+        ContactMessage.objects.bulk_create(
+            ContactMessage(name='N', email='n@example.com', message='m', is_read=i % 2 == 0)
+            for i in range(50)
+        )
+
+    def assertIndexedQueries(self, user, url, params=None, indexes=()):
+        """
+        Ninguna consulta recorre una tabla caliente (ni siquiera a través de un
+        índice) salvo las de ALLOWED_SCANS, y alguna busca por cada índice de indexes
+        """
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIn(self.client.get(url, params or {}).status_code, (200, 304))
+        checked = 0
+        searched = set()
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(t in sql for t in self.HOT_TABLES):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1].strip() for row in cursor.fetchall()]
+            for step in plan:
+                words = step.split()
+                self.assertFalse(
+                    words[:1] == ['SCAN'] and words[1] in self.HOT_TABLES and (url, step) not in self.ALLOWED_SCANS,
+                    f'{url}: recorrido de {words[1:2]}\n{sql}\n{plan}',
+                )
+                if words[:1] == ['SEARCH'] and 'INDEX' in words:
+                    searched.add(words[words.index('INDEX') + 1])
+            checked += 1
+        self.assertGreater(checked, 0)
+        for index in indexes:
+            self.assertIn(index, searched, f'{url}: ninguna consulta busca por {index}')
+
+    def test_vip_views(self):
+        today = date.today()
+        self.assertIndexedQueries(self.vip, '/vip/dashboard/', indexes=['cita_user_status_date_idx'])
+        self.assertIndexedQueries(self.vip, '/vip/my-appointments/', {'status': 'pending'},
+                                  indexes=['cita_user_status_date_idx'])
+        self.assertIndexedQueries(self.vip, '/vip/request/')
+        self.assertIndexedQueries(self.vip, '/vip/api/events/', {
+            'start': today.isoformat(), 'end': (today + timedelta(days=30)).isoformat(),
+        }, indexes=['cita_user_date_idx'])
+        self.assertIndexedQueries(self.vip, '/vip/api/availability/', {
+            'start': today.isoformat(), 'end': (today + timedelta(days=30)).isoformat(),
+        })
+
+    def test_worker_views(self):
+        self.assertIndexedQueries(self.worker, '/worker/dashboard/',
+                                  indexes=['cita_status_date_idx', 'cita_date_time_status_idx'])
+        self.assertIndexedQueries(self.worker, '/worker/appointments/', {'status': 'pending'},
+                                  indexes=['cita_status_date_idx'])
+        self.assertIndexedQueries(self.worker, '/worker/appointments/', {
+            'date_from': date.today().isoformat(), 'date_to': (date.today() + timedelta(days=7)).isoformat(),
+        }, indexes=['cita_date_time_status_idx'])
+        self.assertIndexedQueries(self.worker, '/worker/messages/')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WorkerDashboardTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        self.vip = User.objects.create_user('vip')
+        self.client.force_login(self.worker)
+
+    def test_snapshot_is_cached_and_invalidated(self):
+        Aplicacion.objects.create(user=self.vip, date=date.today(), time=time(10))
+        self.assertEqual(self.client.get('/worker/dashboard/').context['total_pending'], 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/worker/dashboard/')
+        self.assertFalse(any('aplicacion_aplicacion' in q['sql'] for q in ctx.captured_queries))
+        with self.captureOnCommitCallbacks(execute=True):
+            Aplicacion.objects.create(user=self.vip, date=date.today(), time=time(11))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/worker/dashboard/')
+        self.assertEqual(response.context['total_pending'], 2)
+        # Una agregación + tres listas con select_related (sin N+1 en el template)
+        hits = [q for q in ctx.captured_queries if 'aplicacion_aplicacion' in q['sql']]
+        self.assertEqual(len(hits), 4)
+
+    def test_vip_dashboard_fragment_is_cached_per_user(self):
+        Group.objects.create(name='VIP').user_set.add(self.vip)
+        Aplicacion.objects.create(user=self.vip, title='Primera', date=next_weekday(), time=time(10))
+        self.client.force_login(self.vip)
+        self.assertContains(self.client.get('/vip/dashboard/'), 'Primera')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/vip/dashboard/')
+        self.assertFalse(any('aplicacion_aplicacion' in q['sql'] for q in ctx.captured_queries))
+        # Otro VIP no ve el fragmento del primero
+        other = User.objects.create_user('vip2')
+        Group.objects.get(name='VIP').user_set.add(other)
+        self.client.force_login(other)
+        self.assertNotContains(self.client.get('/vip/dashboard/'), 'Primera')
+        # Un cambio en las citas invalida el fragmento
+        self.client.force_login(self.vip)
+        with self.captureOnCommitCallbacks(execute=True):
+            Aplicacion.objects.create(user=self.vip, title='Segunda', date=next_weekday(), time=time(11))
+        self.assertContains(self.client.get('/vip/dashboard/'), 'Segunda')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.worker = User.objects.create_user('worker', is_staff=True)
+        cls.vip = User.objects.create_user('vip', email='vip@example.com')
+        today = date.today()
+        Aplicacion.objects.bulk_create(
+            Aplicacion(user=cls.vip, date=today - timedelta(days=i // 3), time=time(10), status='pending')
+            for i in range(120)
+        )
+
+    def test_pages_cover_filtered_set_once(self):
+        self.client.force_login(self.worker)
+        seen, cursor = [], None
+        while True:
+            params = {'status': 'pending', 'user': 'vip'}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.client.get('/worker/appointments/', params).context['page']
+            seen += [cita.pk for cita in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+    def test_streaming_csv_export(self):
+        self.client.force_login(self.worker)
+        response = self.client.get('/worker/appointments/export/csv/', {'status': 'pending'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 121)
+        response = self.client.get('/worker/appointments/export/xlsx/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_datetime_cursor_keeps_microseconds(self):
+        ContactMessage.objects.bulk_create(
+            ContactMessage(name='N', email='n@example.com', message='m') for _ in range(75)
+        )
+        self.client.force_login(self.worker)
+        first = self.client.get('/worker/messages/').context['page']
+        second = self.client.get('/worker/messages/', {'cursor': first.next_cursor}).context['page']
+        self.assertEqual(len(first) + len(second), 75)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        self.vip_group = Group.objects.create(name='VIP')
+        self.user = User.objects.create_user('vip')
+        self.user.groups.add(self.vip_group)
+        self.client.force_login(self.user)
+
+    def test_roles_cached_and_invalidated_on_group_change(self):
+        self.client.get('/vip/dashboard/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/vip/dashboard/').status_code, 200)
+        self.assertFalse(any('auth_group' in q['sql'] for q in ctx.captured_queries))
+        self.user.groups.remove(self.vip_group)
+        self.assertRedirects(self.client.get('/vip/dashboard/'), '/', fetch_redirect_response=False)
+
+
+@override_settings(CACHES=TEST_CACHES, SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_N_PLUS_ONE_THRESHOLD=3)
+class SQLInstrumentationTests(TestCase):
+    def test_server_timing_and_log_line(self):
+        worker = User.objects.create_user('worker', is_staff=True)
+        self.client.force_login(worker)
+        with self.assertLogs('aplicacion.sql', level='INFO') as logs:
+            response = self.client.get('/worker/dashboard/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"view": "worker_dashboard"', logs.output[0])
+
+    def test_repeated_statements_are_flagged(self):
+        users = [User.objects.create_user(f'u{i}') for i in range(4)]
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for user in users:
+                User.objects.get(pk=user.pk)
+            User.objects.filter(pk__in=[u.pk for u in users[:2]]).count()
+        repeated = recorder.repeated(3)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0][1], 4)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkStatusTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        self.vip = User.objects.create_user('vip')
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(10), end_time=time(11),
+            max_appointments=1, created_by=self.worker,
+        )
+        self.client.force_login(self.worker)
+
+    def test_bulk_confirm_and_reject(self):
+        pending = [
+            save_booking(Aplicacion(user=self.vip, date=self.day, time=time(14 + i)))
+            for i in range(3)
+        ]
+        response = self.client.post(
+            '/worker/api/appointments/bulk/',
+            {'ids': [c.pk for c in pending], 'status': 'cancelled'},
+            content_type='application/json',
+        )
+        self.assertEqual(len(response.json()['updated']), 3)
+        self.assertFalse(Reservation.objects.exists())
+        self.assertEqual(Aplicacion.objects.filter(approved_by=self.worker, status='cancelled').count(), 3)
+
+    def test_reactivation_rechecks_capacity(self):
+        first = Aplicacion.objects.create(user=self.vip, date=self.day, time=time(10), status='cancelled')
+        second = Aplicacion.objects.create(user=self.vip, date=self.day, time=time(10, 30), status='cancelled')
+        response = self.client.post('/worker/appointments/bulk/', {
+            'ids': [first.pk, second.pk], 'status': 'confirmed', 'filters': 'status=cancelled',
+        })
+        self.assertRedirects(response, '/worker/appointments/?status=cancelled', fetch_redirect_response=False)
+        self.assertEqual(Aplicacion.objects.filter(status='confirmed').count(), 1)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+    def test_locked_database_is_retried_then_busy(self):
+        cita = save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10)))
+        locked = OperationalError('database is locked')
+        with mock.patch('aplicacion.booking.BOOKING_RETRY_DELAY', 0), \
+                mock.patch('aplicacion.booking._bulk_set_status', side_effect=locked) as attempt:
+            with self.assertRaises(BookingUnavailable):
+                bulk_set_status([cita.pk], 'confirmed', self.worker)
+            self.assertEqual(attempt.call_count, BOOKING_RETRIES)
+
+            response = self.client.post('/worker/api/appointments/bulk/', {'ids': [cita.pk], 'status': 'confirmed'},
+                                        content_type='application/json')
+            self.assertEqual((response.status_code, response.json()['status']), (503, 'busy'))
+            response = self.client.post('/worker/appointments/bulk/', {'ids': [cita.pk], 'status': 'confirmed'},
+                                        follow=True)
+            self.assertContains(response, 'ocupado')
+        self.assertEqual(Aplicacion.objects.get(pk=cita.pk).status, 'pending')
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.worker = User.objects.create_user('worker', is_staff=True)
+        cls.juan = User.objects.create_user('juanperez', email='juan@example.com')
+        cls.ana = User.objects.create_user('ana', email='ana@example.com')
+        day = next_weekday()
+        cls.control = Aplicacion.objects.create(user=cls.ana, title='Control anual', date=day, time=time(9))
+        cls.revision = Aplicacion.objects.create(
+            user=cls.juan, title='Revisión', notes='Control de exámenes', date=day, time=time(10),
+        )
+
+    def test_prefix_and_accent_insensitive(self):
+        self.assertEqual(ranked_ids(Aplicacion.objects.all(), 'citas', 'revis'), [self.revision.pk])
+        self.assertEqual(ranked_ids(Aplicacion.objects.all(), 'citas', 'jua exam'), [self.revision.pk])
+
+    def test_ranked_by_relevance(self):
+        # El título pesa igual que las notas, pero "Control anual" es más corto
+        ids = ranked_ids(Aplicacion.objects.all(), 'citas', 'control')
+        self.assertEqual(ids, [self.control.pk, self.revision.pk])
+
+    def test_index_follows_writes(self):
+        self.revision.title = 'Radiografía'
+        self.revision.save()
+        self.juan.email = 'jp@otro.cl'
+        self.juan.save()
+        self.assertEqual(ranked_ids(Aplicacion.objects.all(), 'citas', 'radio otro'), [self.revision.pk])
+        self.assertEqual(ranked_ids(Aplicacion.objects.all(), 'citas', 'juan@example'), [])
+        self.revision.delete()
+        self.assertEqual(ranked_ids(Aplicacion.objects.all(), 'citas', 'radio'), [])
+
+    def test_message_search_view(self):
+        ContactMessage.objects.create(name='Pedro', email='p@example.com', subject='Horarios', message='¿Atienden sábados?')
+        ContactMessage.objects.create(name='Luis', email='l@example.com', message='Hola')
+        self.client.force_login(self.worker)
+        page = self.client.get('/worker/messages/', {'q': 'sabado'}).context['page']
+        self.assertEqual([m.name for m in page], ['Pedro'])
+
+
+class ImagePipelineTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        (self.tmp / 'img').mkdir()
+        Image.new('RGB', (1200, 600), 'teal').save(self.tmp / 'img' / 'portada.jpg')
+
+    def test_variants_and_picture_markup(self):
+        manifest, written = build_variants(self.tmp / 'img', widths=(480,), formats=['webp'])
+        self.assertEqual(manifest['img/portada.jpg']['sources']['webp'],
+                         [['img/variants/portada-480.webp', 480], ['img/variants/portada-1200.webp', 1200]])
+        self.assertEqual(len(written), 2)
+        # Segunda pasada: nada que regenerar
+        self.assertEqual(build_variants(self.tmp / 'img', widths=(480,), formats=['webp'])[1], [])
+
+        template = Template("{% load images %}{% picture 'img/portada.jpg' alt='Portada' height=300 class='w-100' %}")
+        with mock.patch('aplicacion.templatetags.images.load_manifest', return_value=manifest):
+            html = template.render(Context())
+        self.assertIn('<source type="image/webp" srcset="/static/img/variants/portada-480.webp 480w', html)
+        self.assertIn('width="600"', html)
+        with mock.patch('aplicacion.templatetags.images.load_manifest', return_value={}):
+            self.assertNotIn('<picture>', template.render(Context()))
+
+    def test_manifest_keys_follow_source_directory(self):
+        build_variants(self.tmp / 'img', widths=(480,), formats=['webp'])
+        brand = self.tmp / 'icons' / 'brand'
+        brand.mkdir(parents=True)
+        Image.new('RGB', (200, 100), 'navy').save(brand / 'logo.png')
+        manifest, _ = build_variants(brand, widths=(480,), formats=['webp'], static_root=self.tmp)
+        self.assertEqual(manifest['icons/brand/logo.png']['sources']['webp'],
+                         [['icons/brand/variants/logo-200.webp', 200]])
+        # Un solo manifest con las entradas de ambos directorios
+        written = json.loads((self.tmp / MANIFEST_NAME).read_text())
+        self.assertEqual(sorted(written), ['icons/brand/logo.png', 'img/portada.jpg'])
+
+    def test_precompress_skips_small_files(self):
+        css = self.tmp / 'style.css'
+        css.write_text('body { color: black; }\n' * 100)
+        written = precompress(css)
+        self.assertEqual(gzip.decompress(written[0].read_bytes()), css.read_bytes())
+        tiny = self.tmp / 'tiny.js'
+        tiny.write_text('1;')
+        self.assertEqual(precompress(tiny), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        Group.objects.create(name='Trabajadores')
+        self.worker = User.objects.create_user('worker', email='worker@example.com', is_staff=True)
+        self.worker.groups.add(Group.objects.get(name='Trabajadores'))
+        self.vip = User.objects.create_user('vip', email='vip@example.com')
+        self.cita = Aplicacion.objects.create(user=self.vip, title='Control', date=next_weekday(), time=time(10))
+
+    def test_request_only_records_intent(self):
+        self.client.force_login(self.worker)
+        self.client.post(f'/worker/appointments/approve/{self.cita.pk}/', {'status': 'confirmed'})
+        self.assertEqual(list(Job.objects.values_list('name', 'payload')),
+                         [('appointment_status_changed', {'cita_id': self.cita.pk, 'status': 'confirmed'})])
+        self.assertEqual(mail.outbox, [])
+
+        self.client.post('/contact/', {'name': 'Ana', 'email': 'ana@example.com', 'message': 'Hola'})
+        self.assertEqual(Job.objects.filter(name='contact_message_received').count(), 1)
+
+    def test_rolled_back_change_leaves_no_job(self):
+        # Horario de un cupo ya ocupado: ni el cambio ni el trabajo quedan guardados
+        AvailableSlot.objects.create(day_of_week=self.cita.date.weekday(), start_time=time(10),
+                                     end_time=time(11), max_appointments=1, created_by=self.worker)
+        save_booking(self.cita)
+        other = Aplicacion.objects.create(user=self.vip, date=self.cita.date, time=time(10, 30), status='cancelled')
+        other.status = 'pending'
+        with self.assertRaises(BookingConflict):
+            save_booking(other, jobs=status_change_jobs(other))
+        self.assertFalse(Job.objects.exists())
+
+    def test_worker_drains_queue_with_retries(self):
+        with transaction.atomic():
+            self.cita.status = 'confirmed'
+            save_booking(self.cita, jobs=status_change_jobs(self.cita))
+            enqueue('contact_message_received', {'message_id': 999})
+        call_command('run_jobs', once=True, workers=2, stdout=StringIO(), stderr=StringIO())
+        # Aviso de estado enviado, recordatorio agendado para el día anterior
+        self.assertEqual([m.to for m in mail.outbox], [['vip@example.com']])
+        self.assertEqual(Job.objects.filter(status='done').count(), 2)
+        reminder = Job.objects.get(name='appointment_reminder')
+        self.assertEqual(reminder.status, 'pending')
+        self.assertGreater(reminder.run_after, timezone.now())
+
+        failing = enqueue('appointment_reminder', {'cita_id': self.cita.pk}, max_attempts=2)
+        call_command('run_jobs', once=True, stdout=StringIO(), stderr=StringIO())
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('pending', 1))
+        self.assertIn('TypeError', failing.last_error)
+        Job.objects.filter(pk=failing.pk).update(run_after=timezone.now())
+        call_command('run_jobs', once=True, stdout=StringIO(), stderr=StringIO())
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, 'failed')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReadRoutingTests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        self.vip = User.objects.create_user('vip')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        Aplicacion.objects.create(user=self.vip, title='Control', date=next_weekday(), time=time(10))
+
+    def test_read_only_views_use_read_connection(self):
+        self.client.force_login(self.vip)
+        with CaptureQueriesContext(connections['read']) as reads:
+            response = self.client.get('/vip/dashboard/')
+        self.assertContains(response, 'Control')
+        self.assertTrue(any('aplicacion_aplicacion' in q['sql'] for q in reads.captured_queries))
+
+    def test_streaming_export_reads_from_read_connection(self):
+        worker = User.objects.create_user('worker', is_staff=True)
+        self.client.force_login(worker)
+        response = self.client.get('/worker/appointments/export/csv/')
+        # Las filas se leen al consumir la respuesta, después de que la vista terminó
+        with CaptureQueriesContext(connections['read']) as reads:
+            lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(any('aplicacion_aplicacion' in q['sql'] for q in reads.captured_queries))
+
+    def test_transactions_read_their_own_writes(self):
+        with reading():
+            self.assertEqual(router.db_for_read(Aplicacion), 'read')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Aplicacion), 'default')
+
+    def test_read_connection_rejects_writes(self):
+        with self.assertRaises(OperationalError):
+            with connections['read'].cursor() as cursor:
+                cursor.execute("DELETE FROM aplicacion_aplicacion")
+        self.assertEqual(Aplicacion.objects.count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OccupancyTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        self.vip = User.objects.create_user('vip')
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(10), end_time=time(12),
+            max_appointments=2, created_by=self.worker,
+        )
+
+    def booked(self):
+        return dict(SlotOccupancy.objects.values_list('start_time', 'booked'))
+
+    def test_counters_follow_every_change_in_the_same_transaction(self):
+        first = save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10)))
+        second = save_booking(Aplicacion(user=self.vip, date=self.day, time=time(11, 30)))
+        self.assertEqual(self.booked(), {time(10): 2})
+
+        first.status = 'cancelled'
+        save_booking(first)
+        self.assertEqual(self.booked(), {time(10): 1})
+
+        bulk_set_status([first.pk], 'confirmed', self.worker)
+        self.assertEqual(self.booked(), {time(10): 2})
+
+        second.delete()
+        first.delete()
+        self.assertFalse(SlotOccupancy.objects.exists())
+
+    def test_capacity_check_reads_occupancy_rows(self):
+        save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10)))
+        save_booking(Aplicacion(user=self.vip, date=self.day, time=time(11)))
+        with self.assertNumQueries(2):
+            availability = build_availability(self.day)
+        self.assertFalse(availability.can_book(self.day, time(10, 30)))
+
+    def test_rebuild_repairs_drift(self):
+        save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10)))
+        SlotOccupancy.objects.update(booked=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_occupancy', check=True, stdout=StringIO())
+        call_command('rebuild_occupancy', stdout=StringIO())
+        self.assertEqual(self.booked(), {time(10): 1})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.vip = User.objects.create_user('vip')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        today = timezone.localdate()
+        self.recent = save_booking(Aplicacion(user=self.vip, title='Ayer', date=today - timedelta(days=1),
+                                              time=time(10), status='confirmed'))
+        self.forgotten = save_booking(Aplicacion(user=self.vip, title='Sin aprobar', date=today - timedelta(days=2),
+                                                 time=time(10)))
+        self.old = save_booking(Aplicacion(user=self.vip, title='Hace dos años', date=today - timedelta(days=730),
+                                           time=time(10), status='confirmed'))
+        self.upcoming = save_booking(Aplicacion(user=self.vip, title='Mañana', date=today + timedelta(days=1),
+                                                time=time(10)))
+
+    def test_closes_past_and_archives_old_appointments(self):
+        call_command('close_appointments', batch_size=1, retention_days=365, stdout=StringIO())
+
+        statuses = dict(Aplicacion.objects.values_list('title', 'status'))
+        self.assertEqual(statuses, {'Ayer': 'completed', 'Sin aprobar': 'expired', 'Mañana': 'pending'})
+        self.assertEqual(list(Reservation.objects.values_list('cita_id', flat=True)), [self.upcoming.pk])
+        archived = ArchivedAppointment.objects.get()
+        self.assertEqual((archived.pk, archived.status, archived.user), (self.old.pk, 'completed', self.vip))
+
+    def test_archived_history_is_still_visible(self):
+        call_command('close_appointments', stdout=StringIO())
+        self.client.force_login(self.vip)
+        response = self.client.get('/vip/my-appointments/', {'status': 'archived'})
+        self.assertContains(response, 'Hace dos años')
+        self.assertNotContains(response, 'Mañana')
+
+    def test_archive_invalidates_cache_once_per_batch(self):
+        today = timezone.localdate()
+        Aplicacion.objects.bulk_create(
+            Aplicacion(user=self.vip, date=today - timedelta(days=800 + i), time=time(10), status='cancelled')
+            for i in range(3)
+        )
+        with mock.patch('aplicacion.versioning.cache') as fake_cache:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(archive_old(today - timedelta(days=365)), 3)
+        self.assertEqual(fake_cache.incr.call_args_list, [mock.call('data-version:appointments')])
+
+    def test_dry_run_does_not_write(self):
+        out = StringIO()
+        call_command('close_appointments', dry_run=True, stdout=out)
+        self.assertIn("1 cita(s) 'pending' pasarían a 'expired'", out.getvalue())
+        self.assertEqual(Aplicacion.objects.filter(status='confirmed').count(), 2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTests(TestCase):
+    def setUp(self):
+        self.vip = User.objects.create_user('vip', password='clave-vip-123')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        self.worker = User.objects.create_user('worker', password='clave-worker-123', is_staff=True)
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(10), end_time=time(11),
+            max_appointments=1, created_by=self.worker,
+        )
+
+    def auth(self, username, password):
+        response = self.client.post('/api/v1/token/', {'username': username, 'password': password},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+
+    def test_vip_lists_own_appointments_with_cursor_and_fields(self):
+        other = User.objects.create_user('otro')
+        for hour in (14, 15, 16):
+            save_booking(Aplicacion(user=self.vip, title=f'Cita {hour}', date=self.day, time=time(hour)))
+        save_booking(Aplicacion(user=other, title='Ajena', date=self.day, time=time(17)))
+        headers = self.auth('vip', 'clave-vip-123')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/appointments/', {'fields': 'id,title', 'page_size': 2}, **headers)
+        body = response.json()
+        self.assertEqual([row['title'] for row in body['results']], ['Cita 16', 'Cita 15'])
+        self.assertEqual(set(body['results'][0]), {'id', 'title'})
+        # Sin sesión ni auth_user: grupos y la página de citas
+        self.assertFalse([q for q in queries if 'auth_user"' in q['sql'] or 'django_session' in q['sql']])
+
+        rest = self.client.get(body['next'], **headers).json()
+        self.assertEqual([row['title'] for row in rest['results']], ['Cita 14'])
+        self.assertIsNone(rest['next'])
+
+    def test_slot_changes_keep_reserved_seats(self):
+        save_booking(Aplicacion(user=self.vip, date=self.day, time=time(10, 30)))
+        save_booking(Aplicacion(user=self.vip, date=self.day, time=time(14)))
+        slot = AvailableSlot.objects.get()
+        headers = self.auth('worker', 'clave-worker-123')
+
+        # Mover el inicio dejaría el asiento de las 10:30 bajo un horario que ya no existe
+        response = self.client.patch(f'/api/v1/slots/{slot.pk}/', {'start_time': '10:15'},
+                                     content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 409)
+        response = self.client.patch(f'/api/v1/slots/{slot.pk}/', {'end_time': '12:00'},
+                                     content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(BookingConflict):
+            save_booking(Aplicacion(user=self.vip, date=self.day, time=time(11, 30)))
+
+        # Un horario nuevo tampoco puede absorber la cita fuera de horario de las 14:00
+        data = {'day_of_week': self.day.weekday(), 'start_time': '13:30', 'end_time': '15:00'}
+        response = self.client.post('/api/v1/slots/', data, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 409)
+
+    def test_admin_notes_only_reach_vip_on_cancelled(self):
+        pending = save_booking(Aplicacion(user=self.vip, title='Pendiente', date=self.day, time=time(14),
+                                          admin_notes='Revisar antecedentes'))
+        cancelled = save_booking(Aplicacion(user=self.vip, title='Cancelada', date=self.day, time=time(15),
+                                            status='cancelled', admin_notes='Sin cupo'))
+        headers = self.auth('vip', 'clave-vip-123')
+        rows = {row['id']: row for row in self.client.get('/api/v1/appointments/', **headers).json()['results']}
+        self.assertNotIn('admin_notes', rows[pending.pk])
+        self.assertEqual(rows[cancelled.pk]['admin_notes'], 'Sin cupo')
+        self.assertNotIn('admin_notes', self.client.get(f'/api/v1/appointments/{pending.pk}/', **headers).json())
+
+        headers = self.auth('worker', 'clave-worker-123')
+        response = self.client.get(f'/api/v1/appointments/{pending.pk}/', **headers)
+        self.assertEqual(response.json()['admin_notes'], 'Revisar antecedentes')
+
+    def test_create_conflict_and_permissions(self):
+        headers = self.auth('vip', 'clave-vip-123')
+        data = {'title': 'Control', 'date': self.day.isoformat(), 'time': '10:15'}
+        first = self.client.post('/api/v1/appointments/', data, content_type='application/json', **headers)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()['status'], 'pending')
+        second = self.client.post('/api/v1/appointments/', data, content_type='application/json', **headers)
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/messages/', **headers).status_code, 403)
+        self.assertEqual(self.client.get('/api/v1/appointments/').status_code, 401)
+
+    def test_worker_batch_endpoints(self):
+        pending = [save_booking(Aplicacion(user=self.vip, date=self.day, time=time(14 + i))) for i in range(2)]
+        headers = self.auth('worker', 'clave-worker-123')
+
+        response = self.client.post('/api/v1/appointments/batch-status/',
+                                    {'ids': [c.pk for c in pending], 'status': 'confirmed'},
+                                    content_type='application/json', **headers)
+        self.assertEqual(sorted(response.json()['updated']), sorted(c.pk for c in pending))
+        self.assertEqual(Aplicacion.objects.filter(approved_by=self.worker, status='confirmed').count(), 2)
+
+        slots = [{'day_of_week': 5, 'start_time': f'{h}:00', 'end_time': f'{h + 1}:00'} for h in (9, 10)]
+        response = self.client.post('/api/v1/slots/batch/', slots, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AvailableSlot.objects.filter(day_of_week=5, created_by=self.worker).count(), 2)
+        response = self.client.post('/api/v1/slots/batch/', slots[:1], content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 409)
+
+        busy = BookingUnavailable('El sistema está ocupado, intenta nuevamente.')
+        with mock.patch('aplicacion.api.bulk_set_status', side_effect=busy):
+            response = self.client.post('/api/v1/appointments/batch-status/',
+                                        {'ids': [pending[0].pk], 'status': 'cancelled'},
+                                        content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 503)
+
+    def test_single_slot_create_and_update_reject_overlaps(self):
+        headers = self.auth('worker', 'clave-worker-123')
+        day = self.day.weekday()
+        data = {'day_of_week': day, 'start_time': '10:30', 'end_time': '12:00'}
+        response = self.client.post('/api/v1/slots/', data, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 409)
+
+        data['start_time'] = '11:00'
+        response = self.client.post('/api/v1/slots/', data, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 201)
+        slot_id = response.json()['id']
+        # Editar sin moverse no choca consigo mismo; invadir el de las 10:00 sí
+        response = self.client.patch(f'/api/v1/slots/{slot_id}/', {'end_time': '12:30'},
+                                     content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(f'/api/v1/slots/{slot_id}/', {'start_time': '10:45'},
+                                     content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(AvailableSlot.objects.get(pk=slot_id).start_time, time(11))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        self.vip = User.objects.create_user('vip')
+        self.today = timezone.localdate()
+        # Un horario de 2 cupos cada lunes de 10 a 11
+        AvailableSlot.objects.create(day_of_week=0, start_time=time(10), end_time=time(11),
+                                     max_appointments=2, created_by=self.worker)
+        monday = self.today - timedelta(days=self.today.weekday() + 7)
+        for minute, status in ((0, 'completed'), (30, 'cancelled')):
+            Aplicacion.objects.create(user=self.vip, date=monday, time=time(10, minute), status=status)
+        Aplicacion.objects.create(user=self.vip, date=monday, time=time(15), status='expired')
+        self.client.force_login(self.worker)
+
+    def test_report_metrics(self):
+        response = self.client.get('/worker/api/analytics/', {'days': 28})
+        report = response.json()
+        usage = report['utilization']
+        self.assertEqual(usage['hours'], [10])
+        # 4 lunes x 2 cupos; solo la completada ocupa cupo
+        self.assertEqual((usage['booked'][0], usage['capacity'][0]), ([1], [8]))
+        self.assertEqual(usage['by_weekday'][0], 0.125)
+        self.assertEqual(report['outcomes']['total'], 3)
+        self.assertAlmostEqual(report['outcomes']['cancellation_rate'], 0.3333)
+        self.assertEqual(sum(report['lead_time']['counts']), 3)
+
+    def test_cached_until_data_changes(self):
+        self.client.get('/worker/api/analytics/')
+        # Solo sesión y usuario: el informe sale de la caché
+        with self.assertNumQueries(2):
+            self.client.get('/worker/api/analytics/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Aplicacion.objects.create(user=self.vip, date=self.today - timedelta(days=1), time=time(9),
+                                      status='cancelled')
+        self.assertEqual(self.client.get('/worker/api/analytics/').json()['outcomes']['total'], 4)
+        self.assertEqual(self.client.get('/worker/api/analytics/', {'days': 0}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        vip_group = Group.objects.create(name='VIP')
+        self.vip, self.ana, self.luis = [User.objects.create_user(name) for name in ('vip', 'ana', 'luis')]
+        for user in (self.vip, self.ana, self.luis):
+            user.groups.add(vip_group)
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(10), end_time=time(11),
+            max_appointments=1, created_by=self.worker,
+        )
+        self.cita = save_booking(Aplicacion(user=self.vip, title='Primera', date=self.day, time=time(10)))
+
+    def test_full_slot_offers_waitlist_and_cancel_promotes(self):
+        self.client.force_login(self.ana)
+        data = {'title': 'Control', 'date': self.day.isoformat(), 'time': '10:30', 'notes': ''}
+        response = self.client.post('/vip/request/', data)
+        self.assertContains(response, 'unirme a la lista de espera')
+        self.client.post('/vip/waitlist/join/', data)
+        self.assertEqual(WaitlistEntry.objects.get().start_time, time(10))
+
+        self.client.force_login(self.vip)
+        self.client.get(f'/vip/cancel/{self.cita.pk}/')
+
+        promoted = Aplicacion.objects.get(user=self.ana)
+        self.assertEqual((promoted.title, promoted.time, promoted.status), ('Control', time(10, 30), 'pending'))
+        self.assertEqual(Reservation.objects.get().cita, promoted)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertTrue(Job.objects.filter(name='waitlist_promoted', payload={'cita_id': promoted.pk}).exists())
+
+    def test_priority_order_on_reject_and_delete(self):
+        ana = waitlist.join(self.ana, self.day, time(10, 15))
+        luis = waitlist.join(self.luis, self.day, time(10, 45))
+        self.assertEqual((waitlist.position(ana), waitlist.position(luis)), (1, 2))
+        luis.priority = 5
+        luis.save()
+
+        bulk_set_status([self.cita.pk], 'cancelled', self.worker)
+        self.assertEqual(Reservation.objects.get().cita.user, self.luis)
+
+        self.client.force_login(self.luis)
+        cita = Aplicacion.objects.get(user=self.luis)
+        self.client.post(f'/vip/api/events/delete/{cita.pk}/')
+        self.assertEqual(Reservation.objects.get().cita.user, self.ana)
+        self.assertEqual(WaitlistEntry.objects.count(), 0)
+
+    def test_join_rules(self):
+        with self.assertRaisesMessage(waitlist.WaitlistError, 'cupos libres'):
+            waitlist.join(self.ana, self.day, time(12))
+        with self.assertRaisesMessage(waitlist.WaitlistError, 'Ya tienes una cita'):
+            waitlist.join(self.vip, self.day, time(10, 30))
+        waitlist.join(self.ana, self.day, time(10, 30))
+        with self.assertRaisesMessage(waitlist.WaitlistError, 'Ya estás'):
+            waitlist.join(self.ana, self.day, time(10, 45))
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage',
+)
+class LightweightSessionTests(TestCase):
+    def setUp(self):
+        self.vip = User.objects.create_user('vip', password='clave-segura-123')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        self.cita = save_booking(Aplicacion(user=self.vip, title='Control', date=next_weekday(), time=time(10)))
+
+    def test_login_and_flash_messages_without_session_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/login/', {'username': 'vip', 'password': 'clave-segura-123'})
+            response = self.client.get(f'/vip/cancel/{self.cita.pk}/', follow=True)
+        self.assertContains(response, 'Cita cancelada correctamente')
+        self.assertFalse([q for q in queries if 'django_session' in q['sql']])
+
+        self.client.get('/logout/')
+        self.assertRedirects(self.client.get('/vip/dashboard/'), '/login/', fetch_redirect_response=False)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.contact = {
+            'name': 'Visitante', 'email': 'visita@example.com',
+            'subject': 'Consulta', 'message': 'Hola, quisiera más información.',
+        }
+
+    def test_contact_limited_per_ip(self):
+        for _ in range(5):
+            self.assertEqual(self.client.post('/contact/', self.contact).status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post('/contact/', self.contact)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(ContactMessage.objects.count(), 5)
+        # Otra IP tiene su propio balde; los GET no se limitan
+        other = self.client.post('/contact/', self.contact, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 302)
+        self.assertEqual(self.client.get('/contact/').status_code, 200)
+
+    def test_booking_bucket_per_user_and_refill(self):
+        group = Group.objects.create(name='VIP')
+        ana, luis = (User.objects.create_user(name, password='clave-segura-123') for name in ('ana', 'luis'))
+        group.user_set.add(ana, luis)
+        self.client.force_login(ana)
+        data = {'title': 'Cita', 'date': '2000-01-01', 'time': '10:00'}
+        now = 1_000_000.0
+        with mock.patch('aplicacion.decorators.time.time', side_effect=lambda: now):
+            for _ in range(10):
+                self.assertNotEqual(self.client.post('/vip/api/events/create/', data).status_code, 429)
+            response = self.client.post('/vip/api/events/create/', data)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.json()['status'], 'error')
+            # El mismo balde cubre la lista de espera
+            self.assertEqual(self.client.post('/vip/waitlist/join/', data).status_code, 429)
+
+            # Una ficha se recarga cada 6 segundos
+            now += 6
+            self.assertNotEqual(self.client.post('/vip/api/events/create/', data).status_code, 429)
+            self.assertEqual(self.client.post('/vip/api/events/create/', data).status_code, 429)
+
+            self.client.force_login(luis)
+            self.assertNotEqual(self.client.post('/vip/api/events/create/', data).status_code, 429)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SlotScheduleTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user('worker', password='clave-segura-123', is_staff=True)
+        AvailableSlot.objects.create(day_of_week=0, start_time=time(9), end_time=time(10), created_by=self.worker)
+        self.client.force_login(self.worker)
+
+    def template(self, **data):
+        return self.client.post('/worker/slots/', {'action': 'template', **{f'template-{k}': v for k, v in data.items()}})
+
+    def test_slot_index(self):
+        index = SlotIndex(AvailableSlot.objects.all())
+        index.add(AvailableSlot(day_of_week=0, start_time=time(8), end_time=time(12)))
+        self.assertEqual(index.overlapping(0, time(11), time(13)).start_time, time(8))
+        self.assertIsNone(index.overlapping(0, time(12), time(13)))
+        self.assertIsNone(index.overlapping(1, time(9), time(10)))
+
+    def test_template_bulk_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.template(days=[1, 2, 3], ranges='09:00-12:00\n14:00-16:00', block_minutes=60,
+                                     max_appointments=2, is_active='on')
+        self.assertRedirects(response, '/worker/slots/', fetch_redirect_response=False)
+        self.assertEqual(AvailableSlot.objects.filter(day_of_week=2, max_appointments=2).count(), 5)
+        slot_queries = [q['sql'] for q in queries if 'aplicacion_availableslot' in q['sql']]
+        self.assertEqual(len(slot_queries), 2)
+
+    def test_overlaps_rejected(self):
+        response = self.template(days=[0, 1], ranges='09:30-11:00\n10:30-12:00', max_appointments=1)
+        self.assertEqual(response.status_code, 200)
+        errors = response.context['template_form'].non_field_errors()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(AvailableSlot.objects.count(), 1)
+
+        single = {'day_of_week': 0, 'start_time': '08:00', 'end_time': '09:30', 'max_appointments': 1}
+        self.assertEqual(self.client.post('/worker/slots/', single).status_code, 200)
+        self.assertEqual(AvailableSlot.objects.count(), 1)
+
+    def test_copy_day(self):
+        self.client.post('/worker/slots/', {'action': 'copy', 'copy-source': 0, 'copy-targets': [1, 2]})
+        self.assertEqual(list(AvailableSlot.objects.filter(day_of_week=2).values_list('start_time', flat=True)),
+                         [time(9)])
+        response = self.client.post('/worker/slots/', {'action': 'copy', 'copy-source': 0, 'copy-targets': [1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AvailableSlot.objects.count(), 3)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AppointmentOverlapTests(TestCase):
+    def setUp(self):
+        self.vip = User.objects.create_user('vip', password='clave-segura-123')
+        self.vip.groups.add(Group.objects.create(name='VIP'))
+        self.worker = User.objects.create_user('worker', is_staff=True)
+        self.day = next_weekday()
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(14), end_time=time(15),
+            max_appointments=2, created_by=self.worker,
+        )
+
+    def book(self, hour, minute=0, duration=None):
+        return save_booking(Aplicacion(user=self.vip, date=self.day, time=time(hour, minute), duration=duration))
+
+    def test_off_slot_intervals(self):
+        first = self.book(10)
+        self.assertEqual(first.duration, Aplicacion.DEFAULT_DURATION)
+        with self.assertRaises(BookingOverlap):
+            self.book(10, 15)
+        self.book(10, 30)
+
+        self.client.login(username='vip', password='clave-segura-123')
+        data = {'title': 'Cita', 'date': self.day.isoformat(), 'time': '09:45'}
+        response = self.client.post('/vip/api/events/create/', data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Se superpone', str(response.json()['errors']))
+        self.assertFalse(response.json()['waitlist'])
+        self.assertEqual(self.client.post('/vip/api/events/create/', dict(data, duration=15)).status_code, 200)
+
+    def test_slot_default_and_spill_over(self):
+        # Dentro del slot rige la capacidad, no la superposición
+        self.assertEqual(self.book(14).duration, 60)
+        self.assertEqual(self.book(14, 30).duration, 30)
+        with self.assertRaises(BookingOverlap):
+            self.book(13, 30, duration=45)
+        self.book(13, 30, duration=30)
+
+        cancelled = self.book(15, duration=30)
+        bulk_set_status([cancelled.pk], 'cancelled', self.worker)
+        self.book(15, 15)
+        result = bulk_set_status([cancelled.pk], 'confirmed', self.worker)
+        self.assertEqual(result['conflicts'], [cancelled.pk])
+
+    def test_duration_ends_with_its_slot(self):
+        AvailableSlot.objects.create(
+            day_of_week=self.day.weekday(), start_time=time(15), end_time=time(16),
+            max_appointments=3, created_by=self.worker,
+        )
+        late = Aplicacion(user=self.vip, date=self.day, time=time(14, 45), duration=60)
+        with self.assertRaises(ValidationError):
+            late.clean()
+        # Sin pasar por clean() se recorta al fin del slot y no bloquea el de las 15:00
+        self.assertEqual(save_booking(late).duration, 15)
+        for _ in range(3):
+            self.book(15)
+        with self.assertRaises(BookingConflict):
+            self.book(15, 30)
+
+    def test_edit_within_same_slot_is_checked(self):
+        early = self.book(13, 30, duration=30)
+        self.book(14)
+        # Alargarla no la cambia de horario, pero la mete en el de las 14:00
+        early.duration = 45
+        with self.assertRaises(ValidationError):
+            early.clean()
+        with self.assertRaises(BookingOverlap):
+            save_booking(early)
+        self.assertEqual(Aplicacion.objects.get(pk=early.pk).duration, 30)
+
+    def test_promote_skips_overlapping_entry(self):
+        ana, luis = [User.objects.create_user(name) for name in ('ana', 'luis')]
+        seated = [self.book(14, 30) for _ in range(2)]
+        self.book(13, 30, duration=60)
+        waitlist.join(ana, self.day, time(14))
+        waitlist.join(luis, self.day, time(14, 30))
+
+        bulk_set_status([seated[0].pk], 'cancelled', self.worker)
+        self.assertFalse(Aplicacion.objects.filter(user=ana).exists())
+        self.assertEqual(Aplicacion.objects.get(user=luis).time, time(14, 30))
+        self.assertEqual(WaitlistEntry.objects.get().user, ana)
+
+    def test_overlap_query_is_indexed_range(self):
+        self.book(10)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(BookingOverlap):
+                self.book(10, 15)
+        sql = next(q['sql'] for q in ctx.captured_queries if '"aplicacion_aplicacion"."duration"' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('cita_date_time_status_idx (date=? AND time>? AND time<?)', plan)
@@ -1,6 +1,7 @@
-from django.urls import path
+from django.urls import include, path
 from django.contrib.auth import views as auth_views
-from . import views
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from . import api, views
 from .views import CalendarView
 
 urlpatterns = [
@@ -20,12 +21,16 @@ urlpatterns = [
     path("vip/request/", views.request_appointment, name="request_appointment"),
     path("vip/my-appointments/", views.my_appointments, name="my_appointments"),
     path("vip/cancel/<int:pk>/", views.cancel_appointment, name="cancel_appointment"),
+    path("vip/waitlist/join/", views.join_waitlist, name="join_waitlist"),
+    path("vip/waitlist/leave/<int:pk>/", views.leave_waitlist, name="leave_waitlist"),
     
     # Calendario VIP
     path("vip/calendar/", CalendarView.as_view(), name="calendar"),
     path("vip/api/events/", views.my_events, name="api_events"),
     path("vip/api/events/create/", views.create_event, name="api_create_event"),
     path("vip/api/events/delete/<int:pk>/", views.delete_event, name="api_delete_event"),
+    path("vip/api/availability/", views.availability_events, name="api_availability"),
+    path("vip/api/waitlist/join/", views.api_join_waitlist, name="api_join_waitlist"),
     
     # ============================================
     # RUTAS PARA TRABAJADORES
@@ -33,14 +38,26 @@ urlpatterns = [
     path("worker/dashboard/", views.worker_dashboard, name="worker_dashboard"),
     path("worker/appointments/", views.manage_appointments, name="manage_appointments"),
     path("worker/appointments/approve/<int:pk>/", views.approve_appointment, name="approve_appointment"),
+    path("worker/appointments/export/<str:fmt>/", views.export_appointments, name="export_appointments"),
+    path("worker/appointments/bulk/", views.bulk_update_appointments, name="bulk_update_appointments"),
+    path("worker/api/appointments/bulk/", views.api_bulk_update_appointments, name="api_bulk_update_appointments"),
+    path("worker/api/analytics/", views.worker_analytics, name="worker_analytics"),
     path("worker/slots/", views.manage_slots, name="manage_slots"),
     path("worker/slots/delete/<int:pk>/", views.delete_slot, name="delete_slot"),
     path("worker/messages/", views.view_messages, name="view_messages"),
     path("worker/messages/read/<int:pk>/", views.mark_message_read, name="mark_message_read"),
+    path("worker/messages/export/<str:fmt>/", views.export_messages, name="export_messages"),
     
     # ============================================
     # RUTAS DE PERFIL (TODOS LOS USUARIOS AUTENTICADOS)
     # ============================================
     path("profile/", views.profile, name="profile"),
     path("profile/edit/", views.edit_profile, name="edit_profile"),
+    
+    # ============================================
+    # API REST v1 (JWT, ver aplicacion/api.py)
+    # ============================================
+    path("api/v1/token/", TokenObtainPairView.as_view(), name="api_token"),
+    path("api/v1/token/refresh/", TokenRefreshView.as_view(), name="api_token_refresh"),
+    path("api/v1/", include(api.router.urls)),
 ]
\ No newline at end of file
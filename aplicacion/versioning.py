@@ -0,0 +1,85 @@
+"""
+Versiones de datos para invalidar cachés.
+
+Cada ámbito ("appointments", "users", ...) tiene un número de versión en la
+caché compartida. Las claves cacheadas incluyen la versión vigente, de modo que
+incrementarla invalida de una vez todo lo que dependía de esos datos, en todos
+los workers.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'data-version:{}'
+
+# Ámbitos pendientes dentro de deferred_bumps(), por hilo
+_deferred = threading.local()
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        # Semilla basada en el reloj para no reutilizar versiones antiguas
+        # si la clave fue desalojada de la caché
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    pending = getattr(_deferred, 'scopes', None)
+    if pending is not None:
+        pending.add(scope)
+        return None
+    key = VERSION_KEY.format(scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+        return cache.get(key)
+
+
+def bump_on_commit(scope):
+    """
+    Incrementa la versión cuando se confirma la transacción en curso (o ya,
+    fuera de una). Si se incrementara antes, otra solicitud podría cachear las
+    filas viejas bajo la versión nueva; si la transacción se revierte, no se
+    invalida nada.
+    """
+    pending = getattr(_deferred, 'scopes', None)
+    if pending is not None:
+        pending.add(scope)
+        return
+    transaction.on_commit(partial(bump_version, scope))
+
+
+@contextmanager
+def deferred_bumps():
+    """
+    Agrupa los bump_version del bloque (p. ej. las señales post_delete de un
+    borrado masivo): cada ámbito se incrementa una sola vez al salir, o al
+    confirmar la transacción en curso si la hay.
+    """
+    if getattr(_deferred, 'scopes', None) is not None:
+        yield
+        return
+    _deferred.scopes = set()
+    try:
+        yield
+    finally:
+        scopes, _deferred.scopes = _deferred.scopes, None
+        for scope in sorted(scopes):
+            transaction.on_commit(partial(bump_version, scope))
+
+
+def versioned_key(prefix, *scopes, extra=()):
+    """Clave de caché que cambia cuando cambia cualquiera de los ámbitos"""
+    parts = [prefix]
+    parts += [f'{scope}{get_version(scope)}' for scope in scopes]
+    parts += [str(value) for value in extra]
+    return ':'.join(parts)
@@ -1,18 +1,49 @@
-from .forms import RegisterForm, ContactForm, AplicacionForm, AplicacionManageForm, AvailableSlotForm
-from .models import Aplicacion, AvailableSlot, ContactMessage
-from .decorators import vip_required, worker_required
+from .forms import (
+    RegisterForm, ContactForm, AplicacionForm, AplicacionManageForm, AvailableSlotForm, CopyDayForm, SlotTemplateForm,
+    WaitlistForm,
+)
+from .models import Aplicacion, ArchivedAppointment, AvailableSlot, ContactMessage, WaitlistEntry
+from .decorators import rate_limit, read_only, vip_required, worker_required
+from .roles import get_roles
+from .availability import build_availability
+from .schedule import ScheduleConflict, copy_day, create_slots, split_range, template_slots
+from .booking import (
+    BULK_STATUSES, BookingConflict, BookingOverlap, BookingUnavailable, bulk_set_status, delete_booking, save_booking,
+)
+from .versioning import versioned_key
+from .pagination import paginate_keyset, paginate_ranked
+from .search import ranked_ids, search
+from .exports import EXPORTERS
+from .jobs import enqueue
+from .tasks import status_change_jobs
+from . import waitlist
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Count, Q
-from django.http import JsonResponse
-from django.shortcuts import render, redirect, get_object_or_404
+from django.core.cache import cache
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import quote_etag
 from django.views.decorators.http import require_http_methods
 from django.views.generic import TemplateView
 from datetime import datetime, timedelta
+import hashlib
+import json
+
+# Escrituras admitidas por usuario (o por IP sin sesión); las vistas de reserva
+# comparten el balde 'booking'
+BOOKING_RATE = dict(rate=10, per=60)
 
 # ============================================
 # VISTAS PÚBLICAS (sin autenticación)
@@ -22,6 +53,7 @@ def home(request):
     """Página principal - accesible para todos"""
     return render(request, "home.html")
 
+@rate_limit('register', rate=5, per=3600)
 def register_view(request):
     """Registro de usuarios VIP"""
     if request.method == "POST":
@@ -35,12 +67,16 @@ def register_view(request):
         form = RegisterForm()
     return render(request, "register.html", {"form": form})
 
+@rate_limit('contact', rate=5, per=600)
 def contact_view(request):
     """Formulario de contacto público"""
     if request.method == "POST":
         form = ContactForm(request.POST)
         if form.is_valid():
-            form.save()
+            # El aviso a los trabajadores se registra junto con el mensaje
+            with transaction.atomic():
+                contact = form.save()
+                enqueue('contact_message_received', {'message_id': contact.pk})
             messages.success(request, "¡Mensaje enviado! Te contactaremos pronto.")
             return redirect("contact")
     else:
@@ -58,86 +94,147 @@ def logout_view(request):
 # ============================================
 
 @vip_required
+@read_only
 def vip_dashboard(request):
     """Dashboard principal para usuarios VIP"""
     user_citas = Aplicacion.objects.filter(user=request.user)
+    today = timezone.now().date()
     
-    # Estadísticas
-    pending_count = user_citas.filter(status='pending').count()
-    confirmed_count = user_citas.filter(status='confirmed').count()
+    # Todo es perezoso: si el fragmento del template está en caché, no se consulta
+    stats = SimpleLazyObject(lambda: user_citas.order_by().aggregate(
+        pending_count=Count('id', filter=Q(status='pending')),
+        confirmed_count=Count('id', filter=Q(status='confirmed')),
+    ))
     
     # Próximas citas
     upcoming = user_citas.filter(
-        date__gte=timezone.now().date(),
+        date__gte=today,
         status__in=['pending', 'confirmed']
     ).order_by('date', 'time')[:5]
     
     # Historial (últimas 10)
     history = user_citas.filter(
-        Q(date__lt=timezone.now().date()) | Q(status__in=['cancelled', 'completed'])
+        Q(date__lt=today) | Q(status__in=['cancelled', 'completed'])
     ).order_by('-date', '-time')[:10]
     
     context = {
-        'pending_count': pending_count,
-        'confirmed_count': confirmed_count,
+        'stats': stats,
         'upcoming': upcoming,
         'history': history,
     }
     return render(request, "vip/dashboard.html", context)
 
+@rate_limit('booking', **BOOKING_RATE)
 @vip_required
 def request_appointment(request):
     """Solicitar nueva cita"""
+    # Disponibilidad de la próxima semana: una ocurrencia por slot semanal
+    today = timezone.now().date()
+    availability = build_availability(today, today + timedelta(days=6))
+    status = 200
+    # Horario lleno: se ofrece la lista de espera en vez de reintentar
+    full = False
+    
     if request.method == "POST":
-        form = AplicacionForm(request.POST)
+        form = AplicacionForm(request.POST, availability=availability)
+        # is_valid() ya ejecuta Aplicacion.clean() (validación de capacidad)
         if form.is_valid():
             cita = form.save(commit=False)
             cita.user = request.user
             cita.status = 'pending'
             try:
-                cita.full_clean()  # Valida que no haya conflictos
-                cita.save()
+                save_booking(cita)
                 messages.success(request, "¡Cita solicitada! Espera confirmación de nuestro equipo.")
                 return redirect("vip_dashboard")
-            except Exception as e:
-                messages.error(request, f"Error: {str(e)}")
+            except (BookingConflict, BookingUnavailable) as e:
+                messages.error(request, f"Error: {e}")
+                # Una superposición no se resuelve esperando un cupo
+                full = isinstance(e, BookingConflict) and not isinstance(e, BookingOverlap)
+                status = 409
+        full = full or form.has_error(NON_FIELD_ERRORS, 'full')
+        for error in form.non_field_errors():
+            messages.error(request, f"Error: {error}")
     else:
         form = AplicacionForm()
     
-    # Mostrar horarios disponibles
-    slots = AvailableSlot.objects.filter(is_active=True).order_by('day_of_week', 'start_time')
-    
     context = {
         'form': form,
-        'slots': slots,
+        'slots': list(availability.occurrences()),
+        'full': full,
+        'waitlist': list(WaitlistEntry.objects.filter(user=request.user, date__gte=today)),
     }
-    return render(request, "vip/request_appointment.html", context)
+    return render(request, "vip/request_appointment.html", context, status=status)
 
 @vip_required
+@read_only
 def my_appointments(request):
     """Lista completa de citas del usuario"""
-    citas = Aplicacion.objects.filter(user=request.user).order_by('-date', '-time')
+    citas = Aplicacion.objects.filter(user=request.user)
     
-    # Filtros
+    # Filtros ('archived': citas antiguas movidas al archivo)
     status_filter = request.GET.get('status', '')
-    if status_filter:
+    if status_filter == 'archived':
+        citas = ArchivedAppointment.objects.filter(user=request.user)
+    elif status_filter:
         citas = citas.filter(status=status_filter)
     
+    page = paginate_keyset(citas, ['-date', '-time', '-id'], request.GET.get('cursor'))
     context = {
-        'citas': citas,
+        'citas': page,
+        'page': page,
+        'total': citas.count(),
         'status_filter': status_filter,
     }
     return render(request, "vip/my_appointments.html", context)
 
+def _join_waitlist(request):
+    """Anota al VIP con los datos del formulario; devuelve (entrada, errores)"""
+    form = WaitlistForm(request.POST)
+    if not form.is_valid():
+        return None, form.errors
+    try:
+        return waitlist.join(request.user, **form.cleaned_data), None
+    except waitlist.WaitlistError as e:
+        return None, str(e)
+
+@rate_limit('booking', **BOOKING_RATE)
+@vip_required
+@require_http_methods(["POST"])
+def join_waitlist(request):
+    """Anotarse en la lista de espera de un horario lleno"""
+    entry, errors = _join_waitlist(request)
+    if entry is None:
+        messages.error(request, f"Error: {errors}")
+        return redirect("request_appointment")
+    messages.success(
+        request,
+        f"Quedaste en la lista de espera (lugar {waitlist.position(entry)}). "
+        "Si se libera un cupo, tu cita se solicitará automáticamente.",
+    )
+    return redirect("request_appointment")
+
+@vip_required
+@require_http_methods(["POST"])
+def leave_waitlist(request, pk):
+    """Salir de una lista de espera propia"""
+    entry = get_object_or_404(WaitlistEntry, pk=pk, user=request.user)
+    entry.delete()
+    messages.success(request, "Saliste de la lista de espera.")
+    return redirect("request_appointment")
+
 @vip_required
 def cancel_appointment(request, pk):
     """Cancelar una cita propia"""
     cita = get_object_or_404(Aplicacion, pk=pk, user=request.user)
     
-    if cita.status in ['pending', 'confirmed']:
+    if cita.status in Aplicacion.ACTIVE_STATUSES:
         cita.status = 'cancelled'
-        cita.save()
-        messages.success(request, "Cita cancelada correctamente.")
+        try:
+            save_booking(cita, jobs=status_change_jobs(cita))
+            messages.success(request, "Cita cancelada correctamente.")
+        except (BookingConflict, BookingUnavailable) as e:
+            # Conflicto al ascender la lista de espera o base ocupada
+            messages.error(request, f"Error: {e}")
     else:
         messages.warning(request, "No se puede cancelar esta cita.")
     
@@ -147,42 +244,68 @@ def cancel_appointment(request, pk):
 # VISTAS PARA TRABAJADORES
 # ============================================
 
+# Segundos que vive una foto del dashboard (además de la invalidación por versión)
+DASHBOARD_CACHE_TIMEOUT = 300
+
+def _worker_dashboard_snapshot(today):
+    """Estadísticas y listas del dashboard de trabajadores"""
+    # Estadísticas generales en una sola consulta con agregación condicional;
+    # el filtro por estado busca en cita_status_date_idx en vez de recorrerlo
+    stats = Aplicacion.objects.filter(status__in=['pending', 'confirmed']).order_by().aggregate(
+        total_pending=Count('id', filter=Q(status='pending')),
+        total_confirmed=Count('id', filter=Q(status='confirmed')),
+    )
+    stats['total_users'] = User.objects.filter(groups__name='VIP').count()
+    
+    citas = Aplicacion.objects.select_related('user')
+    return {
+        **stats,
+        # Citas de hoy
+        'today_appointments': list(citas.filter(date=today).order_by('time')),
+        # Citas pendientes de aprobación
+        'pending_appointments': list(citas.filter(status='pending').order_by('date', 'time')[:10]),
+        # Próximas citas confirmadas
+        'upcoming_confirmed': list(citas.filter(
+            status='confirmed',
+            date__gte=today
+        ).order_by('date', 'time')[:10]),
+    }
+
 @worker_required
+@read_only
 def worker_dashboard(request):
     """Dashboard principal para trabajadores"""
     today = timezone.now().date()
-    
-    # Estadísticas generales
-    total_pending = Aplicacion.objects.filter(status='pending').count()
-    total_confirmed = Aplicacion.objects.filter(status='confirmed').count()
-    total_users = User.objects.filter(groups__name='VIP').count()
-    
-    # Citas de hoy
-    today_appointments = Aplicacion.objects.filter(date=today).order_by('time')
-    
-    # Citas pendientes de aprobación
-    pending_appointments = Aplicacion.objects.filter(status='pending').order_by('date', 'time')[:10]
-    
-    # Próximas citas confirmadas
-    upcoming_confirmed = Aplicacion.objects.filter(
-        status='confirmed',
-        date__gte=today
-    ).order_by('date', 'time')[:10]
-    
-    context = {
-        'total_pending': total_pending,
-        'total_confirmed': total_confirmed,
-        'total_users': total_users,
-        'today_appointments': today_appointments,
-        'pending_appointments': pending_appointments,
-        'upcoming_confirmed': upcoming_confirmed,
-    }
+    key = versioned_key('worker-dashboard', 'appointments', 'users', extra=[today])
+    context = cache.get(key)
+    if context is None:
+        context = _worker_dashboard_snapshot(today)
+        cache.set(key, context, DASHBOARD_CACHE_TIMEOUT)
     return render(request, "worker/dashboard.html", context)
 
 @worker_required
-def manage_appointments(request):
-    """Gestión completa de citas"""
-    citas = Aplicacion.objects.select_related('user').order_by('-date', '-time')
+@read_only
+def worker_analytics(request):
+    """API: Utilización, cancelaciones y anticipación de los últimos ?days= días"""
+    # pandas se importa solo al pedir la analítica, no en cada worker al iniciar
+    from .analytics import ANALYTICS_DEFAULT_DAYS, ANALYTICS_MAX_DAYS, analytics_report
+    try:
+        days = int(request.GET.get('days', ANALYTICS_DEFAULT_DAYS))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= ANALYTICS_MAX_DAYS:
+        return JsonResponse(
+            {"status": "error", "errors": f"days debe estar entre 1 y {ANALYTICS_MAX_DAYS}"}, status=400,
+        )
+    return JsonResponse(analytics_report(days))
+
+def _filter_appointments(request, with_search=True):
+    """
+    Aplica los filtros de manage_appointments; devuelve (queryset, filtros).
+    Con with_search=False el término de búsqueda queda en filtros pero no se
+    aplica, para que el llamador ordene por relevancia.
+    """
+    citas = Aplicacion.objects.select_related('user')
     
     # Filtros
     status = request.GET.get('status', '')
@@ -196,36 +319,91 @@ def manage_appointments(request):
         citas = citas.filter(date__gte=date_from)
     if date_to:
         citas = citas.filter(date__lte=date_to)
-    if user_search:
-        citas = citas.filter(
-            Q(user__username__icontains=user_search) |
-            Q(user__email__icontains=user_search)
-        )
+    if user_search and with_search:
+        citas = search(citas, 'citas', user_search)
     
-    context = {
-        'citas': citas,
+    filters = {
         'status_filter': status,
         'date_from': date_from,
         'date_to': date_to,
         'user_search': user_search,
     }
+    return citas, filters
+
+@worker_required
+@read_only
+def manage_appointments(request):
+    """Gestión completa de citas"""
+    citas, filters = _filter_appointments(request, with_search=False)
+    cursor = request.GET.get('cursor')
+    if filters['user_search']:
+        # Con búsqueda: resultados por relevancia
+        ids = ranked_ids(citas, 'citas', filters['user_search'])
+        page = paginate_ranked(citas, ids, cursor)
+        total = len(ids)
+    else:
+        page = paginate_keyset(citas, ['-date', '-time', '-id'], cursor)
+        total = citas.count()
+    
+    context = {
+        'citas': page,
+        'page': page,
+        'total': total,
+        **filters,
+    }
     return render(request, "worker/manage_appointments.html", context)
 
+# Columnas de las exportaciones: (campo, encabezado)
+APPOINTMENT_EXPORT_COLUMNS = [
+    ('id', 'ID'),
+    ('user__username', 'Usuario'),
+    ('user__email', 'Email'),
+    ('title', 'Título'),
+    ('date', 'Fecha'),
+    ('time', 'Hora'),
+    ('status', 'Estado'),
+    ('notes', 'Notas'),
+    ('created_at', 'Creada'),
+]
+MESSAGE_EXPORT_COLUMNS = [
+    ('id', 'ID'),
+    ('name', 'Nombre'),
+    ('email', 'Email'),
+    ('subject', 'Asunto'),
+    ('message', 'Mensaje'),
+    ('is_read', 'Leído'),
+    ('created_at', 'Recibido'),
+]
+
+@worker_required
+@read_only
+def export_appointments(request, fmt):
+    """Exportar las citas filtradas (CSV/XLSX)"""
+    if fmt not in EXPORTERS:
+        raise Http404
+    citas, _ = _filter_appointments(request)
+    citas = citas.order_by('-date', '-time', '-id')
+    return EXPORTERS[fmt](citas, APPOINTMENT_EXPORT_COLUMNS, 'citas')
+
 @worker_required
 def approve_appointment(request, pk):
     """Aprobar/Rechazar cita"""
-    cita = get_object_or_404(Aplicacion, pk=pk)
+    cita = get_object_or_404(Aplicacion.objects.select_related('user', 'approved_by'), pk=pk)
+    previous_status = cita.status
     
     if request.method == "POST":
         form = AplicacionManageForm(request.POST, instance=cita)
         if form.is_valid():
             cita = form.save(commit=False)
             cita.approved_by = request.user
-            cita.save()
-            
-            status_text = cita.get_status_display()
-            messages.success(request, f"Cita actualizada a: {status_text}")
-            return redirect("manage_appointments")
+            jobs = status_change_jobs(cita) if cita.status != previous_status else ()
+            try:
+                save_booking(cita, jobs=jobs)
+                status_text = cita.get_status_display()
+                messages.success(request, f"Cita actualizada a: {status_text}")
+                return redirect("manage_appointments")
+            except (BookingConflict, BookingUnavailable) as e:
+                messages.error(request, f"Error: {e}")
     else:
         form = AplicacionManageForm(instance=cita)
     
@@ -235,24 +413,103 @@ def approve_appointment(request, pk):
     }
     return render(request, "worker/approve_appointment.html", context)
 
+def _bulk_ids(values):
+    return [int(value) for value in values if str(value).isdigit()]
+
+@worker_required
+@require_http_methods(["POST"])
+def bulk_update_appointments(request):
+    """Confirmar/Rechazar varias citas desde manage_appointments"""
+    ids = _bulk_ids(request.POST.getlist('ids'))
+    status = request.POST.get('status', '')
+    # Vuelve al listado con los mismos filtros
+    next_url = reverse('manage_appointments') + '?' + request.POST.get('filters', '')
+    
+    if not ids or status not in BULK_STATUSES:
+        messages.warning(request, "Selecciona al menos una cita y una acción válida.")
+        return redirect(next_url)
+    try:
+        result = bulk_set_status(ids, status, request.user)
+    except (BookingConflict, BookingUnavailable) as e:
+        messages.error(request, f"Error: {e}")
+        return redirect(next_url)
+    
+    status_text = STATUS_LABELS[status]
+    messages.success(request, f"{len(result['updated'])} cita(s) actualizadas a: {status_text}")
+    if result['conflicts']:
+        ids_text = ", ".join(str(pk) for pk in result['conflicts'])
+        messages.warning(request, f"Sin cupo disponible, no se modificaron: {ids_text}")
+    return redirect(next_url)
+
+@worker_required
+@require_http_methods(["POST"])
+def api_bulk_update_appointments(request):
+    """API: Cambiar el estado de varias citas. Body JSON: {"ids": [...], "status": "..."}"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"status": "error", "errors": "JSON inválido"}, status=400)
+    ids = _bulk_ids(payload.get('ids') or [])
+    status = payload.get('status', '')
+    if not ids or status not in BULK_STATUSES:
+        return JsonResponse({"status": "error", "errors": "ids y status son obligatorios"}, status=400)
+    try:
+        result = bulk_set_status(ids, status, request.user)
+    except BookingConflict as e:
+        return JsonResponse({"status": "conflict", "errors": str(e)}, status=409)
+    except BookingUnavailable as e:
+        return JsonResponse({"status": "busy", "errors": str(e)}, status=503)
+    return JsonResponse({"status": "ok", **result})
+
+# Formularios de alta de horarios según el botón enviado (name="action")
+SLOT_FORMS = {
+    'single': (AvailableSlotForm, None),
+    'template': (SlotTemplateForm, 'template'),
+    'copy': (CopyDayForm, 'copy'),
+}
+
+def _new_slots(action, data, user):
+    """Horarios sin guardar que corresponden al formulario válido"""
+    if action == 'template':
+        ranges = [
+            block
+            for start, end in data['ranges']
+            for block in split_range(start, end, data['block_minutes'])
+        ]
+        return template_slots(user, data['days'], ranges, data['max_appointments'], data['is_active'])
+    if action == 'copy':
+        return copy_day(user, data['source'], data['targets'])
+    return [AvailableSlot(created_by=user, **data)]
+
 @worker_required
 def manage_slots(request):
-    """Gestión de horarios disponibles"""
+    """Gestión de horarios disponibles: uno a uno, por plantilla o copiando un día"""
     slots = AvailableSlot.objects.filter(created_by=request.user).order_by('day_of_week', 'start_time')
-    
+    forms = {action: form_class(prefix=prefix) for action, (form_class, prefix) in SLOT_FORMS.items()}
+
     if request.method == "POST":
-        form = AvailableSlotForm(request.POST)
+        action = request.POST.get('action', 'single')
+        if action not in SLOT_FORMS:
+            action = 'single'
+        form_class, prefix = SLOT_FORMS[action]
+        form = forms[action] = form_class(request.POST, prefix=prefix)
         if form.is_valid():
-            slot = form.save(commit=False)
-            slot.created_by = request.user
-            slot.save()
-            messages.success(request, "Horario agregado correctamente.")
-            return redirect("manage_slots")
-    else:
-        form = AvailableSlotForm()
+            try:
+                created = create_slots(_new_slots(action, form.cleaned_data, request.user))
+            except ScheduleConflict as e:
+                for error in e.errors:
+                    form.add_error(None, error)
+            else:
+                if created:
+                    messages.success(request, f"Horarios agregados: {len(created)}.")
+                else:
+                    messages.warning(request, "El día de origen no tiene horarios para copiar.")
+                return redirect("manage_slots")
     
     context = {
-        'form': form,
+        'form': forms['single'],
+        'template_form': forms['template'],
+        'copy_form': forms['copy'],
         'slots': slots,
     }
     return render(request, "worker/manage_slots.html", context)
@@ -266,15 +523,37 @@ def delete_slot(request, pk):
     return redirect("manage_slots")
 
 @worker_required
+@read_only
 def view_messages(request):
     """Ver mensajes de contacto"""
-    messages_list = ContactMessage.objects.order_by('-created_at')
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    mensajes = ContactMessage.objects.all()
+    if query:
+        ids = ranked_ids(mensajes, 'mensajes', query)
+        messages_list = paginate_ranked(mensajes, ids, cursor)
+    else:
+        messages_list = paginate_keyset(mensajes, ['-created_at', '-id'], cursor)
     
     context = {
         'messages_list': messages_list,
+        'page': messages_list,
+        'query': query,
     }
     return render(request, "worker/view_messages.html", context)
 
+@worker_required
+@read_only
+def export_messages(request, fmt):
+    """Exportar mensajes de contacto (CSV/XLSX)"""
+    if fmt not in EXPORTERS:
+        raise Http404
+    mensajes = ContactMessage.objects.order_by('-created_at', '-id')
+    query = request.GET.get('q', '').strip()
+    if query:
+        mensajes = search(mensajes, 'mensajes', query)
+    return EXPORTERS[fmt](mensajes, MESSAGE_EXPORT_COLUMNS, 'mensajes')
+
 @worker_required
 def mark_message_read(request, pk):
     """Marcar mensaje como leído"""
@@ -290,10 +569,8 @@ def mark_message_read(request, pk):
 @login_required
 def profile(request):
     """Perfil básico del usuario"""
-    user_groups = request.user.groups.values_list('name', flat=True)
-    
     context = {
-        'user_groups': list(user_groups),
+        'user_groups': sorted(get_roles(request).groups),
     }
     return render(request, "profile.html", context)
 
@@ -314,54 +591,176 @@ def edit_profile(request):
 # API ENDPOINTS PARA CALENDARIO (VIP)
 # ============================================
 
+# Color de cada estado en el calendario
+STATUS_COLORS = {
+    'pending': '#FFA500',
+    'confirmed': '#28A745',
+    'cancelled': '#DC3545',
+    'completed': '#6C757D',
+    'expired': '#343A40',
+}
+STATUS_LABELS = dict(Aplicacion.STATUS_CHOICES)
+
+# Ambos devuelven None si el parámetro falta y lanzan ValueError si es
+# inválido: mal formado o una fecha inexistente (2024-02-30)
+def _date_param(request, name):
+    """Fecha de un parámetro GET en ISO 8601 (FullCalendar envía fecha y hora)"""
+    value = request.GET.get(name, '')
+    if not value:
+        return None
+    parsed = parse_date(value[:10])
+    if parsed is None:
+        raise ValueError(f'Fecha inválida: {name}')
+    return parsed
+
+def _datetime_param(request, name):
+    value = request.GET.get(name, '')
+    if not value:
+        return None
+    # Un "+" sin codificar en el offset llega como espacio
+    parsed = parse_datetime(value.replace(' ', '+'))
+    if parsed is None:
+        raise ValueError(f'Fecha inválida: {name}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def _events_queryset(request, user):
+    """Citas del usuario dentro de la ventana [start, end) pedida por FullCalendar"""
+    appts = Aplicacion.objects.filter(user=user).order_by()
+    start = _date_param(request, 'start')
+    end = _date_param(request, 'end')
+    if start:
+        appts = appts.filter(date__gte=start)
+    if end:
+        appts = appts.filter(date__lt=end)
+    return appts
+
+async def _events_etag(request, appts, user):
+    # Cambia con cualquier alta, baja o modificación dentro de la ventana
+    stats = await appts.aaggregate(total=Count('id'), last=Max('updated_at'))
+    last = stats['last'].timestamp() if stats['last'] else 0
+    raw = f"{user.pk}:{stats['total']}:{last}:{request.GET.urlencode()}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+# Las tres vistas de la API del calendario son async (ORM async de Django):
+# bajo ASGI no ocupan un worker mientras esperan a la base de datos.
+
 @vip_required
-def my_events(request):
-    """API: Eventos del usuario para FullCalendar"""
-    appts = Aplicacion.objects.filter(user=request.user)
-    events = []
-    for a in appts:
-        # Color según estado
-        color_map = {
-            'pending': '#FFA500',
-            'confirmed': '#28A745',
-            'cancelled': '#DC3545',
-            'completed': '#6C757D',
-        }
-        
-        events.append({
-            "id": a.id,
-            "title": f"{a.title} ({a.get_status_display()})",
-            "start": f"{a.date}T{a.time}",
+@require_http_methods(["GET", "HEAD"])
+@read_only
+async def my_events(request):
+    """
+    API: Eventos del usuario para FullCalendar.
+    
+    Respeta la ventana start/end y responde 304 si el ETag no cambió. Con
+    updated_since devuelve solo los eventos modificados desde esa fecha junto
+    con los ids vigentes de la ventana, para detectar eliminaciones.
+    """
+    user = await request.auser()
+    try:
+        appts = _events_queryset(request, user)
+        updated_since = _datetime_param(request, 'updated_since')
+    except ValueError as e:
+        return JsonResponse({"status": "error", "errors": str(e)}, status=400)
+    etag = await _events_etag(request, appts, user)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    
+    changed = appts.filter(updated_at__gt=updated_since) if updated_since else appts
+    
+    events = [
+        {
+            "id": pk,
+            "title": f"{title} ({STATUS_LABELS.get(status, status)})",
+            "start": f"{date}T{time}",
+            # Sin duración guardada (citas anteriores) FullCalendar usa la suya
+            **({"end": (datetime.combine(date, time) + timedelta(minutes=duration)).isoformat()} if duration else {}),
             "allDay": False,
-            "backgroundColor": color_map.get(a.status, '#007BFF'),
-        })
-    return JsonResponse(events, safe=False)
+            "backgroundColor": STATUS_COLORS.get(status, '#007BFF'),
+        }
+        async for pk, title, date, time, duration, status
+        in changed.values_list('id', 'title', 'date', 'time', 'duration', 'status')
+    ]
+    if updated_since:
+        payload = {
+            "events": events,
+            "ids": [pk async for pk in appts.values_list('id', flat=True)],
+            "server_time": timezone.now().isoformat(),
+        }
+        response = JsonResponse(payload)
+    else:
+        response = JsonResponse(events, safe=False)
+    response['ETag'] = etag
+    # El navegador revalida siempre con If-None-Match
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
+@rate_limit('booking', as_json=True, **BOOKING_RATE)
 @vip_required
 @require_http_methods(["POST"])
-def create_event(request):
+async def create_event(request):
     """API: Crear evento"""
     form = AplicacionForm(request.POST)
-    if form.is_valid():
+    # La validación consulta la disponibilidad y save_booking usa una
+    # transacción: ambas corren en el hilo de sync_to_async
+    if await sync_to_async(form.is_valid)():
         ap = form.save(commit=False)
-        ap.user = request.user
+        ap.user = await request.auser()
         ap.status = 'pending'
         try:
-            ap.full_clean()
-            ap.save()
-            return JsonResponse({"status": "ok", "id": ap.id})
-        except Exception as e:
-            return JsonResponse({"status": "error", "errors": str(e)}, status=400)
-    return JsonResponse({"status": "error", "errors": form.errors}, status=400)
+            await sync_to_async(save_booking)(ap)
+        except BookingConflict as e:
+            return JsonResponse({
+                "status": "conflict", "errors": str(e), "waitlist": not isinstance(e, BookingOverlap),
+            }, status=409)
+        except BookingUnavailable as e:
+            return JsonResponse({"status": "busy", "errors": str(e)}, status=503)
+        return JsonResponse({"status": "ok", "id": ap.id})
+    # waitlist: el horario está lleno y el calendario ofrece la lista de espera
+    return JsonResponse({
+        "status": "error", "errors": form.errors, "waitlist": form.has_error(NON_FIELD_ERRORS, 'full'),
+    }, status=400)
 
 @vip_required
 @require_http_methods(["POST"])
-def delete_event(request, pk):
+async def delete_event(request, pk):
     """API: Eliminar evento"""
-    ap = get_object_or_404(Aplicacion, pk=pk, user=request.user)
-    ap.delete()
+    ap = await aget_object_or_404(Aplicacion, pk=pk, user=await request.auser())
+    # El asiento pasa a la lista de espera en la misma transacción
+    await sync_to_async(delete_booking)(ap)
     return JsonResponse({"status": "deleted"})
 
+@rate_limit('booking', as_json=True, **BOOKING_RATE)
+@vip_required
+@require_http_methods(["POST"])
+def api_join_waitlist(request):
+    """API: Anotarse en la lista de espera desde el calendario"""
+    entry, errors = _join_waitlist(request)
+    if entry is None:
+        return JsonResponse({"status": "error", "errors": errors}, status=400)
+    return JsonResponse({"status": "ok", "id": entry.pk, "position": waitlist.position(entry)})
+
+# Rango máximo (en días) que acepta la API de disponibilidad
+MAX_AVAILABILITY_DAYS = 62
+
+@vip_required
+@read_only
+def availability_events(request):
+    """API: Cupos libres/ocupados por slot para FullCalendar"""
+    try:
+        start = _date_param(request, 'start')
+        end = _date_param(request, 'end')
+    except ValueError:
+        start = end = None
+    if start is None or end is None or end < start:
+        return JsonResponse({"status": "error", "errors": "Rango de fechas inválido"}, status=400)
+    end = min(end, start + timedelta(days=MAX_AVAILABILITY_DAYS))
+    
+    availability = build_availability(start, end)
+    return JsonResponse(availability.as_events(), safe=False)
+
 # ============================================
 # CALENDARIO VIEW (VIP)
 # ============================================
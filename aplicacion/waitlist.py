@@ -0,0 +1,94 @@
+"""
+Lista de espera por horario lleno.
+
+En vez de reintentar la solicitud, el VIP se anota en la cola del horario
+(WaitlistEntry). Cuando una cancelación, un rechazo o una eliminación libera
+un asiento, booking.py llama a promote() dentro de la misma transacción: el
+primero de la cola pasa a ser una cita pendiente con ese asiento, sin que
+nadie compita por él.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import build_availability, find_overlap
+from .jobs import enqueue_many
+from .models import Aplicacion, Reservation, WaitlistEntry
+
+
+class WaitlistError(Exception):
+    """No corresponde anotarse en la lista de espera"""
+
+
+def join(user, date, time, title='Cita', notes=''):
+    """Anota al usuario en la cola del horario lleno que cubre date/time"""
+    if date < timezone.localdate():
+        raise WaitlistError('No puedes anotarte en un horario pasado.')
+    availability = build_availability(date)
+    if availability.can_book(date, time):
+        raise WaitlistError('Este horario tiene cupos libres: solicita la cita directamente.')
+    slot = availability.slot_for(date, time)
+    start_time = slot.start_time if slot else time
+    if Reservation.objects.filter(date=date, start_time=start_time, cita__user=user).exists():
+        raise WaitlistError('Ya tienes una cita en este horario.')
+    try:
+        with transaction.atomic():
+            return WaitlistEntry.objects.create(
+                user=user, date=date, time=time, start_time=start_time, title=title, notes=notes,
+            )
+    except IntegrityError:
+        raise WaitlistError('Ya estás en la lista de espera de este horario.')
+
+
+def position(entry):
+    """Lugar (desde 1) de la entrada en la cola de su horario"""
+    ahead = (
+        Q(priority__gt=entry.priority)
+        | Q(priority=entry.priority, created_at__lt=entry.created_at)
+        | Q(priority=entry.priority, created_at=entry.created_at, id__lt=entry.id)
+    )
+    return WaitlistEntry.objects.filter(ahead, date=entry.date, start_time=entry.start_time).count() + 1
+
+
+def promote(date, start_time):
+    """
+    Asciende a los primeros de la cola mientras el horario tenga asientos
+    libres y devuelve las citas creadas. Se llama dentro de la transacción que
+    liberó el asiento: si esa transacción se revierte, el ascenso también.
+    """
+    if date < timezone.localdate():
+        return []
+    queue = WaitlistEntry.objects.filter(date=date, start_time=start_time)
+    if not queue.exists():
+        return []
+
+    availability = build_availability(date)
+    slot = availability.slot_for(date, start_time)
+    capacity = slot.max_appointments if slot else 1
+    taken = set(Reservation.objects.filter(date=date, start_time=start_time).values_list('seat', flat=True))
+    free = [seat for seat in range(capacity) if seat not in taken]
+
+    promoted, served = [], []
+    for entry in queue:
+        if not free:
+            break
+        duration = availability.default_duration(entry.date, entry.time)
+        # Igual que save_booking: no se asciende a quien se superpondría con
+        # una cita de otro horario; sigue en la cola por si se libera
+        if find_overlap(availability, entry.date, entry.time, duration) is not None:
+            continue
+        cita = Aplicacion.objects.create(
+            user_id=entry.user_id, title=entry.title, date=entry.date, time=entry.time,
+            duration=duration, notes=entry.notes, status='pending',
+        )
+        Reservation.objects.create(cita=cita, date=date, start_time=start_time, seat=free.pop(0))
+        promoted.append(cita)
+        served.append(entry.pk)
+    WaitlistEntry.objects.filter(pk__in=served).delete()
+    enqueue_many(('waitlist_promoted', {'cita_id': cita.pk}) for cita in promoted)
+    return promoted
+
+
+def expire(today):
+    """Elimina las entradas de horarios ya pasados; devuelve cuántas"""
+    return WaitlistEntry.objects.filter(date__lt=today).delete()[1].get('aplicacion.WaitlistEntry', 0)
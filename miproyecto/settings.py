@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,17 +40,20 @@ INSTALLED_APPS = [
     
     # Aplicación de terceros
     'crispy_forms',
+    'rest_framework',
     
     # Nuestra app
     'aplicacion',
 ]
 
 MIDDLEWARE = [
+    'aplicacion.middleware.SQLInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'aplicacion.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,13 +64,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"], # Se agrego BASE_DIR/"templates"
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compilados una vez por proceso, también con DEBUG
+            # (el autoreloader de runserver vacía esta caché al editar)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'aplicacion.context_processors.roles',
             ],
         },
     },
@@ -78,11 +90,115 @@ WSGI_APPLICATION = 'miproyecto.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Perfil de concurrencia de SQLite (ver manage.py benchmark_sqlite):
+# - WAL: los lectores no bloquean al escritor ni al revés
+# - busy_timeout: ante un bloqueo se espera en vez de fallar al instante
+# - synchronous=NORMAL: seguro con WAL, sin fsync en cada commit
+# - mmap y caché de páginas de 64 MB por conexión
+# Las transacciones empiezan con BEGIN IMMEDIATE: el bloqueo de escritura se
+# pide al inicio y espera busy_timeout. Con DEFERRED, una transacción que lee y
+# luego escribe falla con "database is locked" sin esperar si otro escribió.
+# journal_mode=WAL se guarda en el archivo: cualquier manage.py convierte la
+# base local. Por eso db.sqlite3 no se versiona; se crea con manage.py migrate.
+SQLITE_PATH = os.environ.get("SQLITE_PATH", BASE_DIR / 'db.sqlite3')
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT', '10000'))};"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA cache_size=-65536;"
+    "PRAGMA temp_store=MEMORY;"
+)
+
+# Conexiones persistentes por worker de gunicorn. Bajo ASGI usar CONN_MAX_AGE=0
+# (ver Procfile): cada petición async puede correr en otro hilo.
+CONN_MAX_AGE = int(os.environ.get("CONN_MAX_AGE", "600"))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # SQLITE_PATH permite apuntar los servidores de benchmark a otra base
+        'NAME': SQLITE_PATH,
+        'OPTIONS': {'init_command': SQLITE_PRAGMAS, 'transaction_mode': 'IMMEDIATE'},
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Conexión de solo lectura para las vistas @read_only (aplicacion/routers.py)
+    'read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+        'OPTIONS': {'init_command': SQLITE_PRAGMAS + "PRAGMA query_only=ON;"},
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['aplicacion.routers.ReadWriteRouter']
+
+
+# Cache
+# Caché en archivos: compartida entre los workers de gunicorn sin servicios externos
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get("CACHE_DIR", str(BASE_DIR / 'cache')),
+        'TIMEOUT': 300,
+    },
+    # Sesiones con SESSION_STORE=cache: directorio propio para que la poda de
+    # la caché general (300 entradas) no cierre sesiones
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.environ.get("CACHE_DIR", str(BASE_DIR / 'cache')), 'sessions'),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # Caché en memoria del proceso: LocMemCache protege cada operación con un
+    # lock, así que la comparten sin riesgo los hilos de un worker (ASGI), pero
+    # no se comparte entre procesos
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'miproyecto-local',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
+# Sesiones y mensajes flash (ver manage.py benchmark_sessions)
+# Con SESSION_STORE=db cada petición autenticada lee django_session y cada
+# login o cambio de sesión escribe en SQLite, compitiendo con las reservas.
+# El modo liviano saca la sesión de la base:
+# - cookie: cookie firmada con SECRET_KEY, sin estado en el servidor. El
+#   logout no invalida una copia de la cookie antes de que expire.
+# - cache: en SESSION_CACHE_ALIAS; 'sessions' (archivos) se comparte entre
+#   workers, 'local' solo sirve con un único proceso (uvicorn --workers 1)
+SESSION_STORE = os.environ.get("SESSION_STORE", "db")
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'cache': 'django.contrib.sessions.backends.cache',
+}[SESSION_STORE]
+SESSION_CACHE_ALIAS = os.environ.get("SESSION_CACHE_ALIAS", "sessions")
+if SESSION_STORE != 'db':
+    # Los mensajes van solo en cookie: nunca recurren a la sesión
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
+# Instrumentación de SQL por petición (0 = desactivada, 1 = todas las peticiones)
+
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("SQL_INSTRUMENTATION_SAMPLE_RATE", "0"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'aplicacion.sql': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 
@@ -123,10 +239,19 @@ USE_TZ = True
 STATIC_URL = '/static/' # Se agrego un / al comienzo de static
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-if DEBUG:
-    STATICFILES_DIRS = [BASE_DIR / "static"]
-else:
-    STATICFILES_DIRS = []
+STATICFILES_DIRS = [BASE_DIR / "static"]
+
+# En producción: nombres con hash de contenido y copias .gz/.br precomprimidas
+# (ver aplicacion/storage.py y el comando optimize_static)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+            else "aplicacion.storage.StaticStorage"
+        ),
+    },
+}
 
 
 # Default primary key field type
@@ -134,6 +259,41 @@ else:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Límite de solicitudes de escritura (decorators.rate_limit). El estado se
+# guarda en la caché en archivos, compartida por los workers. Detrás de un
+# proxy, RATE_LIMIT_PROXIES = cantidad de proxies que agregan X-Forwarded-For.
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMIT_PROXIES = int(os.environ.get("RATE_LIMIT_PROXIES", "0"))
+
+# API REST (/api/v1/): JWT sin estado, solo JSON, paginación por cursor
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.CursorPagination',
+    'PAGE_SIZE': 50,
+    'UNAUTHENTICATED_USER': None,
+}
+
+SIMPLE_JWT = {
+    # Los permisos se revisan en cada petición; el token solo identifica al usuario
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'aplicacion.serializers.TokenSerializer',
+}
+
+# Días que una cita cerrada permanece en la tabla principal antes de pasar al
+# archivo (manage.py close_appointments)
+APPOINTMENT_RETENTION_DAYS = int(os.environ.get("APPOINTMENT_RETENTION_DAYS", "365"))
+
+# Correo saliente (lo envía la cola de trabajos: manage.py run_jobs)
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "no-responder@mop.cl")
+
 # Se agregan las siguientes 2 lineas de codigo para el contenido MEDIA
 
 MEDIA_URL = '/media/'